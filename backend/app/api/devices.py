@@ -1,10 +1,11 @@
 # backend/app/api/devices.py
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from app.db.database import get_db
 from app.db.models import UserDevice
+from app.services.device_service import bump_devices_version, device_context_cache, fetch_all_devices
 
 
 router = APIRouter(prefix="/devices", tags=["Devices"])
@@ -31,7 +32,7 @@ class DeviceResponse(DeviceCreate):
 # -------------------------
 
 @router.post("/", response_model=DeviceResponse)
-def add_device(device: DeviceCreate, db: Session = Depends(get_db)):
+async def add_device(device: DeviceCreate, db: AsyncSession = Depends(get_db)):
     db_device = UserDevice(
         name=device.name,
         type=device.type,
@@ -40,8 +41,10 @@ def add_device(device: DeviceCreate, db: Session = Depends(get_db)):
         notes=device.notes
     )
     db.add(db_device)
-    db.commit()
-    db.refresh(db_device)
+    await bump_devices_version(db)
+    await db.commit()
+    device_context_cache.invalidate()
+    await db.refresh(db_device)
     return db_device
 
 # -------------------------
@@ -49,19 +52,21 @@ def add_device(device: DeviceCreate, db: Session = Depends(get_db)):
 # -------------------------
 
 @router.get("/", response_model=list[DeviceResponse])
-def get_devices(db: Session = Depends(get_db)):
-    return db.query(UserDevice).all()
+async def get_devices(db: AsyncSession = Depends(get_db)):
+    return await fetch_all_devices(db)
 
 # -------------------------
 # DELETE /devices/{id}
 # -------------------------
 
 @router.delete("/{device_id}")
-def delete_device(device_id: int, db: Session = Depends(get_db)):
-    device = db.query(UserDevice).filter(UserDevice.id == device_id).first()
+async def delete_device(device_id: int, db: AsyncSession = Depends(get_db)):
+    device = await db.get(UserDevice, device_id)
     if not device:
         return {"error": "Device not found"}
 
-    db.delete(device)
-    db.commit()
+    await db.delete(device)
+    await bump_devices_version(db)
+    await db.commit()
+    device_context_cache.invalidate()
     return {"message": "Device deleted"}
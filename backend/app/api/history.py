@@ -1,27 +1,198 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+import base64
+from itertools import islice
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import String, and_, func, or_, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer_group
 from app.db.database import get_db
+from app.db.compression import plain_text
+from app.db.fulltext import search_sessions
+from app.db.models import HelpdeskSession
+from app.services.retention import session_archive
+from app.services.session_writer import session_writer
+from app.utils.concurrency import run_blocking
 
 router = APIRouter(prefix="/history", tags=["History"])
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SUMMARY_CHARS = 200
+TRANSCRIPT_CHARS = 200
+
+# SQLite stores created_at as text, and a bound datetime would be rendered
+# with microseconds ('... 10:00:00.000000'), which never equals the
+# CURRENT_TIMESTAMP default ('... 10:00:00'). There the column is compared
+# as text against a value in the default's format; elsewhere as a timestamp.
+_created_text = type_coerce(HelpdeskSession.created_at, String)
+
+
+def _encode_cursor(created_at: datetime, session_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{session_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, session_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(session_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _created_at_filter(dialect: str):
+    """created_at as compared in WHERE clauses, and the matching value converter."""
+    if dialect == "sqlite":
+        return _created_text, _sqlite_time
+    return HelpdeskSession.created_at, _utc
+
+
+def _utc(value: datetime) -> datetime:
+    # naive values are taken to be UTC, like the stored timestamps
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _sqlite_time(value: datetime) -> str:
+    """UTC timestamp in the 'YYYY-MM-DD HH:MM:SS' form the SQLite default writes."""
+    return _utc(value).replace(tzinfo=None).isoformat(sep=" ")
+
+
 @router.get("/")
-def get_history(db: Session = Depends(get_db)):
-    query = text("""
-        SELECT id, transcript, manual_markdown, created_at
-        FROM helpdesk_sessions
-        ORDER BY created_at DESC
-    """)
-
-    rows = db.execute(query).fetchall()
-
-    result = []
-    for row in rows:
-        result.append({
+async def get_history(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    summary_chars: int = Query(SUMMARY_CHARS, ge=0, le=2000),
+    transcript_chars: int = Query(TRANSCRIPT_CHARS, ge=0, le=2000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Newest-first page of session summaries.
+
+    Keyset pagination on (created_at, id): pass `next_cursor` from the
+    previous page as `cursor`. `since` / `until` bound created_at (UTC).
+    Only the first `transcript_chars` characters of the transcript and
+    `summary_chars` of the manual are returned; fetch /history/{id} for
+    the full session.
+    """
+    # read-your-writes: sessions from responses already sent are committed first
+    await run_blocking(session_writer.sync)
+
+    query = (
+        select(
+            HelpdeskSession.id,
+            func.substr(HelpdeskSession.transcript, 1, transcript_chars).label("transcript"),
+            func.length(HelpdeskSession.transcript).label("transcript_length"),
+            func.substr(plain_text(HelpdeskSession.manual_markdown), 1, summary_chars).label("summary"),
+            func.length(plain_text(HelpdeskSession.manual_markdown)).label("manual_length"),
+            HelpdeskSession.created_at,
+        )
+        .order_by(HelpdeskSession.created_at.desc(), HelpdeskSession.id.desc())
+        .limit(limit + 1)
+    )
+
+    created, value = _created_at_filter(db.bind.dialect.name)
+    if since is not None:
+        query = query.where(created >= value(since))
+    if until is not None:
+        query = query.where(created < value(until))
+    if cursor:
+        created_at, session_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            created < value(created_at),
+            and_(created == value(created_at), HelpdeskSession.id < session_id),
+        ))
+
+    rows = (await db.execute(query)).fetchall()
+    page, more = rows[:limit], len(rows) > limit
+
+    items = []
+    for row in page:
+        items.append({
             "id": str(row.id),
             "transcript": row.transcript or "",
-            "manual_markdown": row.manual_markdown or "",
+            "transcript_truncated": (row.transcript_length or 0) > transcript_chars,
+            "summary": row.summary or "",
+            "truncated": (row.manual_length or 0) > summary_chars,
             "created_at": str(row.created_at) if row.created_at else ""
         })
 
-    return result
+    return {
+        "items": items,
+        "next_cursor": _encode_cursor(page[-1].created_at, page[-1].id) if more else None,
+    }
+
+
+@router.get("/search")
+async def search_history(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10_000),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Full-text search over transcripts and manuals, best matches first.
+    Snippets mark matched terms with <mark>…</mark>. Page with
+    `next_offset`.
+    """
+    await run_blocking(session_writer.sync)
+
+    items, more = await search_sessions(db, q, limit, offset)
+    return {"items": items, "next_offset": offset + limit if more else None}
+
+
+@router.get("/archive")
+async def search_archive(
+    q: Optional[str] = Query(None, max_length=500),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10_000),
+):
+    """
+    Sessions moved out of the database by retention. Scans the archive
+    segments on demand (only those overlapping `since` / `until` / `session_id`),
+    so this is much slower than /history; `q` is a plain substring match.
+    """
+    def scan():
+        matches = session_archive.scan(query=q, since=since, until=until, session_id=session_id)
+        return list(islice(matches, offset, offset + limit + 1))
+
+    records = await run_blocking(scan)
+    items = [
+        {
+            "id": str(r["id"]),
+            "transcript": r["transcript"] or "",
+            "entities": r["entities"] or {},
+            "steps": r["steps"] or [],
+            "manual_markdown": r["manual_markdown"] or "",
+            "created_at": r["created_at"] or "",
+        }
+        for r in records[:limit]
+    ]
+    return {"items": items, "next_offset": offset + limit if len(records) > limit else None}
+
+
+@router.get("/{session_id}")
+async def get_history_detail(session_id: int, db: AsyncSession = Depends(get_db)):
+    """Full content of one session."""
+    await run_blocking(session_writer.sync)
+    session = await db.get(HelpdeskSession, session_id, options=[undefer_group("payload")])
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    return {
+        "id": str(session.id),
+        "transcript": session.transcript or "",
+        "entities": session.entities or {},
+        "steps": session.steps or [],
+        "manual_markdown": session.manual_markdown or "",
+        "created_at": str(session.created_at) if session.created_at else ""
+    }
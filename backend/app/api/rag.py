@@ -1,46 +1,44 @@
+import asyncio
+
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.rag.vector_search import retrieve_docs
-from app.utils.llm import chat_completion
-from app.services.device_service import fetch_all_devices
-from app.db.database import get_db   # ✅ FIXED IMPORT
-from app.db.models import HelpdeskSession
+from app.rag.context_builder import CONTEXT_CANDIDATES, build_context
+from app.rag.answer_cache import query_cache_vector, rag_answer_cache
+from app.utils.llm import chat_completion, chat_completion_stream
+from app.utils.concurrency import SingleFlight, iterate_blocking, run_blocking
+from app.utils.embeddings import normalize_text
+from app.utils.sse import sse_event, sse_response
+from app.services.device_service import get_device_context
+from app.services.session_writer import SessionWrite, persist_session
+from app.db.database import get_db, AsyncSessionLocal
 
 router = APIRouter(prefix="/rag", tags=["RAG"])
 
+# identical concurrent questions from users with the same devices share one answer
+answer_flight = SingleFlight("rag_query")
+
 
 class QueryRequest(BaseModel):
     query: str
     session_id: str | None = None
 
 
-@router.post("/query")
-async def rag_query(payload: QueryRequest, db: Session = Depends(get_db)):  # ✅ get_db now works
-    query = payload.query
-
+def _build_prompts(query: str, formatted_devices: str):
+    """
+    Retrieval + prompt for one question. Returns (system_prompt, user_prompt, sources).
+    """
     # ------------------------------
     # 1. Retrieve Docs (RAG)
     # ------------------------------
-    docs = retrieve_docs(query)
-    context_docs = "\n".join(docs) if docs else "No relevant documents found."
-
-    # ------------------------------
-    # 2. Fetch Saved Devices
-    # ------------------------------
-    devices = fetch_all_devices(db)
-
-    if devices:
-        formatted_devices = "\n".join([
-            f"- {d.type} | {d.name} | {d.model} | OS: {d.os_version or 'N/A'}"
-            for d in devices
-        ])
-    else:
-        formatted_devices = "User has no saved devices."
+    candidates = retrieve_docs(query, top_k=CONTEXT_CANDIDATES)
+    context_docs, docs = build_context(query, candidates, separator="\n")
+    context_docs = context_docs or "No relevant documents found."
 
     # ------------------------------
-    # 3. Build Prompt
+    # 2. Build Prompt
     # ------------------------------
     system_prompt = (
         "You are a highly helpful troubleshooting assistant.\n"
@@ -64,37 +62,117 @@ DOCUMENT CONTEXT:
 Now produce the best possible answer using the information above.
 """
 
-    # ------------------------------
-    # 4. LLM response
-    # ------------------------------
+    return system_prompt, user_prompt, docs
+
+
+def _answer_query(query: str, formatted_devices: str):
+    """
+    Retrieval + prompt + LLM call for one question. Returns (answer, sources).
+    """
+    system_prompt, user_prompt, docs = _build_prompts(query, formatted_devices)
     answer = chat_completion(system_prompt, user_prompt)
+    return answer, docs
 
-    # ------------------------------
-    # 5. Persist a lightweight session for history (so the UI can show it)
-    # ------------------------------
+
+async def _persist_session(session_id, query: str, answer: str):
+    """Persist a lightweight session for history (so the UI can show it)."""
     try:
-        session_id = payload.session_id
-        if session_id:
-            # attempt to update existing session by id (if it exists)
-            existing = db.query(HelpdeskSession).filter(HelpdeskSession.id == session_id).first()
-            if existing:
-                existing.transcript = query
-                existing.manual_markdown = answer
-                db.commit()
-            else:
-                new_s = HelpdeskSession(transcript=query, manual_markdown=answer)
-                db.add(new_s)
-                db.commit()
-        else:
-            new_s = HelpdeskSession(transcript=query, manual_markdown=answer)
-            db.add(new_s)
-            db.commit()
+        # updates the existing session by id (if it exists), written behind the response
+        fields = {"transcript": query, "manual_markdown": answer}
+        await persist_session(SessionWrite(session_id, create=fields, update=fields))
     except Exception as e:
         # Persist failures should not block the response — log for debugging
         print("Warning: failed to persist session for history:", e)
 
+
+@router.post("/query")
+async def rag_query(payload: QueryRequest, db: AsyncSession = Depends(get_db)):
+    query = payload.query
+
+    # ------------------------------
+    # 1. Fetch Saved Devices + query embedding (concurrently; embedding off the event loop)
+    # ------------------------------
+    device_context, query_vector = await asyncio.gather(
+        get_device_context(db),
+        run_blocking(query_cache_vector, query),
+    )
+    # hand the connection back to the pool while the LLM runs
+    await db.close()
+
+    # ------------------------------
+    # 2. Semantic answer cache (same question, same devices)
+    # ------------------------------
+    fingerprint = device_context.fingerprint
+    cached = rag_answer_cache.get(query_vector, fingerprint) if query_vector is not None else None
+
+    if cached:
+        answer, docs = cached["answer"], cached["sources"]
+    else:
+        answer, docs = await answer_flight.do(
+            (normalize_text(query), fingerprint), lambda: run_blocking(_answer_query, query, device_context.prompt_block)
+        )
+        if query_vector is not None:
+            rag_answer_cache.put(query_vector, fingerprint, {"answer": answer, "sources": docs})
+
+    # ------------------------------
+    # 3. Persist a lightweight session for history (so the UI can show it)
+    # ------------------------------
+    await _persist_session(payload.session_id, query, answer)
+
     return {
         "query": query,
         "answer": answer,
         "sources": docs
     }
+
+
+@router.post("/query/stream")
+async def rag_query_stream(payload: QueryRequest):
+    """
+    Server-Sent Events variant of /query. Events, in order:
+        sources  {"sources": [...]}          the context chunks used
+        token    {"text": "..."}             answer deltas as generated
+        done     {"query", "answer", "sources"}
+    or a single `error` {"detail"} if something fails. The session is
+    persisted once the answer is complete.
+    """
+    query = payload.query
+
+    async def events():
+        # the request-scoped session may be closed before the stream ends
+        async with AsyncSessionLocal() as db:
+            try:
+                device_context, query_vector = await asyncio.gather(
+                    get_device_context(db),
+                    run_blocking(query_cache_vector, query),
+                )
+                await db.close()
+
+                fingerprint = device_context.fingerprint
+                cached = rag_answer_cache.get(query_vector, fingerprint) if query_vector is not None else None
+
+                if cached:
+                    answer, docs = cached["answer"], cached["sources"]
+                    yield sse_event("sources", {"sources": docs})
+                    yield sse_event("token", {"text": answer})
+                else:
+                    system_prompt, user_prompt, docs = await run_blocking(_build_prompts, query, device_context.prompt_block)
+                    yield sse_event("sources", {"sources": docs})
+
+                    parts = []
+                    async for delta in iterate_blocking(chat_completion_stream, system_prompt, user_prompt):
+                        parts.append(delta)
+                        yield sse_event("token", {"text": delta})
+
+                    answer = "".join(parts).strip()
+                    if query_vector is not None:
+                        rag_answer_cache.put(query_vector, fingerprint, {"answer": answer, "sources": docs})
+
+                await _persist_session(payload.session_id, query, answer)
+
+                yield sse_event("done", {"query": query, "answer": answer, "sources": docs})
+            except Exception as e:
+                print("Warning: RAG stream failed:", e)
+                yield sse_event("error", {"detail": str(e)})
+
+    return sse_response(events())
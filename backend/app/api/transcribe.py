@@ -1,12 +1,10 @@
 # backend/app/api/transcribe.py
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException
 from pydantic import BaseModel
 from app.services.whisper_service import transcribe_audio
+from app.services.session_writer import SessionWrite, persist_session
 from uuid import uuid4
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import HelpdeskSession
 
 router = APIRouter(prefix="/transcribe", tags=["Transcription"])
 
@@ -14,8 +12,9 @@ class TranscribeResponse(BaseModel):
     session_id: str
     transcript: str
 
+
 @router.post("/", response_model=TranscribeResponse)
-async def transcribe(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def transcribe(file: UploadFile = File(...)):
     """
     Accept an audio file and return the transcription with a generated session ID.
     """
@@ -25,16 +24,13 @@ async def transcribe(file: UploadFile = File(...), db: Session = Depends(get_db)
         # Generate a session ID
         session_id = str(uuid4())
         
-        # Create initial session in database
-        session = HelpdeskSession(
-            transcript=text,
-            entities={},
-            steps=[],
-            manual_markdown=""
-        )
-        db.add(session)
-        db.commit()
-        db.refresh(session)
+        # Create initial session in database (written behind the response)
+        await persist_session(SessionWrite(create={
+            "transcript": text,
+            "entities": {},
+            "steps": [],
+            "manual_markdown": ""
+        }))
         
         return {"session_id": session_id, "transcript": text}
     except Exception as e:
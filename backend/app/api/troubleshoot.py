@@ -1,25 +1,38 @@
 # backend/app/api/troubleshoot.py
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
 from uuid import uuid4
 
-from app.db.database import get_db
-from app.db.models import HelpdeskSession
+from app.db.database import get_db, AsyncSessionLocal
 
 from app.rag.entity_extraction import extract_entities
 from app.rag.vector_search import retrieve_docs
 from app.rag.llm_reasoning import generate_steps_and_manual
-from app.rag.llm_reasoning import Step
+from app.rag.llm_reasoning import Step, StepStreamParser, build_step_prompts, parse_steps_response
+from app.rag.context_builder import CONTEXT_CANDIDATES
+from app.rag.answer_cache import ANSWER_CACHE_ENABLED, query_cache_vector, troubleshoot_answer_cache
+from app.utils.concurrency import SingleFlight, iterate_blocking, run_blocking
+from app.utils.embeddings import normalize_text
+from app.utils.llm import chat_completion_stream
+from app.utils.sse import sse_event, sse_response
 
-# 🔥 NEW — correct synchronous device service import
-from app.services.device_service import fetch_all_devices
+from app.services.device_service import get_device_context
+from app.services.session_writer import SessionWrite, persist_session
 
 
 router = APIRouter(prefix="/troubleshoot", tags=["Troubleshooting"])
 
+# Identical concurrent transcripts share one upstream computation. Entity
+# extraction and retrieval don't depend on the user's devices, so they are
+# keyed by the normalized query alone; generation also by device fingerprint.
+analysis_flight = SingleFlight("troubleshoot_analysis")
+generation_flight = SingleFlight("troubleshoot_generation")
+
 
 # -------------------------
 # Request / Response Models
@@ -44,53 +57,132 @@ class TroubleshootResponse(BaseModel):
     solution: Dict[str, str]  # Frontend compatibility
 
 
+async def _analyze(query: str):
+    """Entities + retrieved docs, computed concurrently."""
+    return await asyncio.gather(
+        run_blocking(extract_entities, query),
+        run_blocking(retrieve_docs, query, top_k=CONTEXT_CANDIDATES),
+    )
+
+
+def _start_analysis(query: str) -> asyncio.Future:
+    """
+    Start extraction + retrieval. Callers start it only once the answer
+    cache has missed (or alongside the device fetch when there is no
+    cache): the stages run on pool threads that cancelling can't stop, and
+    extraction may call the LLM, so a cache hit must not have started them.
+    Retrieval's query embedding then comes from the embedding cache that
+    the cache lookup just filled.
+    """
+    return asyncio.ensure_future(analysis_flight.do(normalize_text(query), lambda: _analyze(query)))
+
+
+def _discard(analysis: Optional[asyncio.Future]) -> None:
+    """Cancel analysis nobody will await, e.g. after an error (retrieving any error it already raised)."""
+    if analysis is None:
+        return
+    if not analysis.done():
+        analysis.cancel()
+    elif not analysis.cancelled():
+        analysis.exception()
+
+
 # -------------------------
 # Endpoint
 # -------------------------
 
+async def _persist_session(session_id: Optional[str], query: str, entities, steps, manual_md: str) -> str:
+    """
+    Write the session and return the id the client should use from now on:
+    the persisted row's, so /api/history/{id} and search find it. An existing
+    session keeps its transcript and is written behind the response; a new
+    one waits for its batch to commit. Falls back to the client's id (or a
+    fresh uuid) if the row could not be written in time.
+    """
+    result = {"entities": entities, "steps": steps, "manual_markdown": manual_md}
+    row_id = await persist_session(
+        SessionWrite(session_id, create={"transcript": query, **result}, update=result), need_id=True
+    )
+    if row_id is None:
+        print("Warning: session not persisted in time; returning an id history won't find")
+        return session_id or str(uuid4())
+    return str(row_id)
+
+
 @router.post("/", response_model=TroubleshootResponse)
-async def troubleshoot(req: TroubleshootRequest, db: Session = Depends(get_db)):
+async def troubleshoot(req: TroubleshootRequest, db: AsyncSession = Depends(get_db)):
     """
     Main troubleshooting endpoint:
+        - Semantic answer cache lookup
         - Entity extraction
         - Device matching
-        - Pinecone retrieval
+        - Hybrid retrieval
         - LLM reasoning
         - Store results in DB
+
+    Blocking stages run on the shared thread pool; independent stages run
+    concurrently so latency tracks the slowest stage, not the sum. Identical
+    in-flight requests are coalesced; each still gets its own session row.
     """
+    analysis = None
     try:
         query = req.transcript
+        query_key = normalize_text(query)
 
         # -------------------------
-        # 1. Extract entities (problem, device hints, issue)
+        # 1. Saved devices + query embedding (concurrently)
         # -------------------------
-        entities = extract_entities(query)
+        if ANSWER_CACHE_ENABLED:
+            device_context, query_vector = await asyncio.gather(
+                get_device_context(db),
+                run_blocking(query_cache_vector, query),
+            )
+        else:
+            # no cache lookup to wait for: analysis overlaps the device fetch
+            analysis = _start_analysis(query)
+            query_vector = None
+            device_context = await get_device_context(db)
+        # hand the connection back to the pool while the LLM runs
+        await db.close()
+        user_devices = device_context.devices
 
         # -------------------------
-        # 2. Load SAVED USER DEVICES and inject into entities
+        # 2. Semantic answer cache (same problem, same devices)
         # -------------------------
-        saved_devices = fetch_all_devices(db)
-
-        entities["user_devices"] = [
-            {
-                "type": d.type,
-                "name": d.name,
-                "model": d.model,
-                "os_version": d.os_version,
-                "notes": d.notes,
-            }
-            for d in saved_devices
-        ]
+        fingerprint = device_context.fingerprint
+        cached = troubleshoot_answer_cache.get(query_vector, fingerprint) if query_vector is not None else None
 
-        # -------------------------
-        # 3. Retrieve relevant docs from Pinecone
-        # -------------------------
-        docs = retrieve_docs(query)
+        if cached:
+            entities = dict(cached["entities"])
+            steps = [Step(**s) for s in cached["steps"]]
+            manual_md = cached["manual_markdown"]
+        else:
+            # -------------------------
+            # 3. Extract entities + retrieve relevant docs
+            # -------------------------
+            if analysis is None:
+                analysis = _start_analysis(query)
+            entities, docs = await analysis
+            # shared with coalesced requests; copy before adding per-request fields
+            entities = dict(entities)
 
-        # -------------------------
-        # 4. Generate steps + manual markdown (LLM reasoning)
-        # -------------------------
-        steps, manual_md = generate_steps_and_manual(query, docs, entities)
+            # -------------------------
+            # 4. Generate steps + manual markdown (LLM reasoning)
+            # -------------------------
+            steps, manual_md, used_docs = await generation_flight.do((query_key, fingerprint), lambda: run_blocking(
+                generate_steps_and_manual, query, docs, {**entities, "user_devices": user_devices}
+            ))
+
+            if query_vector is not None:
+                troubleshoot_answer_cache.put(query_vector, fingerprint, {
+                    "entities": dict(entities),
+                    "steps": [s.dict() for s in steps],
+                    "manual_markdown": manual_md,
+                    "sources": used_docs,
+                })
+
+        # Inject saved devices into entities
+        entities["user_devices"] = user_devices
 
         # Format steps for API response
         step_responses = [
@@ -101,34 +193,11 @@ async def troubleshoot(req: TroubleshootRequest, db: Session = Depends(get_db)):
         # -------------------------
         # 5. Session management
         # -------------------------
-
-        session_id = req.session_id or str(uuid4())
-
-        existing_session = (
-            db.query(HelpdeskSession)
-            .filter(HelpdeskSession.id == session_id)
-            .first()
-            if req.session_id
-            else None
+        session_id = await _persist_session(
+            req.session_id, query, entities,
+            [s.dict() for s in step_responses], manual_md,
         )
 
-        if existing_session:
-            existing_session.entities = entities
-            existing_session.steps = [s.dict() for s in step_responses]
-            existing_session.manual_markdown = manual_md
-            db.commit()
-            db.refresh(existing_session)
-        else:
-            new_session = HelpdeskSession(
-                transcript=query,
-                entities=entities,
-                steps=[s.dict() for s in step_responses],
-                manual_markdown=manual_md,
-            )
-            db.add(new_session)
-            db.commit()
-            db.refresh(new_session)
-
         # -------------------------
         # 6. Build final response
         # -------------------------
@@ -142,3 +211,101 @@ async def troubleshoot(req: TroubleshootRequest, db: Session = Depends(get_db)):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _discard(analysis)
+
+
+@router.post("/stream")
+async def troubleshoot_stream(req: TroubleshootRequest):
+    """
+    Server-Sent Events variant of the troubleshooting endpoint. Events:
+        entities  {"entities": {...}}
+        sources   {"sources": [...]}             context chunks used
+        step      {"id", "text", "status"}       each step as soon as it parses
+        manual    {"text": "..."}                manual_markdown deltas
+        done      full TroubleshootResponse payload (authoritative)
+    or a single `error` {"detail"}. The session row is written once the
+    answer is complete; `done` carries its id.
+    """
+    query = req.transcript
+
+    async def events():
+        # the request-scoped session may be closed before the stream ends
+        async with AsyncSessionLocal() as db:
+            # without a cache lookup to wait for, analysis overlaps the device fetch
+            analysis = None if ANSWER_CACHE_ENABLED else _start_analysis(query)
+            try:
+                device_context, query_vector = await asyncio.gather(
+                    get_device_context(db),
+                    run_blocking(query_cache_vector, query),
+                )
+                await db.close()
+                user_devices = device_context.devices
+
+                fingerprint = device_context.fingerprint
+                cached = troubleshoot_answer_cache.get(query_vector, fingerprint) if query_vector is not None else None
+
+                if cached:
+                    entities = dict(cached["entities"])
+                    steps = [Step(**s) for s in cached["steps"]]
+                    manual_md = cached["manual_markdown"]
+                    yield sse_event("entities", {"entities": {**entities, "user_devices": user_devices}})
+                    yield sse_event("sources", {"sources": cached["sources"]})
+                    for step in steps:
+                        yield sse_event("step", {"id": step.id, "text": step.text, "status": "pending"})
+                    yield sse_event("manual", {"text": manual_md})
+                else:
+                    if analysis is None:
+                        analysis = _start_analysis(query)
+                    entities, docs = await analysis
+                    entities = dict(entities)
+                    yield sse_event("entities", {"entities": {**entities, "user_devices": user_devices}})
+
+                    system_prompt, user_prompt, used_docs = await run_blocking(build_step_prompts, query, docs)
+                    yield sse_event("sources", {"sources": used_docs})
+
+                    parser = StepStreamParser()
+                    parts = []
+                    async for delta in iterate_blocking(chat_completion_stream, system_prompt, user_prompt):
+                        parts.append(delta)
+                        for kind, text in parser.feed(delta):
+                            if kind == "step":
+                                yield sse_event("step", {"id": len(parser.steps), "text": text, "status": "pending"})
+                            else:
+                                yield sse_event("manual", {"text": text})
+
+                    steps, manual_md = parse_steps_response("".join(parts), query)
+
+                    if query_vector is not None:
+                        troubleshoot_answer_cache.put(query_vector, fingerprint, {
+                            "entities": dict(entities),
+                            "steps": [s.dict() for s in steps],
+                            "manual_markdown": manual_md,
+                            "sources": used_docs,
+                        })
+
+                entities["user_devices"] = user_devices
+                step_responses = [
+                    StepResponse(id=step.id, text=step.text, status="pending")
+                    for step in steps
+                ]
+
+                session_id = await _persist_session(
+                    req.session_id, query, entities,
+                    [s.dict() for s in step_responses], manual_md,
+                )
+
+                yield sse_event("done", TroubleshootResponse(
+                    session_id=session_id,
+                    entities=entities,
+                    steps=step_responses,
+                    manual_markdown=manual_md,
+                    solution={"solution": manual_md},
+                ).dict())
+            except Exception as e:
+                print("Warning: troubleshoot stream failed:", e)
+                yield sse_event("error", {"detail": str(e)})
+            finally:
+                _discard(analysis)
+
+    return sse_response(events())
@@ -0,0 +1,334 @@
+# backend/app/db/compression.py
+
+"""
+Compressed storage for large helpdesk session fields.
+
+On SQLite, CompressedText / CompressedJSON store values of at least
+SESSION_COMPRESS_MIN_BYTES as zstd frames (BLOBs). Smaller values, and
+rows written before compression was enabled, stay plain text, and reads
+accept either form. Frames may use a shared dictionary trained on past
+sessions (see train_dictionary). Dictionaries live in the
+compression_dictionaries table, and every frame records the id of the
+dictionary it needs.
+
+Nothing in the schema reads these columns in SQL; the full-text index
+is fed decompressed text by the application (see app.db.fulltext).
+The app's own queries that need the text in SQL (history summaries) use
+the `plain_text` construct, which compiles to helpdesk_text(), a function
+registered on the app's SQLite connections.
+
+On Postgres the values pass through unchanged. TOAST already compresses
+large values, and setup_column_compression switches those columns to lz4.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import JSON, Text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator
+
+# "zstd" or "off" (existing compressed rows stay readable either way)
+SESSION_COMPRESSION = os.getenv("SESSION_COMPRESSION", "zstd").lower()
+SESSION_COMPRESS_MIN_BYTES = int(os.getenv("SESSION_COMPRESS_MIN_BYTES", "256"))
+SESSION_ZSTD_LEVEL = int(os.getenv("SESSION_ZSTD_LEVEL", "6"))
+SESSION_ZSTD_DICT_SIZE = int(os.getenv("SESSION_ZSTD_DICT_SIZE", str(112 * 1024)))
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# columns stored through these types (used by the migration and report)
+COMPRESSED_COLUMNS = ("manual_markdown", "entities", "steps")
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+# -------------------------
+# Dictionaries
+# -------------------------
+
+class DictionaryRegistry:
+    """Known zstd dictionaries by id; the newest one is used for new frames."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dicts: Dict[int, object] = {}
+        self.active_id: Optional[int] = None
+        self._loaded = False
+
+    def load(self, connection) -> None:
+        """(Re)load every dictionary from the database."""
+        zstd = _zstd()
+        rows = connection.exec_driver_sql(
+            "SELECT id, data FROM compression_dictionaries ORDER BY created_at, id"
+        ).fetchall()
+        dicts = {}
+        for dict_id, data in rows:
+            if zstd is not None:
+                d = zstd.ZstdCompressionDict(bytes(data))
+                d.precompute_compress(level=SESSION_ZSTD_LEVEL)
+                dicts[dict_id] = d
+        with self._lock:
+            self._dicts = dicts
+            self.active_id = rows[-1][0] if rows else None
+            self._loaded = True
+
+    def _ensure_loaded(self, dict_id: Optional[int] = None) -> None:
+        # a frame from a dictionary trained in another process triggers a reload
+        if self._loaded and (dict_id is None or dict_id in self._dicts):
+            return
+        from app.db.database import engine
+        with engine.connect() as connection:
+            self.load(connection)
+
+    def active(self):
+        self._ensure_loaded()
+        with self._lock:
+            return self._dicts.get(self.active_id) if self.active_id is not None else None
+
+    def get(self, dict_id: int):
+        self._ensure_loaded(dict_id)
+        with self._lock:
+            if dict_id not in self._dicts:
+                raise RuntimeError(f"zstd dictionary {dict_id} not found in compression_dictionaries")
+            return self._dicts[dict_id]
+
+
+dictionaries = DictionaryRegistry()
+
+
+# -------------------------
+# Codec
+# -------------------------
+
+def compress_bytes(raw: bytes) -> Optional[bytes]:
+    """zstd frame for `raw`, or None when compression is off or wouldn't help."""
+    if SESSION_COMPRESSION != "zstd" or len(raw) < SESSION_COMPRESS_MIN_BYTES:
+        return None
+    zstd = _zstd()
+    if zstd is None:
+        return None
+    d = dictionaries.active()
+    compressor = zstd.ZstdCompressor(level=SESSION_ZSTD_LEVEL, dict_data=d) if d is not None \
+        else zstd.ZstdCompressor(level=SESSION_ZSTD_LEVEL)
+    frame = compressor.compress(raw)
+    return frame if len(frame) < len(raw) else None
+
+
+def decompress_bytes(frame: bytes) -> bytes:
+    zstd = _zstd()
+    if zstd is None:
+        raise RuntimeError("reading compressed sessions requires zstandard (pip install zstandard)")
+    dict_id = zstd.get_frame_parameters(frame).dict_id
+    if dict_id:
+        return zstd.ZstdDecompressor(dict_data=dictionaries.get(dict_id)).decompress(frame)
+    return zstd.ZstdDecompressor().decompress(frame)
+
+
+def to_text(value):
+    """Stored value (plain text or zstd frame) as text."""
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    if isinstance(value, bytes):
+        if value.startswith(ZSTD_MAGIC):
+            value = decompress_bytes(value)
+        return value.decode("utf-8")
+    return value
+
+
+def from_text(value: Optional[str]):
+    """Value to store for `value`: a zstd frame when worthwhile, else the text."""
+    if value is None:
+        return None
+    frame = compress_bytes(value.encode("utf-8"))
+    return frame if frame is not None else value
+
+
+# -------------------------
+# Column types
+# -------------------------
+
+class CompressedText(TypeDecorator):
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return from_text(value) if dialect.name == "sqlite" else value
+
+    def process_result_value(self, value, dialect):
+        return to_text(value)
+
+
+class CompressedJSON(TypeDecorator):
+    impl = JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        # SQLite gets the serialized document (possibly compressed); others keep native JSON
+        return dialect.type_descriptor(Text() if dialect.name == "sqlite" else JSON())
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name != "sqlite" or value is None:
+            return value
+        return from_text(json.dumps(value))
+
+    def process_result_value(self, value, dialect):
+        if dialect.name != "sqlite" or value is None:
+            return value
+        return json.loads(to_text(value))
+
+
+class plain_text(FunctionElement):
+    """SQL expression for a compressed column's text (for substr, length, ...)."""
+    type = Text()
+    inherit_cache = True
+
+
+@compiles(plain_text)
+def _plain_text_default(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(plain_text, "sqlite")
+def _plain_text_sqlite(element, compiler, **kw):
+    return f"helpdesk_text({compiler.process(element.clauses, **kw)})"
+
+
+def register_sqlite_functions(dbapi_connection) -> None:
+    """helpdesk_text(x): plain text of a stored value, for the app's own read queries."""
+    dbapi_connection.create_function("helpdesk_text", 1, to_text, deterministic=True)
+
+
+# -------------------------
+# Postgres
+# -------------------------
+
+def setup_column_compression(connection) -> None:
+    """Postgres 14+: lz4 TOAST compression for the large columns (if the server supports it)."""
+    if connection.dialect.name != "postgresql":
+        return
+    for column in COMPRESSED_COLUMNS:
+        savepoint = connection.begin_nested()
+        try:
+            connection.exec_driver_sql(
+                f"ALTER TABLE helpdesk_sessions ALTER COLUMN {column} SET COMPRESSION lz4"
+            )
+            savepoint.commit()
+        except Exception as e:
+            savepoint.rollback()
+            print(f"Warning: lz4 column compression unavailable for {column}:", e)
+            return
+
+
+# -------------------------
+# Maintenance (SQLite)
+# -------------------------
+
+def train_dictionary(connection, samples: int = 2000) -> Optional[int]:
+    """
+    Train a zstd dictionary on the compressed fields of recent sessions and
+    make it the active one. Returns its id, or None if there is too little
+    data. Existing frames keep decoding with the dictionary they were
+    written with.
+    """
+    zstd = _zstd()
+    if zstd is None:
+        raise RuntimeError("training a dictionary requires zstandard (pip install zstandard)")
+    texts = []
+    for column in COMPRESSED_COLUMNS:
+        rows = connection.exec_driver_sql(
+            f"SELECT {column} FROM helpdesk_sessions WHERE {column} IS NOT NULL "
+            "ORDER BY id DESC LIMIT ?", (samples,)
+        ).fetchall()
+        texts.extend(to_text(r[0]).encode("utf-8") for r in rows if r[0])
+    if len(texts) < 10:
+        return None
+
+    trained = zstd.train_dictionary(SESSION_ZSTD_DICT_SIZE, texts)
+    connection.exec_driver_sql(
+        "INSERT INTO compression_dictionaries (id, data) VALUES (?, ?)",
+        (trained.dict_id(), trained.as_bytes()),
+    )
+    dictionaries.load(connection)
+    return trained.dict_id()
+
+
+def compress_existing(connection, batch_size: int = 500, max_rows: Optional[int] = None) -> dict:
+    """
+    Compress session fields still stored as plain text, in id order and in
+    batches of `batch_size` rows, committing after each batch so no write
+    lock is held for long. Safe to interrupt and re-run.
+    """
+    columns = ", ".join(COMPRESSED_COLUMNS)
+    after, scanned, updated = 0, 0, 0
+    while max_rows is None or scanned < max_rows:
+        limit = batch_size if max_rows is None else min(batch_size, max_rows - scanned)
+        rows = connection.exec_driver_sql(
+            f"SELECT id, {columns} FROM helpdesk_sessions WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            values = {}
+            for column, value in zip(COMPRESSED_COLUMNS, row[1:]):
+                if isinstance(value, str):
+                    frame = compress_bytes(value.encode("utf-8"))
+                    if frame is not None:
+                        values[column] = frame
+            if values:
+                updates.append((row[0], values))
+
+        for session_id, values in updates:
+            assignments = ", ".join(f"{c} = ?" for c in values)
+            connection.exec_driver_sql(
+                f"UPDATE helpdesk_sessions SET {assignments} WHERE id = ?",
+                (*values.values(), session_id),
+            )
+        connection.commit()
+
+        scanned += len(rows)
+        updated += len(updates)
+        after = rows[-1][0]
+    return {"scanned": scanned, "updated": updated}
+
+
+def storage_report(connection, batch_size: int = 500) -> dict:
+    """Per column: rows stored compressed, bytes on disk vs. uncompressed."""
+    report = {}
+    for column in COMPRESSED_COLUMNS:
+        rows, compressed, stored, logical = 0, 0, 0, 0
+        after = 0
+        while True:
+            batch = connection.exec_driver_sql(
+                f"SELECT id, {column} FROM helpdesk_sessions WHERE id > ? AND {column} IS NOT NULL "
+                "ORDER BY id LIMIT ?", (after, batch_size),
+            ).fetchall()
+            if not batch:
+                break
+            for _, value in batch:
+                raw = bytes(value) if isinstance(value, (bytes, memoryview)) else value.encode("utf-8")
+                rows += 1
+                compressed += raw.startswith(ZSTD_MAGIC)
+                stored += len(raw)
+                logical += len(to_text(value).encode("utf-8"))
+            after = batch[-1][0]
+        report[column] = {
+            "rows": rows,
+            "compressed_rows": compressed,
+            "stored_bytes": stored,
+            "uncompressed_bytes": logical,
+            "saved_bytes": logical - stored,
+            "ratio": round(logical / stored, 2) if stored else 1.0,
+        }
+    return report
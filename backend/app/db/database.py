@@ -1,16 +1,116 @@
 # backend/app/db/database.py
 
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+from app.db.compression import register_sqlite_functions
 
 # Default: SQLite (local development)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./helpdesk.db")
 
-# SQLite requires this, Postgres doesn’t
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# Connection pool per engine (requests hold a connection only while querying)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# check connections on checkout, so a restarted Postgres doesn't fail the next request
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Postgres: per-statement limit in ms (0 = none)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# SQLite: "production" (WAL + the pragmas below, applied on every connection)
+# or "default" (stock settings)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production").lower()
+SQLITE_PRAGMAS = {
+    # readers don't block the writer and vice versa
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    # fsync at checkpoints only; safe with WAL (a crash may lose the last commits, never corrupts)
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # negative = KiB, so 64 MiB of page cache per connection
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    # wait this long (ms) for the write lock instead of failing with "database is locked"
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Same database through an async driver: aiosqlite for SQLite, asyncpg
+    for Postgres. ASYNC_DATABASE_URL overrides the derived URL.
+    """
+    scheme, sep, rest = url.partition("://")
+    driver = scheme.split("+", 1)[0]
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if driver in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return ":memory:" in url or url.rstrip("/").endswith(":")
+
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        # SQLite requires this, Postgres doesn’t
+        options = {"connect_args": {"check_same_thread": False}}
+        if _is_memory_sqlite(url):
+            return options  # in-memory databases keep their single-connection pool
+        if url.startswith("sqlite+aiosqlite"):
+            # aiosqlite defaults to no pooling (a new thread per connection)
+            options["poolclass"] = AsyncAdaptedQueuePool
+    elif DB_STATEMENT_TIMEOUT_MS and url.startswith("postgresql+asyncpg"):
+        options = {"connect_args": {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}}
+    elif DB_STATEMENT_TIMEOUT_MS and url.startswith(("postgresql", "postgres")):
+        options = {"connect_args": {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}}
+    else:
+        options = {}
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+
+def _register_sqlite_functions(sync_engine, url: str) -> None:
+    """SQL functions the app's read queries use (helpdesk_text for history summaries)."""
+    if not url.startswith("sqlite"):
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _register(dbapi_connection, connection_record):
+        register_sqlite_functions(dbapi_connection)
+
+
+def _tune_sqlite(sync_engine, url: str) -> None:
+    """Apply SQLITE_PRAGMAS to every new connection of a file-backed SQLite engine."""
+    if not url.startswith("sqlite") or SQLITE_PROFILE != "production" or _is_memory_sqlite(url):
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+# Sync engine: schema setup, scripts and tests
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+_tune_sqlite(engine, DATABASE_URL)
+_register_sqlite_functions(engine, DATABASE_URL)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -18,6 +118,17 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Async engine: request handlers, so DB I/O never blocks the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+_tune_sqlite(async_engine.sync_engine, ASYNC_DATABASE_URL)
+_register_sqlite_functions(async_engine.sync_engine, ASYNC_DATABASE_URL)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,  # rows stay readable after commit without a reload
+)
+
 Base = declarative_base()
 
 
@@ -27,15 +138,58 @@ async def init_db():
     Called during FastAPI startup event.
     """
     from app.db import models  # ensures models are registered
-    Base.metadata.create_all(bind=engine)
+    from app.db.compression import dictionaries, setup_column_compression
+    from app.db.fulltext import index_missing, setup_fulltext
+
+    def _create(connection):
+        Base.metadata.create_all(bind=connection)
+
+        # create_all only builds indexes with new tables; add ones introduced later
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+        setup_column_compression(connection)
+        dictionaries.load(connection)
+        return setup_fulltext(connection)
+
+    async with async_engine.begin() as connection:
+        fill_index = await connection.run_sync(_create)
+        settings = await connection.run_sync(effective_settings)
 
+    if fill_index:
+        # a new search index is filled in committed batches, not in the schema transaction
+        async with async_engine.connect() as connection:
+            indexed = await connection.run_sync(index_missing)
+        print(f"Full-text index built for {indexed} sessions")
 
-def get_db():
+    print("Database:", ", ".join(f"{k}={v}" for k, v in settings.items()))
+
+
+def effective_settings(connection) -> dict:
+    """Driver, pool sizing and the settings the server actually reports."""
+    settings = {"url": connection.engine.url.render_as_string(hide_password=True)}
+    if hasattr(connection.engine.pool, "size"):
+        settings["pool"] = f"{connection.engine.pool.size()}+{DB_MAX_OVERFLOW}"
+        settings["pre_ping"] = DB_POOL_PRE_PING
+
+    if connection.dialect.name == "sqlite":
+        for name in SQLITE_PRAGMAS:
+            settings[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+    elif connection.dialect.name == "postgresql":
+        settings["statement_timeout"] = connection.execute(text("SHOW statement_timeout")).scalar()
+    return settings
+
+
+async def close_db():
+    """Closes pooled async connections. Called during FastAPI shutdown."""
+    await async_engine.dispose()
+
+
+async def get_db():
     """
-    FastAPI dependency — yields a DB session for each request.
+    FastAPI dependency — yields an async DB session for each request.
     """
-    db: Session = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
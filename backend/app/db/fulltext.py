@@ -0,0 +1,282 @@
+# backend/app/db/fulltext.py
+
+"""
+Full-text index over helpdesk session transcripts and manuals.
+
+SQLite: a contentless FTS5 table (helpdesk_sessions_fts) ranked with
+bm25. manual_markdown may be stored compressed, which SQL can't read, so
+the application maintains the index with the decompressed text:
+apply_writes (every session write) and retention call unindex_sessions
+before changing or deleting rows and index_sessions after writing them.
+Rows written by other clients are picked up by index_missing
+(compress_sessions.py --reindex). Snippets are built in Python for the
+page being returned, since a contentless table has no text to cut them from.
+Postgres: a weighted tsvector column filled by a trigger, with a GIN
+index, ranked with ts_rank_cd. Values there are stored plain.
+
+In both, transcript matches rank above manual matches.
+"""
+
+import re
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import text
+
+from app.db.compression import to_text
+
+FTS_TABLE = "helpdesk_sessions_fts"
+INDEXED_COLUMNS = ("transcript", "manual_markdown")
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_TOKENS = 16
+
+# objects earlier schemas kept the index in sync with; dropped on startup
+LEGACY_TRIGGERS = ("helpdesk_sessions_fts_ai", "helpdesk_sessions_fts_ad", "helpdesk_sessions_fts_au")
+LEGACY_VIEW = "helpdesk_sessions_text"
+
+# -------------------------
+# Schema
+# -------------------------
+
+SQLITE_FTS_DDL = f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        transcript, manual_markdown,
+        content='',
+        tokenize='porter unicode61'
+    )
+"""
+
+POSTGRES_DDL = [
+    "ALTER TABLE helpdesk_sessions ADD COLUMN IF NOT EXISTS search_tsv tsvector",
+    """
+    CREATE OR REPLACE FUNCTION helpdesk_sessions_tsv_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_tsv :=
+            setweight(to_tsvector('english', coalesce(NEW.transcript, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.manual_markdown, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS helpdesk_sessions_tsv ON helpdesk_sessions",
+    """
+    CREATE TRIGGER helpdesk_sessions_tsv
+    BEFORE INSERT OR UPDATE OF transcript, manual_markdown ON helpdesk_sessions
+    FOR EACH ROW EXECUTE FUNCTION helpdesk_sessions_tsv_update()
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_helpdesk_sessions_search ON helpdesk_sessions USING GIN (search_tsv)",
+]
+
+
+def setup_fulltext(connection) -> bool:
+    """
+    Create the index if missing. Runs inside init_db on a sync connection.
+
+    Returns True when a SQLite index was just created (or replaced one
+    kept in sync by triggers) and still has to be filled; init_db then
+    runs index_missing in batches, outside its schema transaction.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        existing = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).scalar()
+        if existing and "content=''" in existing:
+            return False
+        for trigger in LEGACY_TRIGGERS:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        connection.exec_driver_sql(f"DROP VIEW IF EXISTS {LEGACY_VIEW}")
+        if existing:
+            connection.exec_driver_sql(f"DROP TABLE {FTS_TABLE}")
+        connection.exec_driver_sql(SQLITE_FTS_DDL)
+        return True
+    elif dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.exec_driver_sql(statement)
+        # the trigger fills search_tsv; touching transcript fires it for old rows
+        connection.exec_driver_sql(
+            "UPDATE helpdesk_sessions SET transcript = transcript WHERE search_tsv IS NULL"
+        )
+    else:
+        print(f"Warning: full-text search not available on {dialect}")
+    return False
+
+
+# -------------------------
+# Index maintenance (SQLite)
+# -------------------------
+
+def _stored(connection, ids: List[int]) -> List[tuple]:
+    """(id, transcript, manual text) of the given sessions as currently stored."""
+    placeholders = ",".join("?" * len(ids))
+    rows = connection.exec_driver_sql(
+        f"SELECT id, transcript, manual_markdown FROM helpdesk_sessions WHERE id IN ({placeholders})",
+        tuple(ids),
+    ).fetchall()
+    return [(row[0], row[1], to_text(row[2])) for row in rows]
+
+
+def index_sessions(connection, ids: Iterable[int]) -> None:
+    """
+    Add the sessions' stored transcript and manual to the index. Call after
+    inserting or updating them, in the same transaction. No-op off SQLite.
+    """
+    ids = list(ids)
+    rows = _stored(connection, ids) if connection.dialect.name == "sqlite" and ids else []
+    if rows:
+        connection.exec_driver_sql(
+            f"INSERT INTO {FTS_TABLE}(rowid, transcript, manual_markdown) VALUES (?, ?, ?)", rows
+        )
+
+
+def unindex_sessions(connection, ids: Iterable[int]) -> None:
+    """
+    Remove the sessions from the index. Call before updating or deleting
+    them: a contentless index is told exactly which text to remove, which
+    is what is still stored. No-op off SQLite.
+    """
+    ids = list(ids)
+    rows = _stored(connection, ids) if connection.dialect.name == "sqlite" and ids else []
+    if rows:
+        connection.exec_driver_sql(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, transcript, manual_markdown) "
+            "VALUES ('delete', ?, ?, ?)", rows
+        )
+
+
+def index_missing(connection, batch_size: int = 500) -> int:
+    """
+    Index sessions the index doesn't have yet (after it was created, or
+    rows written by other clients), in id order and in batches of
+    `batch_size`, committing after each. Returns the number indexed.
+    """
+    if connection.dialect.name != "sqlite":
+        return 0
+    after, indexed = 0, 0
+    while True:
+        ids = [row[0] for row in connection.exec_driver_sql(
+            "SELECT id FROM helpdesk_sessions WHERE id > ? ORDER BY id LIMIT ?", (after, batch_size)
+        )]
+        if not ids:
+            return indexed
+        for session_id, transcript, manual in _stored(connection, ids):
+            # a session written (and indexed) by the app meanwhile is left alone
+            result = connection.exec_driver_sql(
+                f"INSERT INTO {FTS_TABLE}(rowid, transcript, manual_markdown) SELECT ?, ?, ? "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {FTS_TABLE} WHERE rowid = ?)",
+                (session_id, transcript, manual, session_id),
+            )
+            indexed += result.rowcount
+        connection.commit()
+        after = ids[-1]
+
+
+# -------------------------
+# Queries
+# -------------------------
+
+def query_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+def _sqlite_match(terms: List[str]) -> str:
+    # every term quoted (no FTS5 syntax from user input); the last one as a prefix
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _highlights(token: str, terms: List[str]) -> bool:
+    # prefix match either way: close to what porter stemming matched
+    token = token.lower()
+    return any(token.startswith(t) or (len(token) >= 3 and t.startswith(token)) for t in terms)
+
+
+def _snippet(texts: List[str], terms: List[str]) -> str:
+    """
+    Up to SNIPPET_TOKENS words around the first match in the first of
+    `texts` that has one, matched words wrapped in SNIPPET_START/END.
+    """
+    for value in texts:
+        tokens = list(re.finditer(r"\w+", value or ""))
+        hits = [i for i, m in enumerate(tokens) if _highlights(m.group(), terms)]
+        if not hits:
+            continue
+        start = max(0, min(hits[0] - 2, len(tokens) - SNIPPET_TOKENS))
+        window = tokens[start:start + SNIPPET_TOKENS]
+        parts = ["…"] if start > 0 else []
+        pos = window[0].start()
+        for m in window:
+            parts.append(value[pos:m.start()])
+            word = m.group()
+            parts.append(f"{SNIPPET_START}{word}{SNIPPET_END}" if _highlights(word, terms) else word)
+            pos = m.end()
+        if start + SNIPPET_TOKENS < len(tokens):
+            parts.append("…")
+        return "".join(parts)
+    return ""
+
+
+SQLITE_SEARCH = text(f"""
+    SELECT s.id, s.transcript, s.manual_markdown, s.created_at,
+           bm25({FTS_TABLE}, 2.0, 1.0) AS rank
+    FROM {FTS_TABLE}
+    JOIN helpdesk_sessions s ON s.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH :match
+    ORDER BY rank, s.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+# headlines are only built for the page being returned
+POSTGRES_SEARCH = text("""
+    WITH q AS (SELECT websearch_to_tsquery('english', :query) AS tsq),
+    page AS (
+        SELECT s.id, s.transcript, s.manual_markdown, s.created_at,
+               ts_rank_cd(s.search_tsv, q.tsq) AS rank
+        FROM helpdesk_sessions s, q
+        WHERE s.search_tsv @@ q.tsq
+        ORDER BY rank DESC, s.id DESC
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.id, page.transcript, page.created_at, page.rank,
+           ts_headline('english', coalesce(page.transcript, '') || ' … ' || coalesce(page.manual_markdown, ''),
+                       q.tsq, :options) AS snippet
+    FROM page, q
+    ORDER BY page.rank DESC, page.id DESC
+""")
+
+
+async def search_sessions(db, query: str, limit: int, offset: int) -> Tuple[List[dict], bool]:
+    """
+    Ranked page of sessions matching `query`. Returns (items, has_more).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        result = await db.execute(SQLITE_SEARCH, {
+            "match": _sqlite_match(terms), "limit": limit + 1, "offset": offset,
+        })
+    elif dialect == "postgresql":
+        result = await db.execute(POSTGRES_SEARCH, {
+            "query": query, "limit": limit + 1, "offset": offset,
+            "options": f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, "
+                       f"MaxWords={SNIPPET_TOKENS}, MinWords=5, MaxFragments=2",
+        })
+    else:
+        raise RuntimeError(f"full-text search not available on {dialect}")
+
+    rows = result.fetchall()
+    items = [
+        {
+            "id": str(row.id),
+            "transcript": row.transcript or "",
+            "snippet": (row.snippet or "") if dialect != "sqlite"
+            else _snippet([row.transcript, to_text(row.manual_markdown)], terms),
+            "created_at": str(row.created_at) if row.created_at else "",
+        }
+        for row in rows[:limit]
+    ]
+    return items, len(rows) > limit
@@ -1,7 +1,8 @@
 # backend/app/db/models.py
 
-from sqlalchemy import Column, Integer, Text, DateTime, func, String
-from sqlalchemy.types import JSON
+from sqlalchemy import Column, Integer, Text, DateTime, func, String, Index, LargeBinary
+from sqlalchemy.orm import deferred
+from app.db.compression import CompressedJSON, CompressedText
 from app.db.database import Base
 
 class HelpdeskSession(Base):
@@ -9,15 +10,22 @@ class HelpdeskSession(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     transcript = Column(Text, nullable=False)
-    entities = Column(JSON, nullable=True)
-    steps = Column(JSON, nullable=True)
-    manual_markdown = Column(Text, nullable=True)
+    # large payload: stored compressed, loaded only when accessed
+    # (async sessions must ask for it: options=[undefer_group("payload")])
+    entities = deferred(Column(CompressedJSON, nullable=True), group="payload")
+    steps = deferred(Column(CompressedJSON, nullable=True), group="payload")
+    manual_markdown = deferred(Column(CompressedText, nullable=True), group="payload")
 
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.now()
     )
 
+    __table_args__ = (
+        # keyset pagination for /api/history walks (created_at, id) newest first
+        Index("ix_helpdesk_sessions_created_at_id", "created_at", "id"),
+    )
+
 
 class UserDevice(Base):
     __tablename__ = "user_devices"
@@ -33,3 +41,27 @@ class UserDevice(Base):
         DateTime(timezone=True),
         server_default=func.now()
     )
+
+
+class CacheVersion(Base):
+    """
+    Monotonic version per cached dataset. Writers bump it in the same
+    transaction as the change, so every worker can tell its copy is stale.
+    """
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class CompressionDictionary(Base):
+    """Shared zstd dictionaries for compressed session fields, keyed by zstd dict id."""
+    __tablename__ = "compression_dictionaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(LargeBinary, nullable=False)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now()
+    )
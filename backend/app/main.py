@@ -26,15 +26,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ------------------------------
+# LLM CACHE BYPASS
+# ------------------------------
+from app.utils.llm_cache import llm_cache_bypass, wants_bypass
+
+@app.middleware("http")
+async def llm_cache_bypass_middleware(request, call_next):
+    token = llm_cache_bypass.set(wants_bypass(request.headers))
+    try:
+        return await call_next(request)
+    finally:
+        llm_cache_bypass.reset(token)
+
 # ------------------------------
 # DATABASE INIT
 # ------------------------------
-from app.db.database import init_db
+from app.db.database import init_db, close_db
 
 @app.on_event("startup")
 async def startup():
     await init_db()
 
+    # Load the BM25 lexical index up front so the first query doesn't pay for it
+    from app.rag.vector_search import get_lexical_index
+    get_lexical_index()
+
+    # Periodic archiving of expired sessions (ARCHIVE_INTERVAL_HOURS=0 leaves it to the CLI)
+    from app.services.retention import start_retention_job
+    start_retention_job()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    from app.services.retention import stop_retention_job
+    from app.services.session_writer import session_writer
+    from app.utils.concurrency import shutdown_blocking_pool
+    await stop_retention_job()
+    session_writer.close()
+    shutdown_blocking_pool()
+    await close_db()
+
 # ------------------------------
 # ROUTERS
 # ------------------------------
@@ -67,3 +99,26 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+@app.get("/metrics")
+async def metrics():
+    from app.utils.embeddings import embedding_cache
+    from app.rag.answer_cache import answer_cache_stats
+    from app.utils.llm_gateway import gateway
+    from app.utils.llm_cache import completion_cache_stats
+    from app.services.device_service import device_context_cache
+    from app.services.session_writer import session_writer
+    from app.services.retention import session_archive
+
+    flights = (rag.answer_flight, troubleshoot.analysis_flight, troubleshoot.generation_flight)
+
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache_stats(),
+        "llm_gateway": gateway.stats(),
+        "llm_cache": completion_cache_stats(),
+        "coalescing": {f.name: f.stats() for f in flights},
+        "device_context": device_context_cache.stats(),
+        "session_writer": session_writer.stats(),
+        "retention": session_archive.stats(),
+    }
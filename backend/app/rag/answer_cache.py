@@ -0,0 +1,133 @@
+# backend/app/rag/answer_cache.py
+
+"""
+Semantic response cache for the RAG and troubleshooting endpoints.
+
+A cached answer is served when a new query's embedding is within
+ANSWER_CACHE_THRESHOLD cosine similarity of a stored one AND the user's
+device list fingerprint is identical, so device-specific answers never leak
+across different device setups.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.embeddings import embed_text
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+
+class SemanticCache:
+    """
+    Fixed-capacity slot table: one row per entry in a preallocated float32
+    matrix, so a lookup is a single matrix-vector product plus masking.
+    Expired slots are reused first, otherwise the least recently used one.
+    """
+
+    def __init__(self, name: str, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: float = ANSWER_CACHE_TTL, max_entries: int = ANSWER_CACHE_SIZE):
+        self.name = name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self._vectors: Optional[np.ndarray] = None
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._fingerprints: List[Optional[str]] = [None] * max_entries
+        self._payloads: List[Any] = [None] * max_entries
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(vector) -> Optional[np.ndarray]:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else None
+
+    def get(self, vector, fingerprint: str) -> Optional[Any]:
+        """Best cached payload above the similarity threshold, or None."""
+        q = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            if q is None or self._vectors is None or self._vectors.shape[1] != q.shape[0]:
+                self.misses += 1
+                return None
+
+            valid = self._expires > now
+            valid &= np.fromiter((fp == fingerprint for fp in self._fingerprints), bool, self.max_entries)
+            if not valid.any():
+                self.misses += 1
+                return None
+
+            scores = np.where(valid, self._vectors @ q, -np.inf)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            return self._payloads[best]
+
+    def put(self, vector, fingerprint: str, payload: Any) -> None:
+        q = self._unit(vector)
+        if q is None or self.max_entries <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != q.shape[0]:
+                self._vectors = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+                self._expires[:] = 0
+
+            expired = np.flatnonzero(self._expires <= now)
+            slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+
+            self._vectors[slot] = q
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+            self._fingerprints[slot] = fingerprint
+            self._payloads[slot] = payload
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires[:] = 0
+            self._payloads = [None] * self.max_entries
+            self._fingerprints = [None] * self.max_entries
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": int((self._expires > time.time()).sum()),
+        }
+
+
+def query_cache_vector(query: str):
+    """Query embedding used as the cache key; None when disabled or embeddings are unavailable."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    try:
+        return embed_text(query)
+    except Exception as e:
+        print("Warning: answer cache lookup failed:", e)
+        return None
+
+
+rag_answer_cache = SemanticCache("rag_query")
+troubleshoot_answer_cache = SemanticCache("troubleshoot")
+
+
+def answer_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {c.name: c.stats() for c in (rag_answer_cache, troubleshoot_answer_cache)}
@@ -0,0 +1,269 @@
+# backend/app/rag/bm25.py
+
+"""
+BM25 inverted index over the same chunks that go into the vector store.
+
+Exact tokens such as error codes ("0x80070005", "e-22") and product names
+are kept intact so they match even when dense retrieval misses them. The
+index is persisted as a single compressed .npz (CSR-style postings plus the
+chunk texts) next to the ingestion manifest, and needs no network to query.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join(ROOT_DIR, "data", "lexical"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._\-][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[._\-]")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in is it its my "
+    "not of on or so that the this to was were what when which will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens. Compound tokens ("hp-laserjet", "0x8007.0005")
+    are kept whole and also emitted as their parts.
+    """
+    tokens = []
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok in STOPWORDS:
+            continue
+        tokens.append(tok)
+        if _SPLIT_RE.search(tok):
+            tokens.extend(p for p in _SPLIT_RE.split(tok) if p and p not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 with postings stored as flat NumPy arrays:
+    `offsets[t]:offsets[t+1]` slices `doc_idx` / `tfs` for term t.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+
+        self._vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._doc_idx = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._dirty = False
+        self._mtime: Optional[float] = None
+
+    @classmethod
+    def for_store(cls, store) -> "BM25Index":
+        index = cls(os.path.join(LEXICAL_INDEX_DIR, f"{store.slug}.npz"))
+        index.load()
+        return index
+
+    # -------------------------
+    # Mutation
+    # -------------------------
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Add or replace records of the form {"id", "text", "metadata"}."""
+        with self._lock:
+            for r in records:
+                pos = self._positions.get(r["id"])
+                if pos is None:
+                    self._positions[r["id"]] = len(self._ids)
+                    self._ids.append(r["id"])
+                    self._texts.append(r["text"])
+                    self._metadata.append(r.get("metadata", {}))
+                else:
+                    self._texts[pos] = r["text"]
+                    self._metadata[pos] = r.get("metadata", {})
+            self._dirty = True
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            drop = {self._positions[i] for i in ids if i in self._positions}
+            if not drop:
+                return
+            keep = [i for i in range(len(self._ids)) if i not in drop]
+            self._ids = [self._ids[i] for i in keep]
+            self._texts = [self._texts[i] for i in keep]
+            self._metadata = [self._metadata[i] for i in keep]
+            self._positions = {id_: i for i, id_ in enumerate(self._ids)}
+            self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids, self._texts, self._metadata, self._positions = [], [], [], {}
+            self._dirty = True
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._positions
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _build(self) -> None:
+        postings: Dict[str, Dict[int, int]] = {}
+        doc_len = np.zeros(len(self._ids), dtype=np.float32)
+        for d, text in enumerate(self._texts):
+            tokens = tokenize(text)
+            doc_len[d] = len(tokens)
+            for tok in tokens:
+                row = postings.setdefault(tok, {})
+                row[d] = row.get(d, 0) + 1
+
+        terms = sorted(postings)
+        counts = np.array([len(postings[t]) for t in terms], dtype=np.int64)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        doc_idx = np.empty(int(offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.float32)
+        for t, term in enumerate(terms):
+            row = postings[term]
+            start = offsets[t]
+            doc_idx[start:start + len(row)] = list(row.keys())
+            tfs[start:start + len(row)] = list(row.values())
+
+        self._set_arrays(terms, offsets, doc_idx, tfs, doc_len)
+        self._dirty = False
+
+    def _set_arrays(self, terms, offsets, doc_idx, tfs, doc_len) -> None:
+        self._vocab = {t: i for i, t in enumerate(terms)}
+        self._offsets, self._doc_idx, self._tfs, self._doc_len = offsets, doc_idx, tfs, doc_len
+        n = len(doc_len)
+        df = np.diff(offsets).astype(np.float32)
+        self._idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        with self._lock:
+            if self._dirty:
+                self._build()
+            docs = json.dumps({"ids": self._ids, "texts": self._texts, "metadata": self._metadata})
+            terms = sorted(self._vocab, key=self._vocab.get)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                    docs=np.frombuffer(docs.encode("utf-8"), dtype=np.uint8),
+                    offsets=self._offsets,
+                    doc_idx=self._doc_idx,
+                    tfs=self._tfs.astype(np.uint16),
+                    doc_len=self._doc_len.astype(np.uint32),
+                )
+            os.replace(tmp, path)
+            if path == self.path:
+                self._mtime = os.path.getmtime(path)
+
+    def load(self, path: Optional[str] = None) -> bool:
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return False
+        # taken before reading: a rewrite that lands mid-load is picked up next time
+        mtime = os.path.getmtime(path)
+        with np.load(path) as data, self._lock:
+            docs = json.loads(data["docs"].tobytes().decode("utf-8"))
+            raw_terms = data["terms"].tobytes().decode("utf-8")
+            terms = raw_terms.split("\n") if raw_terms else []
+            self._ids, self._texts, self._metadata = docs["ids"], docs["texts"], docs["metadata"]
+            self._positions = {id_: i for i, id_ in enumerate(self._ids)}
+            self._set_arrays(
+                terms,
+                data["offsets"],
+                data["doc_idx"],
+                data["tfs"].astype(np.float32),
+                data["doc_len"].astype(np.float32),
+            )
+            self._dirty = False
+            if path == self.path:
+                self._mtime = mtime
+        return True
+
+    def refresh_if_changed(self) -> None:
+        """Reload when the file on disk was replaced (e.g. by re-ingestion in another process)."""
+        mtime = os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime is None:
+                self.clear()
+                self._mtime = None
+            else:
+                self.load()
+
+    # -------------------------
+    # Query
+    # -------------------------
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Returns [{"id", "score", "metadata"}] with metadata["text"] set, best first."""
+        with self._lock:
+            if self._dirty:
+                self._build()
+            n = len(self._ids)
+            if n == 0 or top_k <= 0:
+                return []
+
+            avgdl = float(self._doc_len.mean()) or 1.0
+            norm = self.k1 * (1.0 - self.b + self.b * self._doc_len / avgdl)
+            scores = np.zeros(n, dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                t = self._vocab.get(term)
+                if t is None:
+                    continue
+                start, end = self._offsets[t], self._offsets[t + 1]
+                docs = self._doc_idx[start:end]
+                tf = self._tfs[start:end]
+                scores[docs] += self._idf[t] * tf * (self.k1 + 1.0) / (tf + norm[docs])
+
+            hits = np.flatnonzero(scores)
+            if hits.size == 0:
+                return []
+            k = min(top_k, hits.size)
+            top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {
+                    "id": self._ids[i],
+                    "score": float(scores[i]),
+                    "metadata": {**self._metadata[i], "text": self._texts[i]},
+                }
+                for i in top
+            ]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists by sum(1 / (k + rank)). The first list a
+    result appears in supplies its metadata.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            entry = fused.setdefault(hit["id"], {"id": hit["id"], "score": 0.0, "metadata": hit["metadata"]})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)
@@ -0,0 +1,112 @@
+# backend/app/rag/context_builder.py
+
+"""
+Context assembly between retrieval and the prompt:
+
+  1. drop near-duplicate chunks (MinHash estimate of word-shingle Jaccard)
+  2. rerank by relevance (retrieval rank blended with query-term coverage)
+  3. pack chunks, best first, into a token budget
+"""
+
+import os
+import zlib
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.rag.bm25 import tokenize
+from app.utils.tokens import count_tokens, truncate_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# chunks to retrieve before dedupe/packing trims them down
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "10"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+# a partially packed chunk must keep at least this many tokens to be useful
+MIN_PARTIAL_TOKENS = 64
+
+_NUM_PERM = 64
+_SHINGLE = 3
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(1234)
+# a, b < 2^31 and crc32 values < 2^32 keep a * x + b below 2^64 (no uint64 wraparound)
+_PERM_A = _rng.integers(1, 1 << 31, size=_NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, size=_NUM_PERM, dtype=np.uint64)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    words = text.lower().split()
+    if len(words) < _SHINGLE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a * x + b) mod p for every shingle/permutation pair, min over shingles
+    permuted = (hashes[:, None] * _PERM_A[None, :] + _PERM_B[None, :]) % np.uint64(_PRIME)
+    return permuted.min(axis=0)
+
+
+def dedupe(texts: Sequence[str], threshold: float = CONTEXT_DEDUP_THRESHOLD) -> List[int]:
+    """Indices of texts to keep, in order; later near-duplicates of earlier texts are dropped."""
+    kept: List[int] = []
+    signatures: List[np.ndarray] = []
+    for i, text in enumerate(texts):
+        sig = minhash_signature(text)
+        if any(float(np.mean(sig == other)) >= threshold for other in signatures):
+            continue
+        kept.append(i)
+        signatures.append(sig)
+    return kept
+
+
+def rerank(query: str, texts: Sequence[str]) -> List[int]:
+    """
+    Order texts (given in retrieval order) by relevance to the query:
+    half reciprocal retrieval rank, half fraction of query terms covered.
+    """
+    terms = set(tokenize(query))
+    scores = []
+    for rank, text in enumerate(texts):
+        coverage = len(terms & set(tokenize(text))) / len(terms) if terms else 0.0
+        scores.append(0.5 / (1 + rank) + 0.5 * coverage)
+    return sorted(range(len(texts)), key=lambda i: scores[i], reverse=True)
+
+
+def pack(texts: Sequence[str], token_budget: int, separator: str = "\n\n") -> List[str]:
+    """Greedy best-first packing; the last chunk that doesn't fit may be truncated."""
+    packed: List[str] = []
+    remaining = token_budget
+    sep_tokens = count_tokens(separator)
+    for text in texts:
+        cost = count_tokens(text) + (sep_tokens if packed else 0)
+        if cost <= remaining:
+            packed.append(text)
+            remaining -= cost
+        elif remaining - sep_tokens >= MIN_PARTIAL_TOKENS:
+            packed.append(truncate_tokens(text, remaining - sep_tokens))
+            remaining = 0
+        if remaining <= 0:
+            break
+    return packed
+
+
+def build_context(
+    query: str,
+    chunks: Sequence[Union[str, Dict[str, Any]]],
+    token_budget: int = None,
+    separator: str = "\n\n",
+) -> Tuple[str, List[str]]:
+    """
+    Returns (context string, chunks used). `chunks` are retrieved texts or
+    search hits ({"metadata": {"text": ...}}), best first.
+    """
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    texts = [c if isinstance(c, str) else c["metadata"].get("text", "") for c in chunks]
+    texts = [t for t in texts if t and t.strip()]
+    if not texts:
+        return "", []
+
+    unique = [texts[i] for i in dedupe(texts)]
+    ordered = [unique[i] for i in rerank(query, unique)]
+    selected = pack(ordered, token_budget, separator)
+    return separator.join(selected), selected
@@ -1,12 +1,119 @@
 # backend/app/rag/entity_extraction.py
 
 import json
+import os
+import re
 from app.utils.llm import chat_completion
+from app.services.device_matcher import match_device
 
-def extract_entities(text: str):
+# "local" (rules only), "hybrid" (rules, LLM when confidence is low) or "llm"
+ENTITY_EXTRACTION_MODE = os.getenv("ENTITY_EXTRACTION_MODE", "hybrid").lower()
+ENTITY_CONFIDENCE_THRESHOLD = float(os.getenv("ENTITY_CONFIDENCE_THRESHOLD", "0.5"))
+
+OS_PATTERNS = [
+    ("windows 11", re.compile(r"\bwin(?:dows)?\s*11\b")),
+    ("windows 10", re.compile(r"\bwin(?:dows)?\s*10\b")),
+    ("windows", re.compile(r"\bwindows\b|\bwin\s?(?:7|8)\b")),
+    ("macos", re.compile(r"\bmac\s?os\b|\bos\s?x\b|\bsonoma\b|\bventura\b|\bmonterey\b|\bbig sur\b")),
+    ("ios", re.compile(r"\bi(?:pad)?os\b")),
+    ("android", re.compile(r"\bandroid\b")),
+    ("chromeos", re.compile(r"\bchrome\s?os\b|\bchromebook\b")),
+    ("linux", re.compile(r"\blinux\b|\bubuntu\b|\bdebian\b|\bfedora\b")),
+]
+
+# OS implied by a device keyword when the text doesn't name one
+DEVICE_OS_HINTS = {
+    "iphone": "ios",
+    "ipad": "ios",
+    "macbook": "macos",
+    "android": "android",
+    "samsung": "android",
+    "galaxy tab": "android",
+}
+
+ERROR_CODE_PATTERNS = [
+    re.compile(r"\b0x[0-9a-f]{2,8}\b", re.IGNORECASE),                            # 0x80070005, 0xF1
+    re.compile(r"\bERR_[A-Z_]{3,}\b"),                                             # ERR_NAME_NOT_RESOLVED
+    re.compile(r"\b[A-Z]{1,3}-?\d{2,7}\b"),                                        # B200, E-22, KB5001330
+    re.compile(r"\b(?:error|err|code)\s*[#:]?\s*(\d{2,6}(?:/\d{2,6})?)\b", re.IGNORECASE),  # error 49, code 13/14
+]
+
+KEYWORD_VOCABULARY = {
+    "wifi": ["wifi", "wi-fi", "wireless", "network", "internet", "router", "modem", "signal", "ethernet", "dns"],
+    "bluetooth": ["bluetooth", "pairing", "pair", "headphones", "earbuds", "speaker", "airpods"],
+    "printer": ["printer", "print", "printing", "blank pages", "paper jam", "toner", "ink", "cartridge", "scanner"],
+    "password": ["password", "login", "log in", "sign in", "locked out", "reset", "account", "2fa"],
+    "software": ["install", "installation", "update", "upgrade", "driver", "drivers", "app", "application", "crash", "freezes"],
+    "performance": ["slow", "lag", "overheating", "battery", "disconnecting", "keeps dropping", "not working"],
+}
+
+_KEYWORD_PATTERNS = [
+    (kw, re.compile(rf"\b{re.escape(kw)}\b"))
+    for kws in KEYWORD_VOCABULARY.values()
+    for kw in kws
+]
+
+
+def extract_entities_local(text: str):
     """
-    Extract troubleshooting-related entities from user input.
-    Returns a dictionary: device, os, error_codes, keywords.
+    Rule-based extraction using device keywords, OS patterns, error-code
+    regexes and a keyword vocabulary. Returns (entities, confidence in [0, 1]).
+    """
+    lowered = text.lower()
+
+    device_type, device_kw = match_device(text)
+
+    os_name = next((name for name, pattern in OS_PATTERNS if pattern.search(lowered)), None)
+    if os_name is None and device_kw:
+        os_name = DEVICE_OS_HINTS.get(device_kw)
+
+    error_codes = []
+    for pattern in ERROR_CODE_PATTERNS:
+        for m in pattern.finditer(text):
+            code = m.group(1) if m.groups() else m.group(0)
+            if code not in error_codes:
+                error_codes.append(code)
+
+    keywords = [kw for kw, pattern in _KEYWORD_PATTERNS if pattern.search(lowered)]
+    if device_kw and device_kw not in keywords:
+        keywords.insert(0, device_kw)
+
+    confidence = (
+        (0.35 if device_type else 0.0)
+        + (0.2 if os_name else 0.0)
+        + (0.3 if keywords else 0.0)
+        + (0.15 if error_codes else 0.0)
+    )
+
+    entities = {
+        "device": device_kw or device_type,
+        "os": os_name,
+        "error_codes": error_codes,
+        "keywords": keywords,
+    }
+    return entities, round(confidence, 2)
+
+
+def _parse_llm_json(raw: str):
+    """Parse the model's JSON, tolerating code fences and surrounding prose."""
+    clean = raw.strip()
+    if clean.startswith("```"):
+        clean = clean.strip("`")
+        if clean.startswith("json"):
+            clean = clean[4:]
+    start, end = clean.find("{"), clean.rfind("}")
+    if start != -1 and end > start:
+        clean = clean[start:end + 1]
+    data = json.loads(clean)
+    if not isinstance(data, dict):
+        raise ValueError("entity JSON is not an object")
+    return data
+
+
+def extract_entities_llm(text: str):
+    """
+    Extract troubleshooting-related entities with a chat completion.
+    Returns None if the model response isn't valid JSON.
     """
 
     system_prompt = (
@@ -29,14 +136,46 @@ def extract_entities(text: str):
     raw = chat_completion(system_prompt, user_prompt)
 
     try:
-        data = json.loads(raw)
+        return _parse_llm_json(raw)
     except Exception:
-        # fallback in case model response isn't valid JSON
-        data = {
-            "device": None,
-            "os": None,
-            "error_codes": [],
-            "keywords": []
-        }
+        print(f"Entity extraction JSON parsing failed: {raw[:200]}")
+        return None
 
-    return data
+
+def _as_list(value):
+    """LLM list fields sometimes come back as a single string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def extract_entities(text: str):
+    """
+    Extract troubleshooting-related entities from user input.
+    Returns a dictionary: device, os, error_codes, keywords.
+
+    ENTITY_EXTRACTION_MODE picks the strategy: "local" never calls the LLM,
+    "hybrid" only calls it when the local confidence is below
+    ENTITY_CONFIDENCE_THRESHOLD, "llm" always calls it. Whenever the LLM
+    answer is unusable the local result is returned instead of empty fields.
+    """
+    local, confidence = extract_entities_local(text)
+
+    if ENTITY_EXTRACTION_MODE == "local":
+        return local
+    if ENTITY_EXTRACTION_MODE == "hybrid" and confidence >= ENTITY_CONFIDENCE_THRESHOLD:
+        return local
+
+    data = extract_entities_llm(text)
+    if data is None:
+        return local
+
+    # fill gaps in the LLM answer with what the rules found
+    return {
+        "device": data.get("device") or local["device"],
+        "os": data.get("os") or local["os"],
+        "error_codes": _as_list(data.get("error_codes")) or local["error_codes"],
+        "keywords": _as_list(data.get("keywords")) or local["keywords"],
+    }
@@ -1,5 +1,7 @@
 import os
-import uuid
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from dotenv import load_dotenv
 
 # ----------------------------------------------------
@@ -13,89 +15,235 @@ load_dotenv(ENV_PATH)
 # ----------------------------------------------------
 # Imports AFTER .env is loaded
 # ----------------------------------------------------
-from pinecone import Pinecone
-from app.utils.embeddings import embed_text
-
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "helpdesk-ai")
-
-if not PINECONE_API_KEY:
-    raise RuntimeError("❌ PINECONE_API_KEY is missing from .env")
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(PINECONE_INDEX_NAME)
+from app.utils import embeddings
+from app.utils.embeddings import embed_batches, embedding_info
+from app.rag.vector_store import create_vector_store, vector_backend
+from app.rag.manifest import IngestManifest, chunk_id, file_hash
+from app.utils.chunker import chunk_file, chunker_signature
+from app.rag.bm25 import BM25Index
 
 # Directory where documents live
 DOCS_DIR = os.path.join(ROOT_DIR, "docs", "manuals")
 
 
-def load_documents():
-    """Load all .txt and .md files from docs/manuals."""
-    if not os.path.exists(DOCS_DIR):
-        print(f"❌ Directory not found: {DOCS_DIR}")
+def list_documents(docs_dir=DOCS_DIR):
+    """Relative paths of all .txt and .md files under docs_dir, sorted."""
+    if not os.path.exists(docs_dir):
+        print(f"❌ Directory not found: {docs_dir}")
         return []
 
-    docs = []
-    for f in os.listdir(DOCS_DIR):
-        if f.endswith(".txt") or f.endswith(".md"):
-            path = os.path.join(DOCS_DIR, f)
-            with open(path, "r", encoding="utf-8") as file:
-                docs.append(file.read())
-    return docs
-
-
-def chunk_text(text: str, max_length=500):
-    """Split text into token-sized chunks."""
-    words = text.split()
-    chunks = []
-    current = []
-
-    for w in words:
-        current.append(w)
-        if len(current) >= max_length:
-            chunks.append(" ".join(current))
-            current = []
-
-    if current:
-        chunks.append(" ".join(current))
-
-    return chunks
-
-
-def ingest():
-    """Main ingestion pipeline."""
-
-    print("🚀 Starting Pinecone ingestion...")
+    paths = []
+    for dirpath, _, filenames in os.walk(docs_dir):
+        for f in filenames:
+            if f.endswith(".txt") or f.endswith(".md"):
+                rel = os.path.relpath(os.path.join(dirpath, f), docs_dir)
+                paths.append(rel.replace(os.sep, "/"))
+    return sorted(paths)
+
+
+def _groups(items, size):
+    it = iter(items)
+    while True:
+        group = list(islice(it, size))
+        if not group:
+            return
+        yield group
+
+
+def index_records(store, records, upsert_batch_size=None):
+    """
+    Embed and upsert records of the form {"id", "text", "metadata"}.
+
+    `records` may be any iterable, e.g. a generator walking the corpus. It
+    is consumed one window at a time (enough records to keep every
+    concurrent embedding request busy, and at least one upsert batch), so
+    memory holds one window plus the upsert batch being written.
+
+    Embedding runs as concurrent batched requests (see embed_batches); finished
+    vectors are grouped into upsert batches that are written by a single
+    background worker, so the store write for one batch overlaps with the
+    embedding of the next. Returns the number of records written.
+    """
+    batch_size = upsert_batch_size or store.upsert_batch_size
+    window = max(batch_size, embeddings.EMBED_BATCH_SIZE * max(1, embeddings.EMBED_MAX_CONCURRENCY))
+    pending = []
+    written = 0
+
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        in_flight = None
+
+        def flush():
+            nonlocal pending, in_flight
+            if pending:
+                if in_flight is not None:
+                    in_flight.result()  # at most one batch queued behind the embedding
+                in_flight = writer.submit(store.upsert, pending)
+                pending = []
+
+        for group in _groups(records, window):
+            for positions, vectors in embed_batches([r["text"] for r in group]):
+                for i, vector in zip(positions, vectors):
+                    record = group[i]
+                    metadata = dict(record.get("metadata", {}))
+                    metadata["text"] = record["text"]
+                    pending.append({"id": record["id"], "values": vector, "metadata": metadata})
+                    if len(pending) >= batch_size:
+                        flush()
+            written += len(group)
+        flush()
+
+        if in_flight is not None:
+            in_flight.result()
+
+    return written
+
+
+def _chunk_records(rel, chunks):
+    """Records with deterministic ids for the chunks of one source file, yielded as they are chunked."""
+    seen = {}
+    for c in chunks:
+        yield {
+            "id": chunk_id(rel, c.text, seen),
+            "text": c.text,
+            "metadata": {"source_file": rel, "chunk_index": c.index, "heading_path": c.heading},
+        }
+
+
+def sync_documents(store, docs_dir=DOCS_DIR, chunker=chunk_file, full=False, chunker_id=None):
+    """
+    Incrementally bring `store` in line with the files in docs_dir.
+
+    Chunk ids are derived from the file path and chunk content, and a
+    per-store manifest records the ids each file produced. Unchanged files
+    are skipped without being chunked; changed files only embed chunks whose
+    ids are new, and ids that disappeared (edited or deleted files) are
+    removed from the store. `full=True` ignores the manifest and re-indexes
+    everything, as does a change of chunking configuration or embedding
+    setup (provider/model/dimension; old vectors are deleted first).
+
+    `chunker(path)` yields Chunk objects for one file (default: streaming
+    chunk_file). Chunks stream from the chunker through index_records in
+    bounded windows, so neither a large manual nor the whole corpus is
+    held in memory.
+
+    The BM25 lexical index for the store is kept in step with the same chunks.
+    """
+    chunker_id = chunker_id or chunker_signature()
+    embedding = embedding_info()
+    manifest = IngestManifest.for_store(store)
+    # manifests written before embeddings were recorded are assumed to match
+    reembed = bool(manifest.files) and manifest.embedding not in (None, embedding)
+    if manifest.files and (store.count() == 0 or manifest.chunker != chunker_id or reembed):
+        # index was wiped behind our back, or chunks/vectors would come out differently
+        full = True
+    if reembed:
+        # vectors from another embedding setup must not share the index
+        print(f"Embedding setup changed ({manifest.embedding} -> {embedding}); rebuilding index")
+        old_ids = manifest.all_ids()
+        for i in range(0, len(old_ids), store.upsert_batch_size):
+            store.delete(old_ids[i:i + store.upsert_batch_size])
+    previous = {} if full else manifest.files
+
+    lexical = BM25Index.for_store(store)
+    if full:
+        lexical.clear()
+
+    stats = {"files_unchanged": 0, "files_changed": 0, "files_removed": 0, "chunks_added": 0, "chunks_deleted": 0}
+    files = {}
+    stale_ids = []
+
+    def new_records():
+        # one file at a time: chunks needing vectors are yielded to index_records,
+        # the lexical index and manifest entries are updated as each file is read
+        for rel in list_documents(docs_dir):
+            path = os.path.join(docs_dir, rel)
+            digest = file_hash(path)
+
+            entry = previous.get(rel)
+            if entry and entry["sha256"] == digest:
+                files[rel] = entry
+                stats["files_unchanged"] += 1
+                if not all(cid in lexical for cid in entry["chunk_ids"]):
+                    # vectors are current but the lexical index is missing this file
+                    lexical.add(_chunk_records(rel, chunker(path)))
+                continue
+
+            ids = []
+            known = set(entry["chunk_ids"]) if entry else set()
+            for record in _chunk_records(rel, chunker(path)):
+                ids.append(record["id"])
+                if record["id"] not in known or record["id"] not in lexical:
+                    lexical.add([record])
+                if record["id"] not in known:
+                    yield record
+            stale_ids.extend(known - set(ids))
+
+            files[rel] = {"sha256": digest, "chunk_ids": ids}
+            stats["files_changed"] += 1
+
+    stats["chunks_added"] = index_records(store, new_records())
+
+    for rel, entry in manifest.files.items():
+        if rel not in files:
+            stats["files_removed"] += 1
+    if full:
+        current = {cid for entry in files.values() for cid in entry["chunk_ids"]}
+        stale_ids = [cid for cid in manifest.all_ids() if cid not in current]
+    else:
+        stale_ids.extend(cid for rel, entry in previous.items() if rel not in files for cid in entry["chunk_ids"])
+
+    if stale_ids:
+        for i in range(0, len(stale_ids), store.upsert_batch_size):
+            store.delete(stale_ids[i:i + store.upsert_batch_size])
+    stats["chunks_deleted"] = len(stale_ids)
+
+    lexical.remove(stale_ids)
+    lexical.save()
+
+    manifest.files = files
+    manifest.chunker = chunker_id
+    manifest.embedding = embedding
+    manifest.save()
+    return stats
+
+
+def ingest(store=None, full=False):
+    """Main ingestion pipeline. Writes to the store selected by VECTOR_BACKEND."""
+
+    store = store or create_vector_store()
+
+    print(f"🚀 Starting ingestion ({vector_backend()} backend)...")
     print(f"📂 Looking for docs inside: {DOCS_DIR}")
 
-    docs = load_documents()
-    if not docs:
+    if not os.path.exists(DOCS_DIR):
+        print(f"❌ Directory not found: {DOCS_DIR}")
+        return
+    if not list_documents(DOCS_DIR):
+        # an empty (or unmounted) docs dir would otherwise prune every indexed file
         print("❌ No documents found. Add files to docs/manuals/")
         return
 
-    print(f"📄 Found {len(docs)} documents.")
-
-    total_chunks = 0
-
-    for doc in docs:
-        chunks = chunk_text(doc)
+    stats = sync_documents(store, DOCS_DIR, full=full)
 
-        for ch in chunks:
-            vector = embed_text(ch)
-            uid = str(uuid.uuid4())
+    print(
+        f"📄 Files: {stats['files_changed']} new/changed, "
+        f"{stats['files_unchanged']} unchanged, {stats['files_removed']} removed."
+    )
+    print(f"🎉 Ingestion complete! Upserted {stats['chunks_added']} chunks, deleted {stats['chunks_deleted']}.")
 
-            index.upsert([
-                {
-                    "id": uid,
-                    "values": vector,
-                    "metadata": {"text": ch}
-                }
-            ])
 
-        total_chunks += len(chunks)
-
-    print(f"🎉 Ingestion complete! Uploaded {total_chunks} chunks.")
+def rebuild_index(store=None):
+    """Regenerate the local store's derived files (quantized copy, IVF lists) without re-embedding."""
+    store = store or create_vector_store()
+    if not hasattr(store, "rebuild"):
+        print(f"Nothing to rebuild for the {vector_backend()} backend")
+        return
+    store.rebuild()
+    print(f"🎉 Rebuilt index files for {store.count()} vectors.")
 
 
 if __name__ == "__main__":
-    ingest()
+    if "--rebuild-index" in sys.argv:
+        rebuild_index()
+    else:
+        ingest(full="--full" in sys.argv)
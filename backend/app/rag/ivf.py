@@ -0,0 +1,114 @@
+# backend/app/rag/ivf.py
+
+"""
+Inverted-file (IVF) partitioning for approximate nearest-neighbour search.
+
+Vectors are clustered around `nlist` centroids with spherical k-means; each
+vector belongs to the list of its nearest centroid. A query only scores the
+vectors in its `nprobe` closest lists, so the work per query is roughly
+nprobe / nlist of a full scan. Raising nprobe trades latency for recall.
+
+Everything is plain NumPy over (optionally memory-mapped) arrays; the
+LocalVectorStore owns persistence.
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+# rows scored against the centroids at a time
+ASSIGN_BLOCK_ROWS = 65_536
+# k-means trains on at most this many sampled vectors
+TRAIN_SAMPLE = 50_000
+
+
+def default_nlist(n: int) -> int:
+    """~4 * sqrt(n) lists, the usual starting point for IVF."""
+    return max(1, min(n, int(4 * math.sqrt(n))))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = ASSIGN_BLOCK_ROWS) -> np.ndarray:
+    """Nearest centroid (by inner product) for every row, computed in blocks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on a sample of (L2-normalized) rows. Empty clusters are
+    re-seeded from random sample points.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_idx = np.sort(rng.choice(n, size=min(n, max(TRAIN_SAMPLE, nlist)), replace=False))
+    sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+    nlist = min(nlist, len(sample))
+
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+def build_lists(assignments: np.ndarray, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    CSR-style inverted lists: `order` holds row positions grouped by list,
+    list i spans order[offsets[i]:offsets[i + 1]].
+    """
+    order = np.argsort(assignments, kind="stable").astype(np.int64)
+    counts = np.bincount(assignments, minlength=nlist)
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return order, offsets
+
+
+def probe(
+    centroids: np.ndarray,
+    order: np.ndarray,
+    offsets: np.ndarray,
+    q: np.ndarray,
+    nprobe: int,
+) -> np.ndarray:
+    """Sorted row positions in the `nprobe` lists closest to the query."""
+    nprobe = max(1, min(nprobe, len(centroids)))
+    centroid_scores = centroids @ q
+    lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+    parts = [order[offsets[i]:offsets[i + 1]] for i in lists]
+    positions = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    positions.sort()
+    return positions
+
+
+class IVFState:
+    """Centroids + per-row assignments + inverted lists for one index snapshot."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray, trained_on: int,
+                 order: Optional[np.ndarray] = None, offsets: Optional[np.ndarray] = None):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_on = trained_on
+        if order is None or offsets is None:
+            order, offsets = build_lists(np.asarray(assignments), len(centroids))
+        self.order = order
+        self.offsets = offsets
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def search(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        return probe(self.centroids, self.order, self.offsets, q, nprobe)
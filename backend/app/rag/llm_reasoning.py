@@ -1,28 +1,22 @@
 ﻿# backend/app/rag/llm_reasoning.py
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 import json
 from app.utils.llm import chat_completion
+from app.rag.context_builder import build_context
 
 class Step(BaseModel):
     id: int
     text: str
 
-def generate_steps_and_manual(
-    query: str,
-    docs: List[str],
-    entities: dict
-) -> Tuple[List[Step], str]:
+def build_step_prompts(query: str, docs: List[str]) -> Tuple[str, str, List[str]]:
     """
-    Given:
-      - user problem text
-      - pinecone retrieved docs
-      - extracted entities
-    Produce:
-      - structured troubleshooting steps
-      - a markdown manual
+    System and user prompts for the steps/manual JSON answer, with the
+    retrieved docs deduped, reranked and packed into the context budget.
+    Also returns the docs that made it into the context.
     """
-    context = "\n\n".join(docs) if docs else "No relevant docs found."
+    context, used_docs = build_context(query, docs)
+    context = context or "No relevant docs found."
     
     system_prompt = (
         "You are a technical support expert. "
@@ -46,18 +40,21 @@ Respond with ONLY valid JSON in this format:
   \"manual_markdown\": \"# Solution\\n\\n## Steps\\n\\n1. First step\\n2. Second step\"
 }}
 """
-    
-    raw = chat_completion(system_prompt, user_prompt)
-    
+    return system_prompt, user_prompt, used_docs
+
+
+def parse_steps_response(raw: str, query: str) -> Tuple[List[Step], str]:
+    """
+    Parse the model's JSON answer into steps + manual markdown, falling back
+    to generic steps when the answer is unusable.
+    """
     # Try to extract JSON if LLM added extra text
     try:
-        # Remove markdown code blocks if present
+        # Remove markdown code blocks / surrounding prose if present
         clean_raw = raw.strip()
-        if clean_raw.startswith("`"):
-            clean_raw = clean_raw.split("`")[1]
-            if clean_raw.startswith("json"):
-                clean_raw = clean_raw[4:]
-        clean_raw = clean_raw.strip()
+        start, end = clean_raw.find("{"), clean_raw.rfind("}")
+        if start != -1 and end > start:
+            clean_raw = clean_raw[start:end + 1]
         
         parsed = json.loads(clean_raw)
         step_texts = parsed.get("steps", [])
@@ -83,3 +80,133 @@ Respond with ONLY valid JSON in this format:
     
     steps = [Step(id=i+1, text=s) for i, s in enumerate(step_texts)]
     return steps, manual_md
+
+
+def generate_steps_and_manual(
+    query: str,
+    docs: List[str],
+    entities: dict
+) -> Tuple[List[Step], str, List[str]]:
+    """
+    Given:
+      - user problem text
+      - retrieved docs (deduped, reranked and packed into the context budget)
+      - extracted entities
+    Produce:
+      - structured troubleshooting steps
+      - a markdown manual
+      - the docs that made it into the context
+    """
+    system_prompt, user_prompt, used_docs = build_step_prompts(query, docs)
+    raw = chat_completion(system_prompt, user_prompt)
+    steps, manual_md = parse_steps_response(raw, query)
+    return steps, manual_md, used_docs
+
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+class StepStreamParser:
+    """
+    Incremental parser for the {"steps": [...], "manual_markdown": "..."}
+    answer while it is still being generated. feed() returns events:
+      ("step", text)     once a step string is complete
+      ("manual", text)   newly decoded characters of manual_markdown
+    Text before the first "{" (code fences, prose) is ignored. This is a
+    best-effort view of a partial answer; parse_steps_response on the full
+    text stays authoritative.
+    """
+
+    def __init__(self):
+        self.steps: List[str] = []
+        self._stack: List[str] = []
+        self._started = False
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._state = "normal"   # inside a string: normal | escape | unicode
+        self._hex = ""
+        self._high_surrogate: Optional[int] = None
+        self._chars: List[str] = []
+        self._emitted = 0
+
+    def _in_manual(self) -> bool:
+        return (
+            self._in_string and not self._string_is_key
+            and len(self._stack) == 1 and self._key == "manual_markdown"
+        )
+
+    def _close_string(self, events):
+        text = "".join(self._chars)
+        self._in_string = False
+        if self._string_is_key:
+            if len(self._stack) == 1:
+                self._key = text
+        elif self._stack == ["{", "["] and self._key == "steps":
+            self.steps.append(text)
+            events.append(("step", text))
+        elif len(self._stack) == 1 and self._key == "manual_markdown" and len(text) > self._emitted:
+            events.append(("manual", text[self._emitted:]))
+
+    def _string_char(self, ch, events):
+        if self._state == "escape":
+            if ch == "u":
+                self._state, self._hex = "unicode", ""
+            else:
+                self._chars.append(_ESCAPES.get(ch, ch))
+                self._state = "normal"
+        elif self._state == "unicode":
+            self._hex += ch
+            if len(self._hex) == 4:
+                code = int(self._hex, 16)
+                if self._high_surrogate is not None and 0xDC00 <= code <= 0xDFFF:
+                    code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+                    self._high_surrogate = None
+                    self._chars.append(chr(code))
+                elif 0xD800 <= code <= 0xDBFF:
+                    self._high_surrogate = code
+                else:
+                    self._chars.append(chr(code))
+                self._state = "normal"
+        elif ch == "\\":
+            self._state = "escape"
+        elif ch == '"':
+            self._close_string(events)
+        else:
+            self._chars.append(ch)
+
+    def feed(self, delta: str) -> List[Tuple[str, str]]:
+        events: List[Tuple[str, str]] = []
+        for ch in delta:
+            if self._in_string:
+                self._string_char(ch, events)
+                continue
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append("{")
+                    self._expect_key = True
+                continue
+            if not self._stack:
+                continue  # top-level object already closed
+
+            if ch in "{[":
+                self._stack.append(ch)
+                self._expect_key = ch == "{"
+            elif ch in "}]":
+                self._stack.pop()
+            elif ch == ",":
+                self._expect_key = self._stack[-1] == "{"
+            elif ch == ":":
+                self._expect_key = False
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = self._stack[-1] == "{" and self._expect_key
+                self._chars, self._emitted = [], 0
+                self._state, self._high_surrogate = "normal", None
+
+        if self._in_manual() and len(self._chars) > self._emitted:
+            events.append(("manual", "".join(self._chars[self._emitted:])))
+            self._emitted = len(self._chars)
+        return events
@@ -0,0 +1,100 @@
+# backend/app/rag/manifest.py
+
+"""
+Ingestion manifest: remembers which chunk ids each source file produced,
+so re-ingestion only embeds new chunks and deletes vectors for removed ones.
+
+One JSON file per vector store (keyed by `VectorStore.name`) under
+INGEST_MANIFEST_DIR.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+INGEST_MANIFEST_DIR = os.getenv("INGEST_MANIFEST_DIR", os.path.join(ROOT_DIR, "data", "manifests"))
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """sha256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, chunk: str, seen: Dict[str, int]) -> str:
+    """
+    Deterministic id: hash of the source path and the chunk text. `seen`
+    counts digests within one file, so repeated identical chunks get an
+    occurrence suffix and ids stay unique.
+    """
+    digest = hashlib.sha256(f"{source}\x00{chunk}".encode("utf-8")).hexdigest()[:32]
+    n = seen.get(digest, 0)
+    seen[digest] = n + 1
+    return digest if n == 0 else f"{digest}-{n}"
+
+
+def chunk_ids(source: str, chunks: List[str]) -> List[str]:
+    """Ids for all chunks of one file (see chunk_id)."""
+    seen: Dict[str, int] = {}
+    return [chunk_id(source, chunk, seen) for chunk in chunks]
+
+
+class IngestManifest:
+    """
+    {"version": 1, "chunker": str, "embedding": {"provider", "model", "dimension"},
+     "files": {"<relative path>": {"sha256": str, "chunk_ids": [str]}}}
+
+    `chunker` records the chunking configuration the ids were produced with;
+    a different configuration invalidates every entry. `embedding` records
+    which embedding setup produced the vectors, so an index is never mixed.
+    """
+
+    def __init__(self, path: str, files: Optional[Dict[str, dict]] = None, chunker: Optional[str] = None,
+                 embedding: Optional[dict] = None):
+        self.path = path
+        self.files: Dict[str, dict] = files or {}
+        self.chunker = chunker
+        self.embedding = embedding
+
+    @staticmethod
+    def path_for(store) -> str:
+        return os.path.join(INGEST_MANIFEST_DIR, f"{store.slug}.json")
+
+    @classmethod
+    def for_store(cls, store) -> "IngestManifest":
+        return cls.load(cls.path_for(store))
+
+    @classmethod
+    def load(cls, path: str) -> "IngestManifest":
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("files", {}), data.get("chunker"), data.get("embedding"))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": MANIFEST_VERSION, "chunker": self.chunker, "embedding": self.embedding,
+                 "files": self.files},
+                f, indent=1, sort_keys=True,
+            )
+        os.replace(tmp, self.path)
+
+    def all_ids(self) -> List[str]:
+        return [cid for entry in self.files.values() for cid in entry["chunk_ids"]]
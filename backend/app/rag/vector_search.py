@@ -1,39 +1,123 @@
 # backend/app/rag/vector_search.py
 
 import os
-from pinecone import Pinecone
-from app.utils.embeddings import embed_text
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "helpdesk-ai")
+from app.utils.embeddings import embed_text, embedding_info
+from app.rag.vector_store import get_vector_store
+from app.rag.bm25 import BM25Index, reciprocal_rank_fusion
+from app.rag.manifest import IngestManifest
 
-# Initialize pinecone client and index using Pinecone class (client v3)
-if PINECONE_API_KEY:
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(PINECONE_INDEX_NAME)
-else:
-    index = None
+# "hybrid" (vector + BM25 fused with RRF), "vector" or "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+# Seconds to wait for embedding + vector search before serving lexical results only
+VECTOR_SEARCH_TIMEOUT = float(os.getenv("VECTOR_SEARCH_TIMEOUT", "3.0"))
+RRF_K = int(os.getenv("RRF_K", "60"))
 
+_vector_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vector-search")
 
-def retrieve_docs(query: str, top_k: int = 5):
+_lexical: Optional[BM25Index] = None
+_lexical_lock = threading.Lock()
+
+
+def get_lexical_index() -> Optional[BM25Index]:
     """
-    Embed the query, search Pinecone, and return retrieved text chunks.
+    BM25 index for the active vector store. Loaded once per process and
+    reloaded when ingestion rewrites the index file, so hybrid results never
+    fuse a fresh vector index with stale postings.
     """
+    global _lexical
+    if _lexical is None:
+        with _lexical_lock:
+            if _lexical is None:
+                try:
+                    _lexical = BM25Index.for_store(get_vector_store())
+                except Exception as e:
+                    print("Warning: lexical index unavailable:", e)
+                    return None
+            return _lexical
+    try:
+        _lexical.refresh_if_changed()
+    except Exception as e:
+        print("Warning: could not reload lexical index; serving the loaded one:", e)
+    return _lexical
+
+
+_compat = {"path": None, "mtime": None, "ok": True}
+_compat_lock = threading.Lock()
+
+
+def vector_index_compatible() -> bool:
+    """
+    False when the store's manifest says it was built with another embedding
+    provider/model/dimension than the one configured now. The manifest is
+    only read again when its file changes.
+    """
+    path = IngestManifest.path_for(get_vector_store())
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _compat_lock:
+        if (path, mtime) != (_compat["path"], _compat["mtime"]):
+            manifest = IngestManifest.load(path)
+            _compat["ok"] = manifest.embedding is None or manifest.embedding == embedding_info()
+            _compat["path"], _compat["mtime"] = path, mtime
+            if not _compat["ok"]:
+                print(f"Warning: vector index was built with {manifest.embedding}, "
+                      f"not the configured {embedding_info()}; re-run ingestion")
+        return _compat["ok"]
+
+
+def _vector_search(query: str, top_k: int) -> List[Dict[str, Any]]:
+    if not vector_index_compatible():
+        raise RuntimeError("vector index embedding setup mismatch")
     query_vector = embed_text(query)
+    return get_vector_store().query(query_vector, top_k=top_k)
 
-    if index is None:
-        return []
 
-    result = index.query(
-        vector=query_vector,
-        top_k=top_k,
-        include_metadata=True
-    )
+def search(query: str, top_k: int = 5, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Ranked chunks for a query: [{"id", "score", "metadata"}], metadata["text"] holds the chunk.
+
+    In hybrid mode the vector and BM25 result lists are merged with reciprocal
+    rank fusion. If the vector path fails or exceeds VECTOR_SEARCH_TIMEOUT the
+    lexical results are returned on their own.
+    """
+    mode = (mode or RETRIEVAL_MODE).lower()
+    candidates = top_k if mode == "vector" else max(top_k * 4, 20)
+
+    vector_future = None
+    if mode in ("hybrid", "vector"):
+        vector_future = _vector_pool.submit(_vector_search, query, candidates)
+
+    lexical_hits = []
+    if mode in ("hybrid", "lexical"):
+        lexical = get_lexical_index()
+        if lexical is not None:
+            lexical_hits = lexical.search(query, top_k=candidates)
+
+    vector_hits = []
+    if vector_future is not None:
+        try:
+            vector_hits = vector_future.result(timeout=VECTOR_SEARCH_TIMEOUT)
+        except Exception as e:
+            print(f"Warning: vector search unavailable ({type(e).__name__}: {e}); using lexical results")
+            vector_future.cancel()
 
+    if not lexical_hits:
+        return vector_hits[:top_k]
+    if not vector_hits:
+        return lexical_hits[:top_k]
+    return reciprocal_rank_fusion([vector_hits, lexical_hits], k=RRF_K)[:top_k]
+
+
+def retrieve_docs(query: str, top_k: int = 5):
+    """
+    Search the configured vector store (fused with BM25) and return retrieved text chunks.
+    """
     docs = []
-    for match in result.get("matches", []):
-        metadata = match.get("metadata", {})
-        txt = metadata.get("text")
+    for match in search(query, top_k=top_k):
+        txt = match["metadata"].get("text")
         if txt:
             docs.append(txt)
 
@@ -0,0 +1,546 @@
+# backend/app/rag/vector_store.py
+
+"""
+Vector store backends for RAG retrieval.
+
+`VECTOR_BACKEND` selects the implementation:
+  - "pinecone": hosted Pinecone index (default when PINECONE_API_KEY is set)
+  - "local":    in-process NumPy index backed by a memory-mapped .npy file,
+                optionally scanned through a float16/int8 quantized copy
+"""
+
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.rag import ivf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "helpdesk-ai")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(ROOT_DIR, "data", "vector_index"))
+# "float32" (exact scan), "float16" or "int8" (quantized scan + exact rescoring)
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32").lower()
+# quantized scan keeps top_k * LOCAL_RESCORE_FACTOR candidates for exact rescoring
+LOCAL_RESCORE_FACTOR = int(os.getenv("LOCAL_RESCORE_FACTOR", "4"))
+
+# "flat" (scan every vector) or "ivf" (approximate: scan only the nprobe nearest clusters)
+LOCAL_INDEX_TYPE = os.getenv("LOCAL_INDEX_TYPE", "flat").lower()
+LOCAL_IVF_NLIST = int(os.getenv("LOCAL_IVF_NLIST", "0"))  # 0 = ~4 * sqrt(n)
+LOCAL_IVF_NPROBE = int(os.getenv("LOCAL_IVF_NPROBE", "8"))
+# below this many vectors IVF isn't worth it and queries scan everything
+LOCAL_IVF_MIN_TRAIN = int(os.getenv("LOCAL_IVF_MIN_TRAIN", "1024"))
+# re-cluster once the index has grown this many times past its training size
+LOCAL_IVF_RETRAIN_FACTOR = float(os.getenv("LOCAL_IVF_RETRAIN_FACTOR", "4"))
+
+INDEX_DTYPES = ("float32", "float16", "int8")
+INDEX_TYPES = ("flat", "ivf")
+
+
+class VectorStore(ABC):
+    """
+    Minimal interface shared by every vector backend.
+
+    Records are dicts: {"id": str, "values": list[float], "metadata": dict}.
+    Query results are dicts: {"id": str, "score": float, "metadata": dict}.
+    """
+
+    # how many records ingestion should hand to a single upsert() call
+    upsert_batch_size = 100
+
+    # stable identifier of the underlying index, e.g. for ingestion manifests
+    name = "vector-store"
+
+    @property
+    def slug(self) -> str:
+        """Filesystem-safe form of `name` for sidecar files (manifest, lexical index)."""
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", self.name).strip("_")
+
+    @abstractmethod
+    def upsert(self, records: List[Dict[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: List[str]) -> None:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class PineconeVectorStore(VectorStore):
+    """Thin adapter over a Pinecone index (client v3)."""
+
+    def __init__(self, index=None, api_key: Optional[str] = None, index_name: Optional[str] = None):
+        if index is None:
+            from pinecone import Pinecone
+
+            api_key = api_key or PINECONE_API_KEY
+            if not api_key:
+                raise RuntimeError("PINECONE_API_KEY is not set")
+            index = Pinecone(api_key=api_key).Index(index_name or PINECONE_INDEX_NAME)
+        self.index = index
+        self.name = f"pinecone-{index_name or PINECONE_INDEX_NAME}"
+
+    def upsert(self, records):
+        if not records:
+            return
+        self.index.upsert(vectors=[(r["id"], list(r["values"]), r.get("metadata", {})) for r in records])
+
+    def query(self, vector, top_k=5):
+        result = self.index.query(vector=list(vector), top_k=top_k, include_metadata=True)
+        return [
+            {
+                "id": match.get("id"),
+                "score": float(match.get("score", 0.0)),
+                "metadata": match.get("metadata", {}) or {},
+            }
+            for match in result.get("matches", [])
+        ]
+
+    def delete(self, ids):
+        if ids:
+            self.index.delete(ids=list(ids))
+
+    def count(self):
+        stats = self.index.describe_index_stats()
+        total = stats.get("total_vector_count")
+        if total is None:
+            total = sum(ns.get("vector_count", 0) for ns in stats.get("namespaces", {}).values())
+        return int(total)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process cosine-similarity index.
+
+    Vectors are L2-normalized float32 rows in `<path>/vectors.npy`, opened with
+    mmap so only touched pages are resident. Ids and metadata live alongside in
+    `<path>/meta.json`. Writes rewrite both files atomically; readers pick up the
+    new files on their next query.
+
+    With dtype "float16" or "int8" a quantized copy (`vectors.<dtype>.npy`,
+    plus per-vector scales for int8) is what gets scanned: 2x / 4x less memory
+    touched per query. The best top_k * LOCAL_RESCORE_FACTOR candidates are
+    then rescored exactly against their float32 rows, so only those pages of
+    the full-precision file are read. Only writers (upsert, delete, rebuild)
+    produce the copy; a reader that finds it missing or stale scans float32.
+
+    With index_type "ivf" vectors are also clustered (see app.rag.ivf) and a
+    query only scores the `nprobe` nearest clusters. New vectors are assigned
+    to the existing clusters on insert; clustering is redone once the index
+    grows LOCAL_IVF_RETRAIN_FACTOR times past the size it was trained on.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    META_FILE = "meta.json"
+    SCALES_FILE = "scales.int8.npy"
+    IVF_FILES = ("ivf_centroids.npy", "ivf_assignments.npy", "ivf_order.npy", "ivf_offsets.npy")
+
+    # every upsert rewrites the index files, so take large batches
+    upsert_batch_size = 10_000
+
+    # rows converted to float32 at a time during a quantized scan
+    scan_block_rows = 65_536
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dtype: Optional[str] = None,
+        index_type: Optional[str] = None,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ):
+        self.path = path or LOCAL_INDEX_DIR
+        self.name = f"local-{os.path.abspath(self.path)}"
+        self.dtype = (dtype or LOCAL_INDEX_DTYPE).lower()
+        if self.dtype not in INDEX_DTYPES:
+            raise ValueError(f"Unknown LOCAL_INDEX_DTYPE '{self.dtype}' (expected one of {', '.join(INDEX_DTYPES)})")
+        self.index_type = (index_type or LOCAL_INDEX_TYPE).lower()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown LOCAL_INDEX_TYPE '{self.index_type}' (expected one of {', '.join(INDEX_TYPES)})")
+        self.nlist = LOCAL_IVF_NLIST if nlist is None else nlist
+        # tunable at runtime: more probes = better recall, slower queries
+        self.nprobe = nprobe or LOCAL_IVF_NPROBE
+        self.ivf_min_train = LOCAL_IVF_MIN_TRAIN
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.ndarray] = None
+        self._quantized: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._ivf: Optional[ivf.IVFState] = None
+        self._ids: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._mtime: Optional[float] = None
+        self._load()
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def _quantized_file(self) -> str:
+        return f"vectors.{self.dtype}.npy"
+
+    @property
+    def _quantized_source_file(self) -> str:
+        # which vectors.npy the quantized copy was derived from
+        return f"vectors.{self.dtype}.source"
+
+    def _vectors_version(self) -> str:
+        st = os.stat(self._file(self.VECTORS_FILE))
+        return f"{st.st_ino}:{st.st_mtime_ns}:{st.st_size}"
+
+    @staticmethod
+    def quantize(matrix: np.ndarray, dtype: str):
+        """(quantized rows, per-row scales or None). int8 rows are x / scale, scale = max|x| / 127."""
+        if dtype == "float16":
+            return matrix.astype(np.float16), None
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _write_quantized(self, vectors: np.ndarray):
+        """Write the quantized copy block by block (vectors may be a memmap)."""
+        np_dtype = np.float16 if self.dtype == "float16" else np.int8
+        quant_tmp = self._file(self._quantized_file + ".tmp")
+        scales = np.empty(len(vectors), dtype=np.float32)
+        if len(vectors) == 0:
+            with open(quant_tmp, "wb") as f:
+                np.save(f, np.empty(vectors.shape, dtype=np_dtype))
+        else:
+            quantized = np.lib.format.open_memmap(quant_tmp, mode="w+", dtype=np_dtype, shape=vectors.shape)
+            for start in range(0, len(vectors), self.scan_block_rows):
+                block = np.asarray(vectors[start:start + self.scan_block_rows], dtype=np.float32)
+                q, sc = self.quantize(block, self.dtype)
+                quantized[start:start + len(block)] = q
+                if sc is not None:
+                    scales[start:start + len(block)] = sc
+            quantized.flush()
+            del quantized
+
+        if self.dtype == "int8":
+            scales_tmp = self._file(self.SCALES_FILE + ".tmp")
+            with open(scales_tmp, "wb") as f:
+                np.save(f, scales)
+            os.replace(scales_tmp, self._file(self.SCALES_FILE))
+        os.replace(quant_tmp, self._file(self._quantized_file))
+
+        source_tmp = self._file(self._quantized_source_file + ".tmp")
+        with open(source_tmp, "w", encoding="utf-8") as f:
+            f.write(self._vectors_version())
+        os.replace(source_tmp, self._file(self._quantized_source_file))
+
+    def _quantized_source(self) -> Optional[str]:
+        try:
+            with open(self._file(self._quantized_source_file), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _load_quantized(self):
+        self._quantized, self._scales = None, None
+        if self.dtype == "float32" or self._vectors is None:
+            return
+        quant_path = self._file(self._quantized_file)
+        scales_path = self._file(self.SCALES_FILE)
+        needs_scales = self.dtype == "int8"
+        current = self._quantized_source() == self._vectors_version()
+        if current and os.path.exists(quant_path) and (not needs_scales or os.path.exists(scales_path)):
+            quantized = np.load(quant_path, mmap_mode="r")
+            scales = np.load(scales_path, mmap_mode="r") if needs_scales else None
+            if quantized.shape == self._vectors.shape and (scales is None or len(scales) == len(quantized)):
+                self._quantized, self._scales = quantized, scales
+                return
+        # missing or stale (vectors rewritten by a float32 writer, dtype switched,
+        # or written by an older version). Readers never write index files: scan
+        # the float32 rows exactly until the next write or rebuild() derives it.
+        print(f"Warning: no current {self.dtype} copy for {self.path}; using exact float32 scan until the index is next written")
+
+    def _write_ivf(self, vectors: np.ndarray, assignments: Optional[np.ndarray]) -> Optional[int]:
+        """
+        Persist cluster data for `vectors`; returns the training size, or None
+        when the index is too small for IVF. Rows with assignment -1 (new or
+        replaced) are assigned to the current centroids; None retrains.
+        """
+        n = len(vectors)
+        if n < self.ivf_min_train:
+            for name in self.IVF_FILES:
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            return None
+
+        current = self._ivf
+        retrain = (
+            current is None or assignments is None
+            or current.centroids.shape[1] != vectors.shape[1]
+            or n > current.trained_on * LOCAL_IVF_RETRAIN_FACTOR
+        )
+        if retrain:
+            centroids = ivf.train_centroids(vectors, self.nlist or ivf.default_nlist(n))
+            assignments = ivf.assign(vectors, centroids)
+            trained_on = n
+        else:
+            centroids, trained_on = np.asarray(current.centroids), current.trained_on
+            assignments = np.asarray(assignments, dtype=np.int32).copy()
+            new = np.flatnonzero(assignments < 0)
+            if new.size:
+                assignments[new] = ivf.assign(np.asarray(vectors)[new], centroids)
+
+        order, offsets = ivf.build_lists(assignments, len(centroids))
+        for name, array in zip(self.IVF_FILES, (centroids, assignments, order, offsets)):
+            tmp = self._file(name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, self._file(name))
+        return trained_on
+
+    def _load_ivf(self, trained_on: Optional[int]):
+        self._ivf = None
+        if self.index_type != "ivf" or self._vectors is None or len(self._vectors) < self.ivf_min_train:
+            return
+        paths = [self._file(name) for name in self.IVF_FILES]
+        if trained_on is not None and all(os.path.exists(p) for p in paths):
+            centroids, assignments, order, offsets = (np.load(p, mmap_mode="r") for p in paths)
+            if len(assignments) == len(self._vectors) and centroids.shape[1] == self._vectors.shape[1]:
+                self._ivf = ivf.IVFState(np.asarray(centroids), assignments, trained_on, order, offsets)
+                return
+        # missing or stale (index built flat or with another LOCAL_INDEX_TYPE). Readers
+        # never write index files: scan exactly until the next write clusters it.
+        print(f"Warning: no IVF lists for {self.path}; using exact scan until the index is next written")
+
+    def _load(self):
+        meta_path = self._file(self.META_FILE)
+        vectors_path = self._file(self.VECTORS_FILE)
+        if not (os.path.exists(meta_path) and os.path.exists(vectors_path)):
+            self._vectors, self._ids, self._metadata, self._positions = None, [], [], {}
+            self._quantized, self._scales, self._ivf = None, None, None
+            self._mtime = None
+            return
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._ids = meta["ids"]
+        self._metadata = meta["metadata"]
+        self._positions = {id_: i for i, id_ in enumerate(self._ids)}
+        self._vectors = np.load(vectors_path, mmap_mode="r")
+        self._mtime = os.path.getmtime(meta_path)
+        self._load_quantized()
+        self._load_ivf(meta.get("ivf_trained_on"))
+
+    def _refresh_if_changed(self):
+        meta_path = self._file(self.META_FILE)
+        mtime = os.path.getmtime(meta_path) if os.path.exists(meta_path) else None
+        if mtime != self._mtime:
+            self._load()
+
+    def _save(self, vectors: np.ndarray, ids: List[str], metadata: List[Dict[str, Any]],
+              assignments: Optional[np.ndarray] = None):
+        os.makedirs(self.path, exist_ok=True)
+        vectors_tmp = self._file(self.VECTORS_FILE + ".tmp")
+        meta_tmp = self._file(self.META_FILE + ".tmp")
+
+        with open(vectors_tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+
+        # vectors and derived files first: a reader that sees the new meta.json always finds matching vectors
+        os.replace(vectors_tmp, self._file(self.VECTORS_FILE))
+        if self.dtype != "float32":
+            self._write_quantized(vectors)
+        meta = {"ids": ids, "metadata": metadata}
+        if self.index_type == "ivf":
+            meta["ivf_trained_on"] = self._write_ivf(vectors, assignments)
+
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_tmp, self._file(self.META_FILE))
+        self._load()
+
+    def rebuild(self):
+        """Rewrite the derived files (quantized copy, IVF lists) from vectors.npy."""
+        with self._lock:
+            self._refresh_if_changed()
+            if self._vectors is None:
+                return
+            assignments = np.array(self._ivf.assignments, dtype=np.int32) if self._ivf is not None else None
+            self._save(np.array(self._vectors), list(self._ids), list(self._metadata), assignments)
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    # -------------------------
+    # VectorStore API
+    # -------------------------
+
+    def upsert(self, records):
+        if not records:
+            return
+        with self._lock:
+            self._refresh_if_changed()
+            incoming = self._normalize(np.asarray([r["values"] for r in records], dtype=np.float32))
+
+            if self._ids and self._vectors.shape[1] != incoming.shape[1]:
+                raise ValueError(
+                    f"Vector dimension {incoming.shape[1]} does not match index dimension {self._vectors.shape[1]}"
+                )
+
+            vectors = np.array(self._vectors) if self._ids else np.empty((0, incoming.shape[1]), np.float32)
+            ids = list(self._ids)
+            metadata = list(self._metadata)
+            positions = dict(self._positions)
+            # existing cluster assignments carry over; -1 marks rows to (re)assign
+            assignments = np.array(self._ivf.assignments, dtype=np.int32) if self._ivf is not None else None
+
+            appended = []
+            for row, record in zip(incoming, records):
+                pos = positions.get(record["id"])
+                if pos is None:
+                    positions[record["id"]] = len(ids)
+                    ids.append(record["id"])
+                    metadata.append(record.get("metadata", {}))
+                    appended.append(row)
+                else:
+                    if pos < len(vectors):
+                        vectors[pos] = row
+                        if assignments is not None:
+                            assignments[pos] = -1
+                    else:
+                        appended[pos - len(vectors)] = row
+                    metadata[pos] = record.get("metadata", {})
+
+            if appended:
+                vectors = np.vstack([vectors, np.asarray(appended, dtype=np.float32)])
+                if assignments is not None:
+                    assignments = np.concatenate([assignments, np.full(len(appended), -1, dtype=np.int32)])
+            self._save(vectors, ids, metadata, assignments)
+
+    def _scan(self, quantized: np.ndarray, scales: Optional[np.ndarray], q: np.ndarray) -> np.ndarray:
+        """Approximate scores from the quantized copy, converted a block at a time."""
+        scores = np.empty(len(quantized), dtype=np.float32)
+        for start in range(0, len(quantized), self.scan_block_rows):
+            end = start + self.scan_block_rows
+            block_scores = np.asarray(quantized[start:end], dtype=np.float32) @ q
+            if scales is not None:
+                block_scores *= scales[start:end]
+            scores[start:end] = block_scores
+        return scores
+
+    def query(self, vector, top_k=5, nprobe: Optional[int] = None):
+        with self._lock:
+            self._refresh_if_changed()
+            vectors, ids, metadata = self._vectors, self._ids, self._metadata
+            quantized, scales, ivf_state = self._quantized, self._scales, self._ivf
+
+        if vectors is None or len(ids) == 0 or top_k <= 0:
+            return []
+
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return []
+        q = q / norm
+
+        # IVF narrows the scan to the rows of the nprobe closest clusters
+        probed = ivf_state.search(q, nprobe or self.nprobe) if ivf_state is not None else None
+        if probed is not None and probed.size == 0:
+            return []
+
+        if quantized is None:
+            if probed is None:
+                candidates = np.arange(len(ids))
+                scores = vectors @ q
+            else:
+                candidates = probed
+                scores = np.asarray(vectors[candidates], dtype=np.float32) @ q
+        else:
+            if probed is None:
+                pool, approx = np.arange(len(ids)), self._scan(quantized, scales, q)
+            else:
+                pool = probed
+                approx = np.asarray(quantized[pool], dtype=np.float32) @ q
+                if scales is not None:
+                    approx *= scales[pool]
+            n = min(len(approx), top_k * max(1, LOCAL_RESCORE_FACTOR))
+            # sorted positions keep the float32 reads sequential within the mmap
+            candidates = np.sort(pool[np.argpartition(-approx, n - 1)[:n]])
+            scores = np.asarray(vectors[candidates], dtype=np.float32) @ q
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"id": ids[candidates[i]], "score": float(scores[i]), "metadata": metadata[candidates[i]]}
+            for i in top
+        ]
+
+    def delete(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            self._refresh_if_changed()
+            drop = {self._positions[i] for i in ids if i in self._positions}
+            if not drop:
+                return
+            keep = [i for i in range(len(self._ids)) if i not in drop]
+            self._save(
+                np.asarray(self._vectors)[keep],
+                [self._ids[i] for i in keep],
+                [self._metadata[i] for i in keep],
+                np.asarray(self._ivf.assignments)[keep] if self._ivf is not None else None,
+            )
+
+    def count(self):
+        with self._lock:
+            self._refresh_if_changed()
+            return len(self._ids)
+
+
+# -------------------------
+# Factory
+# -------------------------
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def vector_backend() -> str:
+    """Configured backend name; defaults to Pinecone only when it is configured."""
+    default = "pinecone" if PINECONE_API_KEY else "local"
+    return os.getenv("VECTOR_BACKEND", default).lower()
+
+
+def create_vector_store(backend: Optional[str] = None) -> VectorStore:
+    backend = (backend or vector_backend()).lower()
+    if backend == "pinecone":
+        return PineconeVectorStore()
+    if backend == "local":
+        return LocalVectorStore()
+    raise ValueError(f"Unknown VECTOR_BACKEND '{backend}' (expected 'pinecone' or 'local')")
+
+
+def get_vector_store() -> VectorStore:
+    """Process-wide store instance, created lazily on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_vector_store()
+    return _store
@@ -1,3 +1,5 @@
+import re
+
 DEVICE_KEYWORDS = {
     "printer": ["printer", "hp printer", "canon printer", "epson"],
     "phone": ["phone", "iphone", "samsung", "android"],
@@ -14,3 +16,24 @@ def detect_device_type(query: str):
             if kw in query:
                 return device_type
     return None
+
+
+_KEYWORD_PATTERNS = [
+    (device_type, kw, re.compile(rf"\b{re.escape(kw)}\b"))
+    for device_type, keywords in DEVICE_KEYWORDS.items()
+    for kw in keywords
+]
+
+
+def match_device(query: str):
+    """
+    Whole-word variant of detect_device_type that also returns the matched
+    keyword. The longest match wins, so "hp printer" beats "hp laptop"-style
+    partial overlaps. Returns (device_type, keyword) or (None, None).
+    """
+    query = query.lower()
+    best = (None, None)
+    for device_type, kw, pattern in _KEYWORD_PATTERNS:
+        if pattern.search(query) and (best[1] is None or len(kw) > len(best[1])):
+            best = (device_type, kw)
+    return best
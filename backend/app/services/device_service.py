@@ -1,10 +1,186 @@
 # backend/app/services/device_service.py
 
-from sqlalchemy.orm import Session
-from app.db.models import UserDevice
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-def fetch_all_devices(db: Session):
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import CacheVersion, UserDevice
+
+# Seconds a worker trusts its device context before re-reading the shared
+# version counter (picks up changes made through other workers). 0 = every request.
+DEVICE_CACHE_VERSION_TTL = float(os.getenv("DEVICE_CACHE_VERSION_TTL", "2"))
+
+DEVICES_VERSION_KEY = "user_devices"
+
+
+async def fetch_all_devices(db: AsyncSession):
     """
-    Returns all saved user devices using a normal SQLAlchemy sync session.
+    Returns all saved user devices using an async SQLAlchemy session.
     """
-    return db.query(UserDevice).all()
+    result = await db.execute(select(UserDevice))
+    return result.scalars().all()
+
+
+def device_fingerprint(devices) -> str:
+    """
+    Stable hash of the fields that feed into prompts, so cached answers are
+    only reused for an identical device list.
+    """
+    rows = sorted(
+        [d.type or "", d.name or "", d.model or "", d.os_version or "", d.notes or ""]
+        for d in devices
+    )
+    return hashlib.sha256(json.dumps(rows).encode("utf-8")).hexdigest()
+
+
+def format_devices(devices) -> str:
+    """Device block for LLM prompts."""
+    if not devices:
+        return "User has no saved devices."
+    return "\n".join([
+        f"- {d.type} | {d.name} | {d.model} | OS: {d.os_version or 'N/A'}"
+        for d in devices
+    ])
+
+
+def serialize_devices(devices) -> List[Dict[str, Any]]:
+    """Device list as returned in entities["user_devices"]."""
+    return [
+        {
+            "type": d.type,
+            "name": d.name,
+            "model": d.model,
+            "os_version": d.os_version,
+            "notes": d.notes,
+        }
+        for d in devices
+    ]
+
+
+# -------------------------
+# Version counter
+# -------------------------
+
+async def read_devices_version(db: AsyncSession) -> int:
+    result = await db.execute(select(CacheVersion.version).where(CacheVersion.name == DEVICES_VERSION_KEY))
+    return result.scalar() or 0
+
+
+async def bump_devices_version(db: AsyncSession) -> None:
+    """
+    Increment the shared device version. Call before committing a device
+    change so the bump lands in the same transaction.
+    """
+    dialect = db.bind.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else pg_insert
+        await db.execute(
+            insert(CacheVersion)
+            .values(name=DEVICES_VERSION_KEY, version=1)
+            .on_conflict_do_update(index_elements=[CacheVersion.name],
+                                   set_={"version": CacheVersion.version + 1})
+        )
+        return
+
+    result = await db.execute(
+        update(CacheVersion)
+        .where(CacheVersion.name == DEVICES_VERSION_KEY)
+        .values(version=CacheVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(CacheVersion(name=DEVICES_VERSION_KEY, version=1))
+
+
+# -------------------------
+# Device context cache
+# -------------------------
+
+class DeviceContext:
+    """Everything request handlers derive from the device list, built once."""
+
+    def __init__(self, devices, version: int):
+        self.version = version
+        self.prompt_block = format_devices(devices)
+        # shared between requests: treat as read-only
+        self.devices = serialize_devices(devices)
+        self.fingerprint = device_fingerprint(devices)
+
+
+class DeviceContextCache:
+    """
+    Process-wide DeviceContext. Device writes through this worker call
+    invalidate(); writes through other workers are noticed when the shared
+    version counter no longer matches (checked every DEVICE_CACHE_VERSION_TTL s).
+    """
+
+    def __init__(self, version_ttl: float = DEVICE_CACHE_VERSION_TTL):
+        self.version_ttl = version_ttl
+        self._lock = threading.Lock()
+        self._context: Optional[DeviceContext] = None
+        self._checked_at = 0.0
+        # bumped by invalidate(); a load that started earlier is not stored
+        self._generation = 0
+
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._context = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def _snapshot(self) -> Tuple[Optional[DeviceContext], int, bool]:
+        with self._lock:
+            fresh = time.monotonic() - self._checked_at < self.version_ttl
+            return self._context, self._generation, fresh
+
+    async def get(self, db: AsyncSession) -> DeviceContext:
+        context, generation, fresh = self._snapshot()
+        if context is not None and fresh:
+            self._count("hits")
+            return context
+
+        version = await read_devices_version(db)
+        if context is not None and context.version == version:
+            with self._lock:
+                self._checked_at = time.monotonic()
+            self._count("hits")
+            return context
+
+        context = DeviceContext(await fetch_all_devices(db), version)
+        with self._lock:
+            self.loads += 1
+            if generation == self._generation:
+                self._context = context
+                self._checked_at = time.monotonic()
+        return context
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def stats(self) -> dict:
+        context = self._context
+        return {
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "version": context.version if context is not None else None,
+            "devices": len(context.devices) if context is not None else None,
+        }
+
+
+device_context_cache = DeviceContextCache()
+
+
+async def get_device_context(db: AsyncSession) -> DeviceContext:
+    return await device_context_cache.get(db)
@@ -0,0 +1,349 @@
+# backend/app/services/retention.py
+
+"""
+Retention for helpdesk sessions: rows older than SESSION_RETENTION_DAYS are
+moved out of helpdesk_sessions into compressed JSONL segment files under
+ARCHIVE_DIR, so the hot table (and everything that scans it) stays small.
+
+Each batch of ARCHIVE_BATCH_SIZE rows is appended to the current segment
+as one compressed frame (zstd, or gzip without zstandard) and fsynced.
+index.json, replaced atomically, then records the segment's new length,
+and only after that are the rows deleted from the table in their own
+short transaction. Readers stop at the recorded length and the next
+append truncates to it, so a frame torn by a crash is never read. An
+interrupted run can repeat a batch; scans yield the first copy of an id.
+
+index.json lists every segment with its length, row count and
+created_at/id range, so scan() only opens segments that can match. Archived
+sessions are read on demand only; nothing in the request path touches them.
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+
+from sqlalchemy.orm import undefer_group
+
+from app.db.database import SessionLocal
+from app.db.fulltext import unindex_sessions
+from app.db.models import HelpdeskSession
+from app.services.session_writer import session_writer
+from app.utils.concurrency import run_blocking
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+SESSION_RETENTION_DAYS = float(os.getenv("SESSION_RETENTION_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(ROOT_DIR, "data", "archive"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_SEGMENT_ROWS = int(os.getenv("ARCHIVE_SEGMENT_ROWS", "50000"))
+# background archiving every N hours; 0 = only via archive_sessions.py
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "0"))
+
+INDEX_FILE = "index.json"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _to_utc_naive(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _record(session: HelpdeskSession) -> dict:
+    return {
+        "id": session.id,
+        "transcript": session.transcript,
+        "entities": session.entities,
+        "steps": session.steps,
+        "manual_markdown": session.manual_markdown,
+        "created_at": session.created_at.isoformat(sep=" ") if session.created_at else None,
+    }
+
+
+class _Prefix(io.RawIOBase):
+    """The first `limit` bytes of a file (closes the file with it)."""
+
+    def __init__(self, f, limit: int):
+        self._f = f
+        self._left = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._f.readinto(memoryview(buffer)[:self._left])
+        self._left -= n
+        return n
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+class _GzipReader(gzip.GzipFile):
+    """GzipFile that also closes the file object it reads from."""
+
+    def __init__(self, source):
+        super().__init__(fileobj=source, mode="rb")
+        self._source = source
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._source.close()
+
+
+class SessionArchive:
+    def __init__(self, path: str = ARCHIVE_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+
+        self.runs = 0
+        self.archived = 0
+        self.last_run: Optional[float] = None
+
+    # -------------------------
+    # Segment index
+    # -------------------------
+
+    def _index_path(self) -> str:
+        return os.path.join(self.path, INDEX_FILE)
+
+    def load_index(self) -> List[dict]:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                return json.load(f)["segments"]
+        except FileNotFoundError:
+            return []
+
+    def _save_index(self, segments: List[dict]) -> None:
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segments": segments}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._index_path())
+
+    def _current_segment(self, segments: List[dict]) -> dict:
+        # segments from before lengths were recorded are never appended to
+        if segments and "bytes" in segments[-1] and segments[-1]["rows"] < ARCHIVE_SEGMENT_ROWS:
+            return segments[-1]
+        ext = ".jsonl.zst" if _zstd() is not None else ".jsonl.gz"
+        segment = {
+            "file": f"sessions-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}{ext}",
+            "bytes": 0, "rows": 0, "min_created": None, "max_created": None, "min_id": None, "max_id": None,
+        }
+        segments.append(segment)
+        return segment
+
+    @staticmethod
+    def _compress(data: bytes, filename: str) -> bytes:
+        if filename.endswith(".zst"):
+            return _zstd().ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data)
+
+    def _append(self, segment: dict, records: List[dict]) -> None:
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with open(os.path.join(self.path, segment["file"]), "ab") as f:
+            f.truncate(segment["bytes"])  # drop a frame torn by an earlier crash
+            f.write(self._compress(data, segment["file"]))
+            f.flush()
+            os.fsync(f.fileno())
+            segment["bytes"] = os.fstat(f.fileno()).st_size
+
+        created = [r["created_at"] for r in records if r["created_at"]]
+        ids = [r["id"] for r in records]
+        segment["rows"] += len(records)
+        if created:
+            segment["min_created"] = min(filter(None, [segment["min_created"], min(created)]))
+            segment["max_created"] = max(filter(None, [segment["max_created"], max(created)]))
+        segment["min_id"] = min(filter(None, [segment["min_id"], min(ids)]))
+        segment["max_id"] = max(filter(None, [segment["max_id"], max(ids)]))
+
+    # -------------------------
+    # Archiving
+    # -------------------------
+
+    def archive_older_than(
+        self,
+        cutoff: datetime,
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        max_rows: Optional[int] = None,
+        dry_run: bool = False,
+    ) -> dict:
+        """
+        Move sessions created before `cutoff` into segment files, oldest
+        first, one short delete transaction per batch.
+        """
+        cutoff = _to_utc_naive(cutoff)
+        session_writer.sync()  # don't archive a row with an update still queued
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            segments = self.load_index()
+            moved, started = 0, time.monotonic()
+            db = SessionLocal()
+            try:
+                if dry_run:
+                    count = db.query(HelpdeskSession).filter(HelpdeskSession.created_at < cutoff).count()
+                    return {"archived": 0, "eligible": count, "seconds": 0.0}
+
+                while max_rows is None or moved < max_rows:
+                    limit = batch_size if max_rows is None else min(batch_size, max_rows - moved)
+                    batch = (
+                        db.query(HelpdeskSession)
+                        .options(undefer_group("payload"))
+                        .filter(HelpdeskSession.created_at < cutoff)
+                        .order_by(HelpdeskSession.created_at, HelpdeskSession.id)
+                        .limit(limit)
+                        .all()
+                    )
+                    if not batch:
+                        break
+
+                    segment = self._current_segment(segments)
+                    self._append(segment, [_record(s) for s in batch])
+                    self._save_index(segments)
+
+                    ids = [s.id for s in batch]
+                    unindex_sessions(db.connection(), ids)
+                    db.query(HelpdeskSession).filter(HelpdeskSession.id.in_(ids)).delete(synchronize_session=False)
+                    db.commit()
+                    db.expunge_all()
+                    moved += len(batch)
+            finally:
+                db.close()
+
+            self.runs += 1
+            self.archived += moved
+            self.last_run = time.time()
+            return {"archived": moved, "seconds": round(time.monotonic() - started, 2)}
+
+    def archive_expired(self, days: float = SESSION_RETENTION_DAYS, **kwargs) -> dict:
+        return self.archive_older_than(datetime.utcnow() - timedelta(days=days), **kwargs)
+
+    # -------------------------
+    # On-demand scan
+    # -------------------------
+
+    def _read(self, segment: dict) -> Iterator[dict]:
+        filename = segment["file"]
+        source = open(os.path.join(self.path, filename), "rb")
+        if "bytes" in segment:
+            # only frames the index has committed; anything after is a torn write
+            source = _Prefix(source, segment["bytes"])
+        if filename.endswith(".zst"):
+            raw = _zstd().ZstdDecompressor().stream_reader(source, read_across_frames=True, closefd=True)
+        else:
+            raw = _GzipReader(source)
+        with io.TextIOWrapper(raw, encoding="utf-8") as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+    def scan(
+        self,
+        query: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        session_id: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """
+        Archived sessions matching all given filters (case-insensitive
+        substring on transcript/manual, created_at range, id), in archive
+        order. Segments whose recorded range can't match are skipped unread;
+        the rest are streamed, holding only the ids already yielded.
+        """
+        since_s = _to_utc_naive(since).isoformat(sep=" ") if since else None
+        until_s = _to_utc_naive(until).isoformat(sep=" ") if until else None
+        needle = query.lower() if query else None
+        seen = set()
+
+        for segment in self.load_index():
+            if since_s and segment["max_created"] and segment["max_created"] < since_s:
+                continue
+            if until_s and segment["min_created"] and segment["min_created"] >= until_s:
+                continue
+            if session_id is not None and segment["min_id"] is not None and \
+                    not segment["min_id"] <= session_id <= segment["max_id"]:
+                continue
+
+            for record in self._read(segment):
+                if record["id"] in seen:
+                    continue  # a batch repeated after an interrupted run
+                seen.add(record["id"])
+                created = record["created_at"] or ""
+                if since_s and created < since_s:
+                    continue
+                if until_s and created >= until_s:
+                    continue
+                if session_id is not None and record["id"] != session_id:
+                    continue
+                if needle and needle not in (record["transcript"] or "").lower() \
+                        and needle not in (record["manual_markdown"] or "").lower():
+                    continue
+                yield record
+
+    def stats(self) -> dict:
+        segments = self.load_index() if os.path.isdir(self.path) else []
+        return {
+            "retention_days": SESSION_RETENTION_DAYS,
+            "segments": len(segments),
+            "archived_rows": sum(s["rows"] for s in segments),
+            "runs": self.runs,
+            "archived_this_process": self.archived,
+            "last_run": self.last_run,
+        }
+
+
+session_archive = SessionArchive()
+
+
+# -------------------------
+# Background job
+# -------------------------
+
+_job: Optional[asyncio.Task] = None
+
+
+async def _run_periodically(interval_hours: float) -> None:
+    while True:
+        try:
+            result = await run_blocking(session_archive.archive_expired)
+            if result["archived"]:
+                print(f"Archived {result['archived']} sessions older than {SESSION_RETENTION_DAYS} days")
+        except Exception as e:
+            print("Warning: session archiving failed:", e)
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def start_retention_job(interval_hours: float = ARCHIVE_INTERVAL_HOURS) -> None:
+    """Schedule archiving on the running loop (no-op when the interval is 0)."""
+    global _job
+    if interval_hours > 0 and (_job is None or _job.done()):
+        _job = asyncio.get_running_loop().create_task(_run_periodically(interval_hours))
+
+
+async def stop_retention_job() -> None:
+    global _job
+    if _job is not None:
+        _job.cancel()
+        try:
+            await _job
+        except asyncio.CancelledError:
+            pass
+        _job = None
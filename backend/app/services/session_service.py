@@ -0,0 +1,16 @@
+# backend/app/services/session_service.py
+
+from typing import Optional
+
+
+def session_pk(session_id) -> Optional[int]:
+    """
+    Primary key for a client-supplied session id, or None. Clients may send
+    UUIDs (from /transcribe); those never match a row, and strict drivers
+    like asyncpg reject them outright as integer parameters.
+    """
+    try:
+        return int(session_id)
+    except (TypeError, ValueError):
+        return None
+
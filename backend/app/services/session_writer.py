@@ -0,0 +1,313 @@
+# backend/app/services/session_writer.py
+
+"""
+Write-behind persistence for helpdesk sessions.
+
+Handlers hand a SessionWrite to the writer and return without touching the
+database. A background thread groups queued writes into one transaction,
+flushing when SESSION_WRITE_BATCH_SIZE writes are waiting or
+SESSION_WRITE_FLUSH_MS after the first one arrived, whichever comes first.
+sync() waits until everything queued so far is committed, which is how
+/api/history reads its own writes. close() drains the queue at shutdown.
+
+A caller that needs the id of a new row (the troubleshoot endpoints return
+it) waits for its own write's batch only; updates of an existing row never
+wait.
+
+With SESSION_WRITE_BEHIND=false, or when the queue is full, writes are
+applied immediately on the blocking pool instead.
+"""
+
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.db.database import SessionLocal
+from app.db.fulltext import INDEXED_COLUMNS, index_sessions, unindex_sessions
+from app.db.models import HelpdeskSession
+from app.services.session_service import session_pk
+from app.utils.concurrency import run_blocking
+
+SESSION_WRITE_BEHIND = os.getenv("SESSION_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+SESSION_WRITE_BATCH_SIZE = int(os.getenv("SESSION_WRITE_BATCH_SIZE", "100"))
+SESSION_WRITE_FLUSH_MS = float(os.getenv("SESSION_WRITE_FLUSH_MS", "200"))
+SESSION_WRITE_QUEUE_MAX = int(os.getenv("SESSION_WRITE_QUEUE_MAX", "10000"))
+# longest a history read waits for pending writes, and shutdown for the queue to drain
+SESSION_WRITE_SYNC_TIMEOUT = float(os.getenv("SESSION_WRITE_SYNC_TIMEOUT", "2"))
+SESSION_WRITE_DRAIN_TIMEOUT = float(os.getenv("SESSION_WRITE_DRAIN_TIMEOUT", "10"))
+
+# queue markers: end the current batch now / end the current batch and exit
+_FLUSH = object()
+_STOP = object()
+
+
+@dataclass
+class SessionWrite:
+    """
+    Insert or update of one session. If `session_id` names an existing row
+    it receives `update`; otherwise a new row is created from `create`.
+    `row_id` is set once the write is applied.
+    """
+    session_id: Any = None
+    create: Dict[str, Any] = field(default_factory=dict)
+    update: Dict[str, Any] = field(default_factory=dict)
+    seq: int = 0
+    row_id: Optional[int] = None
+
+
+def apply_writes(db, writes: List[SessionWrite]) -> None:
+    """
+    Apply writes in order on a sync session (the caller commits), keeping
+    the full-text index in step with the rows' new text.
+    """
+    pks = {session_pk(w.session_id) for w in writes} - {None}
+    existing = {}
+    if pks:
+        existing = {s.id: s for s in db.query(HelpdeskSession).filter(HelpdeskSession.id.in_(pks))}
+
+    # rows whose text changes leave the index first; all written rows are added back below
+    reindex = {
+        session_pk(w.session_id) for w in writes
+        if session_pk(w.session_id) in existing and any(name in INDEXED_COLUMNS for name in w.update)
+    }
+    unindex_sessions(db.connection(), reindex)
+
+    rows = []
+    for write in writes:
+        row = existing.get(session_pk(write.session_id))
+        if row is not None:
+            for name, value in write.update.items():
+                setattr(row, name, value)
+        else:
+            row = HelpdeskSession(**write.create)
+            db.add(row)
+        rows.append(row)
+
+    db.flush()
+    for write, row in zip(writes, rows):
+        write.row_id = row.id
+    index_sessions(db.connection(), reindex | {row.id for row in rows if row.id not in existing})
+
+
+class SessionWriter:
+    def __init__(
+        self,
+        batch_size: int = SESSION_WRITE_BATCH_SIZE,
+        flush_ms: float = SESSION_WRITE_FLUSH_MS,
+        max_queue: int = SESSION_WRITE_QUEUE_MAX,
+        enabled: bool = SESSION_WRITE_BEHIND,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_ms / 1000.0
+        self.enabled = enabled
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+        self.submitted = 0     # also the seq of the newest queued write
+        self.flushed_seq = 0   # every write with seq <= this has been handled
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.inline = 0
+
+    # -------------------------
+    # Producer side
+    # -------------------------
+
+    def submit(self, write: SessionWrite) -> bool:
+        """Queue a write. False if write-behind is off or the queue is full."""
+        if not self.enabled:
+            return False
+        self._ensure_thread()
+        with self._lock:
+            self.submitted += 1
+            write.seq = self.submitted
+            try:
+                self._queue.put_nowait(write)
+            except queue.Full:
+                self.submitted -= 1
+                return False
+        return True
+
+    def write_now(self, write: SessionWrite) -> Optional[int]:
+        """Apply one write immediately, bypassing the queue (blocking); returns its row id."""
+        self._count("inline")
+        db = SessionLocal()
+        try:
+            apply_writes(db, [write])
+            db.commit()
+        finally:
+            db.close()
+        return write.row_id
+
+    def sync(self, timeout: float = SESSION_WRITE_SYNC_TIMEOUT) -> bool:
+        """
+        Block until every write submitted before this call is committed (or
+        failed). Pending writes are flushed right away rather than on the timer.
+        """
+        with self._lock:
+            target = self.submitted
+        return self._wait_for(target, timeout)
+
+    def wait(self, write: SessionWrite, timeout: float = SESSION_WRITE_SYNC_TIMEOUT) -> Optional[int]:
+        """Block until `write` (already submitted) is committed; its row id, or None if it failed or timed out."""
+        self._wait_for(write.seq, timeout)
+        return write.row_id
+
+    def _wait_for(self, target: int, timeout: float) -> bool:
+        with self._lock:
+            if self.flushed_seq >= target or self._thread is None:
+                return True
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass  # a full queue is flushing in batch_size steps anyway
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self.flushed_seq < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._flushed.wait(remaining):
+                    return self.flushed_seq >= target
+            return True
+
+    def close(self, timeout: float = SESSION_WRITE_DRAIN_TIMEOUT) -> None:
+        """Write everything still queued, then stop the thread (it restarts on the next submit)."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"Warning: session writer did not drain within {timeout}s; {self.depth} writes pending")
+            return
+        with self._lock:
+            self._thread = None
+
+    # -------------------------
+    # Writer thread
+    # -------------------------
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [] if item is _FLUSH or item is _STOP else [item]
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP and item is not _FLUSH and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is not _FLUSH and item is not _STOP:
+                    batch.append(item)
+
+            if batch:
+                self._write(batch)
+            if item is _STOP:
+                # writes queued behind the stop marker still get written
+                rest = self._drain()
+                if rest:
+                    self._write(rest)
+                return
+
+    def _drain(self) -> List[SessionWrite]:
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not _FLUSH and item is not _STOP:
+                items.append(item)
+
+    def _write(self, batch: List[SessionWrite]) -> None:
+        db = SessionLocal()
+        written, failed = len(batch), 0
+        try:
+            apply_writes(db, batch)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Warning: session batch of {len(batch)} failed ({e}); retrying one by one")
+            written = 0
+            for write in batch:
+                write.row_id = None  # ids from the rolled-back batch
+                try:
+                    apply_writes(db, [write])
+                    db.commit()
+                    written += 1
+                except Exception as e:
+                    db.rollback()
+                    failed += 1
+                    print("Warning: failed to persist session for history:", e)
+        finally:
+            db.close()
+
+        with self._flushed:
+            self.batches += 1
+            self.written += written
+            self.failed += failed
+            self.flushed_seq = max(self.flushed_seq, batch[-1].seq)
+            self._flushed.notify_all()
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    @property
+    def depth(self) -> int:
+        with self._lock:
+            return self.submitted - self.flushed_seq
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self.depth,
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "inline": self.inline,
+        }
+
+
+session_writer = SessionWriter()
+
+
+def _session_exists(pk: int) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(HelpdeskSession.id).filter(HelpdeskSession.id == pk).first() is not None
+    finally:
+        db.close()
+
+
+async def persist_session(write: SessionWrite, need_id: bool = False) -> Optional[int]:
+    """
+    Queue a session write; applies it on the blocking pool if it can't be queued.
+
+    With `need_id`, returns the persisted row's id: at once for an update of
+    an existing row, otherwise after the batch holding the new row commits.
+    None if that write failed or took longer than SESSION_WRITE_SYNC_TIMEOUT.
+    """
+    pk = session_pk(write.session_id)
+    known = pk if need_id and pk is not None and await run_blocking(_session_exists, pk) else None
+    if not session_writer.submit(write):
+        return await run_blocking(session_writer.write_now, write)
+    if not need_id or known is not None:
+        return known
+    return await run_blocking(session_writer.wait, write)
@@ -1,7 +1,7 @@
 # backend/app/services/whisper_service.py
 
 """
-Whisper transcription using OpenAI API.
+Whisper transcription using OpenAI API (through the shared LLM gateway).
 """
 
 from dotenv import load_dotenv
@@ -9,13 +9,10 @@ import os
 import io
 from fastapi import UploadFile
 
-load_dotenv()
+from app.utils.concurrency import run_blocking
+from app.utils.llm_gateway import gateway
 
-try:
-    from openai import OpenAI
-    _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-except Exception:
-    _client = None
+load_dotenv()
 
 
 def transcribe_bytes(
@@ -27,7 +24,7 @@ def transcribe_bytes(
     """
     Transcribe raw audio bytes using OpenAI Whisper API.
     """
-    if _client is None:
+    if not os.getenv("OPENAI_API_KEY"):
         raise RuntimeError("OpenAI client not configured")
 
     model = model or os.getenv("WHISPER_MODEL", "whisper-1")
@@ -35,11 +32,7 @@ def transcribe_bytes(
     audio_file = io.BytesIO(audio_bytes)
     audio_file.name = filename
 
-    resp = _client.audio.transcriptions.create(
-        file=audio_file,
-        model=model,
-        language=language
-    )
+    resp = gateway.transcribe(model, audio_file, language=language)
 
     if hasattr(resp, "text"):
         return resp.text
@@ -53,6 +46,7 @@ def transcribe_bytes(
 async def transcribe_audio(file: UploadFile) -> str:
     """
     FastAPI wrapper for uploaded audio file.
+    The blocking API call runs on the shared thread pool.
     """
     audio_bytes = await file.read()
-    return transcribe_bytes(audio_bytes, filename=file.filename)
+    return await run_blocking(transcribe_bytes, audio_bytes, filename=file.filename)
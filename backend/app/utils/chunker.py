@@ -1,24 +1,193 @@
 # backend/app/utils/chunker.py
 
-from typing import List
+"""
+Streaming, token-aware chunker for manuals.
 
-def chunk_text(text: str, max_chars: int = 800) -> List[str]:
+Input is consumed line by line, so a file is never loaded whole. Markdown
+headings are hard boundaries and their path ("WiFi > Windows > Drivers") is
+attached to every chunk beneath them. Inside a section, text is split into
+sentences (list items and code lines are their own units) and packed into
+chunks of at most `max_tokens`, with the last `overlap_tokens` worth of
+sentences repeated at the start of the next chunk. Every unit is tokenized
+once, so the cost is linear in the input size.
+"""
+
+import io
+import os
+import re
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.utils.tokens import count_tokens
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# bump when the chunking rules change so ingestion manifests re-chunk everything
+CHUNKER_VERSION = "2"
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_LIST_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+
+class Chunk(NamedTuple):
+    text: str
+    heading_path: Tuple[str, ...]
+    index: int
+
+    @property
+    def heading(self) -> str:
+        return " > ".join(h for h in self.heading_path if h)
+
+
+def chunker_signature(max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> str:
+    """Identifies the chunking configuration, e.g. for ingestion manifests."""
+    return f"v{CHUNKER_VERSION}:{max_tokens or CHUNK_MAX_TOKENS}:{CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens}"
+
+
+def _split_long(unit: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Break a unit longer than max_tokens on word boundaries."""
+    words, count = [], 0
+    for word in unit.split():
+        n = count_tokens(" " + word)
+        if words and count + n > max_tokens:
+            yield " ".join(words), count
+            words, count = [], 0
+        words.append(word)
+        count += n
+    if words:
+        yield " ".join(words), count
+
+
+def _units(lines: Iterable[str]) -> Iterator[Tuple[str, object]]:
     """
-    Splits long text into smaller chunks for embedding/storage.
-    Uses character-based chunking with sentence boundary preference.
+    Yields ("heading", (level, title)) or ("text", (sentence, starts_paragraph)).
     """
-    text = text.strip()
-    chunks = []
+    paragraph: List[str] = []
+    in_code = False
+
+    def flush():
+        if not paragraph:
+            return
+        text = " ".join(paragraph)
+        paragraph.clear()
+        for i, sentence in enumerate(_SENTENCE_RE.split(text)):
+            if sentence.strip():
+                yield "text", (sentence.strip(), i == 0)
+
+    for raw in lines:
+        line = raw.rstrip("\n").rstrip()
 
-    while len(text) > max_chars:
-        cut = text.rfind(".", 0, max_chars)
-        if cut == -1:
-            cut = max_chars
-        chunk = text[:cut].strip()
-        chunks.append(chunk)
-        text = text[cut:].strip()
+        if line.lstrip().startswith("```"):
+            yield from flush()
+            in_code = not in_code
+            yield "text", (line, True)
+            continue
+        if in_code:
+            yield "text", (line, True)
+            continue
 
-    if text:
-        chunks.append(text)
+        heading = _HEADING_RE.match(line)
+        if heading:
+            yield from flush()
+            yield "heading", (len(heading.group(1)), heading.group(2))
+            continue
 
-    return chunks
+        if not line.strip():
+            yield from flush()
+        elif _LIST_RE.match(line):
+            yield from flush()
+            paragraph.append(line.strip())
+        else:
+            paragraph.append(line.strip())
+
+    yield from flush()
+
+
+def iter_chunks(
+    lines: Iterable[str],
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Iterator[Chunk]:
+    """Chunk a stream of lines (e.g. an open file)."""
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    overlap_tokens = min(CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens, max_tokens // 2)
+
+    headings: List[str] = []
+    window: deque = deque()  # (text, tokens, starts_paragraph)
+    window_tokens = 0
+    fresh = 0  # units in the window not yet emitted in any chunk
+    index = 0
+
+    def emit():
+        nonlocal index
+        parts = []
+        for text, _, starts_paragraph in window:
+            parts.append(("\n" if starts_paragraph else " ") + text if parts else text)
+        chunk = Chunk("".join(parts).strip(), tuple(headings), index)
+        index += 1
+        return chunk
+
+    def keep_overlap():
+        # retain the longest suffix of the window that fits in overlap_tokens
+        nonlocal window_tokens, fresh
+        kept = 0
+        suffix = deque()
+        for unit in reversed(window):
+            if kept + unit[1] > overlap_tokens:
+                break
+            suffix.appendleft(unit)
+            kept += unit[1]
+        window.clear()
+        window.extend(suffix)
+        window_tokens = kept
+        fresh = 0
+
+    for kind, value in _units(lines):
+        if kind == "heading":
+            if fresh:
+                yield emit()
+            window.clear()
+            window_tokens, fresh = 0, 0
+            level, title = value
+            del headings[level - 1:]
+            headings.extend([""] * (level - 1 - len(headings)))
+            headings.append(title)
+            continue
+
+        text, starts_paragraph = value
+        tokens = count_tokens(text)
+        pieces = [(text, tokens)] if tokens <= max_tokens else list(_split_long(text, max_tokens))
+
+        for piece, n in pieces:
+            if fresh and window_tokens + n > max_tokens:
+                yield emit()
+                keep_overlap()
+            while window and window_tokens + n > max_tokens:
+                window_tokens -= window.popleft()[1]
+            window.append((piece, n, starts_paragraph))
+            window_tokens += n
+            fresh += 1
+            starts_paragraph = False
+
+    if fresh:
+        yield emit()
+
+
+def chunk_file(
+    path: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Iterator[Chunk]:
+    """Stream chunks from a text/markdown file without reading it into memory."""
+    with open(path, "r", encoding="utf-8") as f:
+        yield from iter_chunks(f, max_tokens, overlap_tokens)
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> List[str]:
+    """
+    Splits long text into smaller chunks for embedding/storage.
+    Convenience wrapper over iter_chunks for in-memory strings.
+    """
+    return [c.text for c in iter_chunks(io.StringIO(text), max_tokens, overlap_tokens)]
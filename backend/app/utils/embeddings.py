@@ -1,16 +1,253 @@
 # backend/app/utils/embeddings.py
 
+import hashlib
 import os
-from openai import OpenAI
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.cache import LRUCache, SQLiteCache
+from app.utils.llm_gateway import gateway
+from app.utils.local_embeddings import get_local_embedder
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_DISK_SIZE = int(os.getenv("EMBED_CACHE_DISK_SIZE", "100000"))
+# Set EMBED_CACHE_PATH="" to keep the cache in memory only
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(ROOT_DIR, "data", "embedding_cache.sqlite3"))
+
+# Batch embedding: inputs per API request, and requests in flight at once
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+
+# Known output sizes of OpenAI embedding models (recorded with each index)
+OPENAI_EMBED_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def embedding_provider() -> str:
+    """"openai" (default) or "local" (sentence-transformers, fully offline)."""
+    return os.getenv("EMBED_PROVIDER", "openai").lower()
+
+
+def embed_model() -> str:
+    if embedding_provider() == "local":
+        return get_local_embedder().model_name
+    return os.getenv("EMBED_MODEL", "text-embedding-3-small")
+
+
+def embed_dimensions() -> Optional[int]:
+    """
+    EMBED_DIMENSIONS requests shorter vectors from OpenAI text-embedding-3
+    models (e.g. 512 instead of 1536); unset means the model's native size.
+    """
+    if embedding_provider() == "local":
+        return None
+    value = os.getenv("EMBED_DIMENSIONS")
+    return int(value) if value else None
+
+
+def _cache_model() -> str:
+    """Model id used in embedding cache keys; shortened vectors never share entries."""
+    dimensions = embed_dimensions()
+    return f"{embed_model()}@{dimensions}" if dimensions else embed_model()
+
+
+def embedding_info() -> dict:
+    """
+    Provider, model and vector dimension of the active embedding setup.
+    Recorded next to every index so vectors from different setups never mix.
+    """
+    provider = embedding_provider()
+    model = embed_model()
+    if provider == "local":
+        dimension = get_local_embedder().dimension
+    else:
+        dimension = embed_dimensions() or OPENAI_EMBED_DIMENSIONS.get(model)
+    return {"provider": provider, "model": model, "dimension": dimension}
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: trimmed, single-spaced, lowercase."""
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: an in-process LRU in front of a persistent
+    SQLite store. Keys combine the embedding model with the normalized text,
+    so switching EMBED_MODEL never serves stale vectors.
+    """
+
+    def __init__(self, memory_entries: int = EMBED_CACHE_SIZE, disk_path: Optional[str] = EMBED_CACHE_PATH,
+                 disk_entries: int = EMBED_CACHE_DISK_SIZE):
+        self.memory = LRUCache(memory_entries)
+        self.disk = None
+        if disk_path:
+            try:
+                self.disk = SQLiteCache(disk_path, table="embeddings", max_entries=disk_entries)
+            except Exception as e:
+                print("Warning: embedding disk cache disabled:", e)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        key = self.key(text, model)
+
+        vector = self.memory.get(key)
+        if vector is not None:
+            self._count("memory_hits")
+            return vector
+
+        if self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                self.memory.put(key, vector)
+                self._count("disk_hits")
+                return vector
+
+        self._count("misses")
+        return None
+
+    def put(self, text: str, model: str, vector: List[float]) -> None:
+        self.put_many([text], model, [vector])
+
+    def put_many(self, texts: List[str], model: str, vectors: List[List[float]]) -> None:
+        blobs = {}
+        for text, vector in zip(texts, vectors):
+            key = self.key(text, model)
+            self.memory.put(key, vector)
+            blobs[key] = np.asarray(vector, dtype=np.float32).tobytes()
+        if self.disk is not None:
+            self.disk.put_many(blobs)
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+        }
+
+
+embedding_cache = EmbeddingCache()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def embed_text(text: str):
     """
-    Returns embedding vector for text using OpenAI embeddings.
+    Returns embedding vector for text from the configured provider (OpenAI,
+    or the micro-batched local model). Repeated texts are served from the embedding cache.
+    """
+    cache_model = _cache_model()
+    cached = embedding_cache.get(text, cache_model)
+    if cached is not None:
+        return cached
+
+    if embedding_provider() == "local":
+        vector = get_local_embedder().embed(text)
+    else:
+        response = gateway.embed(embed_model(), text, dimensions=embed_dimensions())
+        vector = response.data[0].embedding
+    embedding_cache.put(text, cache_model, vector)
+    return vector
+
+
+def _embed_batch(texts: List[str], model: str) -> List[List[float]]:
+    if embedding_provider() == "local":
+        return get_local_embedder().encode(texts)
+    response = gateway.embed(model, texts, dimensions=embed_dimensions())
+    # the API returns one item per input, tagged with its position
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+
+def embed_batches(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> Iterator[Tuple[List[int], List[List[float]]]]:
+    """
+    Embed many texts, yielding (positions, vectors) as each batch completes.
+
+    Cached texts are yielded first without a request; the rest are sent
+    `batch_size` inputs per request with at most `max_concurrency` requests
+    in flight. Results arrive in completion order, so callers can start
+    upserting while later batches are still being embedded.
+    """
+    model = embed_model()
+    cache_model = _cache_model()
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    max_concurrency = max(1, max_concurrency or EMBED_MAX_CONCURRENCY)
+    if embedding_provider() == "local":
+        max_concurrency = 1  # one forward pass at a time; the model uses every core
+
+    cached_positions, cached_vectors, pending = [], [], []
+    for i, text in enumerate(texts):
+        vector = embedding_cache.get(text, cache_model)
+        if vector is None:
+            pending.append(i)
+        else:
+            cached_positions.append(i)
+            cached_vectors.append(vector)
+
+    if cached_positions:
+        yield cached_positions, cached_vectors
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if not batches:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        queued = iter(batches)
+        in_flight = {}
+
+        def submit_next():
+            batch = next(queued, None)
+            if batch is not None:
+                in_flight[pool.submit(_embed_batch, [texts[i] for i in batch], model)] = batch
+
+        for _ in range(max_concurrency):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                vectors = future.result()
+                embedding_cache.put_many([texts[i] for i in batch], cache_model, vectors)
+                submit_next()
+                yield batch, vectors
+
+
+def embed_texts(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> List[List[float]]:
+    """
+    Returns embedding vectors for many texts, in input order.
     """
-    response = client.embeddings.create(
-        model=os.getenv("EMBED_MODEL", "text-embedding-3-small"),
-        input=text
-    )
-    return response.data[0].embedding
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    for positions, batch_vectors in embed_batches(texts, batch_size, max_concurrency):
+        for i, vector in zip(positions, batch_vectors):
+            vectors[i] = vector
+    return vectors
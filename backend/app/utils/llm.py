@@ -1,22 +1,54 @@
 # backend/app/utils/llm.py
 
 import os
-from openai import OpenAI
+from typing import Iterator
+
+from app.utils.llm_gateway import gateway
+from app.utils.llm_cache import get_completion_cache
+
+
+def _messages(system_prompt: str, user_prompt: str):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def chat_completion(system_prompt: str, user_prompt: str) -> str:
     """
     Wrapper for OpenAI chat completion API.
-    Returns model-generated text.
+    Returns model-generated text. Identical prompts are served from the
+    completion cache when it is enabled (LLM_CACHE_ENABLED).
+    """
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    messages = _messages(system_prompt, user_prompt)
+    temperature = 0.2
+
+    cache = get_completion_cache()
+    if cache is not None:
+        cached = cache.get(model, temperature, messages)
+        if cached is not None:
+            return cached
+
+    resp = gateway.chat(model, messages, temperature=temperature)
+    content = resp.choices[0].message.content.strip()
+
+    if cache is not None:
+        cache.put(model, temperature, messages, content)
+    return content
+
+
+def chat_completion_stream(system_prompt: str, user_prompt: str) -> Iterator[str]:
+    """
+    Streaming variant of chat_completion: yields text deltas as the model
+    generates them. Blocking; iterate it off the event loop.
     """
-    resp = client.chat.completions.create(
-        model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+    stream = gateway.chat_stream(
+        os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        _messages(system_prompt, user_prompt),
         temperature=0.2,
     )
 
-    return resp.choices[0].message.content.strip()
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
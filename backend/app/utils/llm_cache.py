@@ -0,0 +1,105 @@
+# backend/app/utils/llm_cache.py
+
+"""
+Opt-in persistent exact-match cache for chat completions.
+
+Keys hash the model, temperature and full message list, so any prompt
+change (including retrieved context) is a miss. Enable with
+LLM_CACHE_ENABLED=true; a request can skip it with the bypass header
+(see LLM_CACHE_BYPASS_HEADER), which sets a context variable that follows
+the request into the blocking pool.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.utils.cache import SQLiteCache
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(ROOT_DIR, "data", "llm_cache.sqlite3"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "10000"))
+
+# "X-LLM-Cache: bypass" (or "Cache-Control: no-cache") skips the cache for one request
+LLM_CACHE_BYPASS_HEADER = "x-llm-cache"
+
+llm_cache_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+def wants_bypass(headers) -> bool:
+    return (
+        headers.get(LLM_CACHE_BYPASS_HEADER, "").lower() == "bypass"
+        or "no-cache" in headers.get("cache-control", "").lower()
+    )
+
+
+class CompletionCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_SIZE):
+        self.store = SQLiteCache(path, table="completions", max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def key(model: str, temperature: float, messages: List[Dict[str, Any]]) -> str:
+        payload = json.dumps({"model": model, "temperature": temperature, "messages": messages},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, model: str, temperature: float, messages) -> Optional[str]:
+        if llm_cache_bypass.get():
+            self._count("bypassed")
+            return None
+        value = self.store.get(self.key(model, temperature, messages))
+        self._count("hits" if value is not None else "misses")
+        return value.decode("utf-8") if value is not None else None
+
+    def put(self, model: str, temperature: float, messages, content: str) -> None:
+        # bypassed requests still refresh the entry with the new answer
+        self.store.put(self.key(model, temperature, messages), content.encode("utf-8"))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.store),
+        }
+
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """The shared cache, or None when disabled or the store can't be opened."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = CompletionCache()
+            except Exception as e:
+                print("Warning: LLM completion cache disabled:", e)
+                return None
+        return _cache
+
+
+def completion_cache_stats() -> Dict[str, Any]:
+    cache = get_completion_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
@@ -0,0 +1,320 @@
+# backend/app/utils/llm_gateway.py
+
+"""
+Single entry point for OpenAI calls (chat, embeddings, transcription).
+
+One pooled HTTP client is shared by every call site. Each call gets an
+operation-specific timeout, is retried with jittered exponential backoff on
+429/5xx/timeouts, and runs under a global and a per-model concurrency limit.
+A per-model circuit breaker fails fast while the upstream keeps failing, so
+a slowdown doesn't pile up requests until the workers fall over.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import httpx
+import openai
+from openai import OpenAI
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+
+# read timeouts per operation (seconds)
+LLM_TIMEOUTS = {
+    "chat": float(os.getenv("LLM_CHAT_TIMEOUT", "60")),
+    "embed": float(os.getenv("LLM_EMBED_TIMEOUT", "30")),
+    "transcribe": float(os.getenv("LLM_TRANSCRIBE_TIMEOUT", "120")),
+}
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+# calls in flight across all models / per model, and how long to wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+# consecutive failed calls that open a model's breaker, and seconds before a trial call
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised without calling upstream: breaker open or no free slot in time."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; after `cooldown`
+    one trial call is let through (half-open) and its outcome decides.
+    """
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def cancel_trial(self) -> None:
+        """The admitted call never reached upstream; let another one try."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE, cap: float = LLM_BACKOFF_MAX) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        model_concurrency: int = LLM_MODEL_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+    ):
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.model_concurrency = model_concurrency
+        self._global = threading.BoundedSemaphore(max_concurrency)
+        self._models: Dict[str, threading.BoundedSemaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._client: Optional[OpenAI] = None
+
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    # -------------------------
+    # Shared client / per-model state
+    # -------------------------
+
+    @property
+    def client(self) -> OpenAI:
+        # built on first use so importing a call site never needs credentials
+        with self._lock:
+            if self._client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                                        max_keepalive_connections=LLM_MAX_KEEPALIVE),
+                    timeout=httpx.Timeout(LLM_TIMEOUTS["chat"], connect=LLM_CONNECT_TIMEOUT),
+                )
+                # retries are handled here, not by the SDK
+                self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
+            return self._client
+
+    def _model_state(self, model: str):
+        with self._lock:
+            if model not in self._models:
+                self._models[model] = threading.BoundedSemaphore(self.model_concurrency)
+                self._breakers[model] = CircuitBreaker()
+            return self._models[model], self._breakers[model]
+
+    def _count(self, attr: str, delta: int = 1) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + delta)
+
+    def _acquire(self, model_sem: threading.BoundedSemaphore) -> None:
+        deadline = time.monotonic() + self.queue_timeout
+        if not self._global.acquire(timeout=self.queue_timeout):
+            self._count("rejected")
+            raise LLMUnavailableError("LLM gateway busy: no free slot")
+        if not model_sem.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._global.release()
+            self._count("rejected")
+            raise LLMUnavailableError("LLM gateway busy: no free slot for model")
+        self._count("in_flight")
+
+    def _release(self, model_sem: threading.BoundedSemaphore) -> None:
+        self._count("in_flight", -1)
+        model_sem.release()
+        self._global.release()
+
+    def _timeout(self, operation: str) -> httpx.Timeout:
+        return httpx.Timeout(LLM_TIMEOUTS.get(operation, LLM_TIMEOUTS["chat"]), connect=LLM_CONNECT_TIMEOUT)
+
+    # -------------------------
+    # Calls
+    # -------------------------
+
+    def _admit(self, model: str):
+        model_sem, breaker = self._model_state(model)
+        if not breaker.allow():
+            self._count("rejected")
+            raise LLMUnavailableError(f"circuit open for model {model}")
+        self._count("calls")
+        return model_sem, breaker
+
+    def _give_up(self, error: Exception, attempt: int, breaker: CircuitBreaker) -> bool:
+        """True if the failed attempt is final (and has been recorded)."""
+        if _is_retryable(error) and attempt < self.max_retries:
+            return False
+        if _is_retryable(error):
+            breaker.record_failure()
+        else:
+            breaker.cancel_trial()  # a 4xx says nothing about upstream health
+        self._count("failures")
+        return True
+
+    def _backoff(self, error: Exception, attempt: int) -> None:
+        self._count("retries")
+        time.sleep(min(_retry_after(error) or backoff_delay(attempt), LLM_BACKOFF_MAX))
+
+    def call(self, operation: str, model: str, fn: Callable[[OpenAI, httpx.Timeout], Any]) -> Any:
+        """
+        Run fn(client, timeout) with limits, retries and the model's breaker.
+        Slots are released while backing off between attempts.
+        """
+        model_sem, breaker = self._admit(model)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._acquire(model_sem)
+            except LLMUnavailableError:
+                breaker.cancel_trial()
+                raise
+            try:
+                result = fn(self.client, self._timeout(operation))
+            except Exception as e:
+                if self._give_up(e, attempt, breaker):
+                    raise
+                error = e
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                self._release(model_sem)
+            self._backoff(error, attempt)
+
+    def stream(self, operation: str, model: str, fn: Callable[[OpenAI, httpx.Timeout], Iterator[Any]]) -> Iterator[Any]:
+        """
+        Like call(), for streaming responses: opening the stream is retried,
+        and the slots stay held until the stream is exhausted or closed.
+        """
+        model_sem, breaker = self._admit(model)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._acquire(model_sem)
+            except LLMUnavailableError:
+                breaker.cancel_trial()
+                raise
+            try:
+                try:
+                    stream = fn(self.client, self._timeout(operation))
+                except Exception as e:
+                    if self._give_up(e, attempt, breaker):
+                        raise
+                    error = e
+                else:
+                    try:
+                        yield from stream
+                    except GeneratorExit:
+                        breaker.record_success()  # consumer stopped early
+                        raise
+                    except Exception as e:
+                        self._give_up(e, self.max_retries, breaker)
+                        raise
+                    breaker.record_success()
+                    return
+            finally:
+                self._release(model_sem)
+            self._backoff(error, attempt)
+
+    # -------------------------
+    # Operations
+    # -------------------------
+
+    def chat(self, model: str, messages, temperature: float = 0.2):
+        return self.call("chat", model, lambda c, t: c.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, timeout=t,
+        ))
+
+    def chat_stream(self, model: str, messages, temperature: float = 0.2) -> Iterator[Any]:
+        return self.stream("chat", model, lambda c, t: c.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, stream=True, timeout=t,
+        ))
+
+    def embed(self, model: str, inputs, dimensions: Optional[int] = None):
+        # `dimensions` asks text-embedding-3 models for shortened vectors
+        extra = {"dimensions": dimensions} if dimensions else {}
+        return self.call("embed", model, lambda c, t: c.embeddings.create(
+            model=model, input=inputs, timeout=t, **extra,
+        ))
+
+    def transcribe(self, model: str, audio_file, language: str = "en"):
+        def _create(c, t):
+            audio_file.seek(0)  # a retry must resend the whole file
+            return c.audio.transcriptions.create(file=audio_file, model=model, language=language, timeout=t)
+        return self.call("transcribe", model, _create)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = {m: b.state for m, b in self._breakers.items()}
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "breakers": breakers,
+        }
+
+
+gateway = LLMGateway()
@@ -0,0 +1,150 @@
+# backend/app/utils/local_embeddings.py
+
+"""
+Offline embedding provider backed by sentence-transformers (EMBED_PROVIDER=local).
+
+The model is loaded once per process on first use. Single-text requests
+(query embeddings) are micro-batched: a collector thread gathers whatever
+arrives within LOCAL_EMBED_WAIT_MS (up to LOCAL_EMBED_BATCH_SIZE texts) and
+runs them as one forward pass on a small worker pool, so a burst of
+concurrent queries costs one model call instead of one each.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBED_DEVICE = os.getenv("LOCAL_EMBED_DEVICE", "cpu")
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "64"))
+LOCAL_EMBED_WAIT_MS = float(os.getenv("LOCAL_EMBED_WAIT_MS", "5"))
+# forward passes running at once; CPU inference already uses every core, so keep this small
+LOCAL_EMBED_WORKERS = int(os.getenv("LOCAL_EMBED_WORKERS", "1"))
+
+
+class LocalEmbedder:
+    def __init__(
+        self,
+        model_name: str = LOCAL_EMBED_MODEL,
+        device: str = LOCAL_EMBED_DEVICE,
+        max_batch: int = LOCAL_EMBED_BATCH_SIZE,
+        wait_ms: float = LOCAL_EMBED_WAIT_MS,
+        workers: int = LOCAL_EMBED_WORKERS,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.max_batch = max(1, max_batch)
+        self.wait = wait_ms / 1000.0
+        self.workers = max(1, workers)
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._collector: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        self.requests = 0
+        self.batches = 0
+
+    # -------------------------
+    # Model
+    # -------------------------
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as e:
+                    raise RuntimeError(
+                        "EMBED_PROVIDER=local requires sentence-transformers (pip install sentence-transformers)"
+                    ) from e
+                self._model = SentenceTransformer(self.model_name, device=self.device)
+            return self._model
+
+    @property
+    def dimension(self) -> int:
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: Sequence[str]) -> List[List[float]]:
+        """One or more forward passes over `texts`, no waiting (used for ingestion)."""
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.max_batch,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return [v.tolist() for v in vectors]
+
+    # -------------------------
+    # Micro-batching
+    # -------------------------
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing a forward pass with concurrent callers."""
+        future: Future = Future()
+        self._ensure_collector()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_collector(self) -> None:
+        with self._lock:
+            if self._collector is None or not self._collector.is_alive():
+                self._pool = self._pool or ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="local-embed")
+                self._collector = threading.Thread(target=self._collect, name="local-embed-collector", daemon=True)
+                self._collector.start()
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch) -> None:
+        with self._lock:
+            self.requests += len(batch)
+            self.batches += 1
+        try:
+            vectors = self.encode([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "requests": self.requests,
+            "batches": self.batches,
+        }
+
+
+_embedder: Optional[LocalEmbedder] = None
+_embedder_lock = threading.Lock()
+
+
+def get_local_embedder() -> LocalEmbedder:
+    """Process-wide embedder; the model itself loads on first use."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = LocalEmbedder()
+        return _embedder
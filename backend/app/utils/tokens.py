@@ -0,0 +1,61 @@
+# backend/app/utils/tokens.py
+
+"""
+Local token counting for prompt budgeting and chunking.
+
+Uses tiktoken when it is installed and its encoding can be loaded; otherwise
+falls back to a word/punctuation approximation that tracks BPE counts
+closely enough for budgeting English text.
+"""
+
+import os
+import re
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency
+    tiktoken = None
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+_APPROX_RE = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+_encoding_failed = False
+_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed and tiktoken is not None:
+        with _lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:
+                    print("Warning: tiktoken encoding unavailable, approximating token counts:", e)
+                    _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return len(_APPROX_RE.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` that fits in max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    enc = _get_encoding()
+    if enc is not None:
+        ids = enc.encode(text, disallowed_special=())
+        return text if len(ids) <= max_tokens else enc.decode(ids[:max_tokens])
+
+    matches = list(_APPROX_RE.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    return text[:matches[max_tokens - 1].end()]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Move helpdesk sessions older than the retention period out of the
+database into compressed JSONL segments (ARCHIVE_DIR), or search them.
+
+    python archive_sessions.py --dry-run               # how many rows are due
+    python archive_sessions.py                         # archive rows older than SESSION_RETENTION_DAYS
+    python archive_sessions.py --days 30 --batch-size 200 --max-rows 10000
+    python archive_sessions.py --scan "printer jam"    # search archived sessions
+    python archive_sessions.py --segments              # list segments
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR))
+load_dotenv(dotenv_path=SCRIPT_DIR / ".env")
+
+from app.db.database import close_db, init_db
+from app.services.retention import ARCHIVE_BATCH_SIZE, SESSION_RETENTION_DAYS, session_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=SESSION_RETENTION_DAYS, help="archive sessions older than this")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="rows per segment frame / delete")
+    parser.add_argument("--max-rows", type=int, default=None, help="stop after archiving this many rows")
+    parser.add_argument("--dry-run", action="store_true", help="only count the sessions that are due")
+    parser.add_argument("--scan", metavar="TEXT", help="print archived sessions containing TEXT")
+    parser.add_argument("--segments", action="store_true", help="list archive segments")
+    args = parser.parse_args()
+
+    if args.segments:
+        print(json.dumps(session_archive.load_index(), indent=2))
+        return
+    if args.scan is not None:
+        for record in session_archive.scan(query=args.scan):
+            print(record["id"], record["created_at"], (record["transcript"] or "")[:80])
+        return
+
+    async def setup():
+        await init_db()  # schema and dictionaries
+        await close_db()
+    asyncio.run(setup())
+
+    result = session_archive.archive_expired(
+        days=args.days, batch_size=args.batch_size, max_rows=args.max_rows, dry_run=args.dry_run,
+    )
+    if args.dry_run:
+        print(f"{result['eligible']} sessions older than {args.days} days")
+    else:
+        print(f"Archived {result['archived']} sessions in {result['seconds']}s to {session_archive.path}")
+
+
+if __name__ == "__main__":
+    main()
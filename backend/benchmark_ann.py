@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local vector index: exact (flat) search vs IVF approximate
+search at several nprobe settings. Reports recall@k against the exact
+results plus p50/p95 query latency.
+
+    python benchmark_ann.py                          # synthetic clustered corpus
+    python benchmark_ann.py --n 1000000 --dim 384 --nprobe 4,8,16,32
+    python benchmark_ann.py --from-index data/vector_index --dtype int8
+
+With --from-index the vectors of an existing local index are copied into
+temporary stores; queries are perturbed copies of indexed vectors.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.rag.vector_store import LocalVectorStore
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Gaussian blobs around random centres, which is closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centres[labels] + rng.normal(scale=0.6, size=(n, dim)).astype(np.float32)
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    picks = corpus[rng.choice(len(corpus), size=count, replace=False)]
+    return picks + rng.normal(scale=0.3, size=picks.shape).astype(np.float32)
+
+
+def build_store(path: str, corpus: np.ndarray, **kwargs) -> LocalVectorStore:
+    store = LocalVectorStore(path=path, **kwargs)
+    started = time.perf_counter()
+    # batched like ingestion, so IVF exercises incremental inserts
+    for start in range(0, len(corpus), store.upsert_batch_size):
+        block = corpus[start:start + store.upsert_batch_size]
+        store.upsert([{"id": str(start + i), "values": v, "metadata": {}} for i, v in enumerate(block)])
+    print(f"  built {kwargs or 'flat'} index of {len(corpus)} vectors in {time.perf_counter() - started:.1f}s")
+    return store
+
+
+def run(store: LocalVectorStore, queries: np.ndarray, k: int, **query_kwargs):
+    results, latencies = [], []
+    for q in queries:
+        started = time.perf_counter()
+        matches = store.query(q, top_k=k, **query_kwargs)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({m["id"] for m in matches})
+    return results, np.asarray(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=256, help="synthetic vector dimension")
+    parser.add_argument("--clusters", type=int, default=500, help="synthetic topic clusters")
+    parser.add_argument("--from-index", help="benchmark the vectors of an existing local index instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = ~4*sqrt(n))")
+    parser.add_argument("--nprobe", default="1,4,8,16,32", help="comma-separated nprobe values")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.from_index:
+        corpus = np.load(os.path.join(args.from_index, LocalVectorStore.VECTORS_FILE))
+    else:
+        corpus = synthetic_corpus(args.n, args.dim, args.clusters, args.seed)
+    queries = make_queries(corpus, min(args.queries, len(corpus)), args.seed)
+
+    print(f"Corpus: {corpus.shape[0]} x {corpus.shape[1]}, {len(queries)} queries, k={args.k}, dtype={args.dtype}")
+    with tempfile.TemporaryDirectory() as tmp:
+        flat = build_store(os.path.join(tmp, "flat"), corpus, dtype=args.dtype)
+        ivf_store = build_store(os.path.join(tmp, "ivf"), corpus, dtype=args.dtype,
+                                index_type="ivf", nlist=args.nlist)
+
+        exact, flat_ms = run(flat, queries, args.k)
+        rows = [("flat (exact)", "-", 1.0, flat_ms)]
+        for nprobe in (int(p) for p in args.nprobe.split(",")):
+            found, ms = run(ivf_store, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(f & e) / len(e) for f, e in zip(found, exact) if e])
+            rows.append(("ivf", str(nprobe), recall, ms))
+
+        nlist = ivf_store._ivf.nlist if ivf_store._ivf is not None else 0
+        print(f"\nIVF lists: {nlist}")
+        print(f"{'index':<14}{'nprobe':>8}{f'recall@{args.k}':>12}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, nprobe, recall, ms in rows:
+            print(f"{name:<14}{nprobe:>8}{recall:>12.3f}{np.percentile(ms, 50):>10.2f}{np.percentile(ms, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
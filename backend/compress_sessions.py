@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Compress stored helpdesk session payloads (manual_markdown, entities,
+steps) and report the space saved. SQLite only; on Postgres the columns
+use the server's own compression.
+
+    python compress_sessions.py --report                 # sizes only
+    python compress_sessions.py                          # compress plain rows in batches
+    python compress_sessions.py --train-dict             # train a shared dictionary first
+    python compress_sessions.py --batch-size 200 --max-rows 10000
+    python compress_sessions.py --reindex                # search-index rows written by other clients
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPT_DIR))
+load_dotenv(dotenv_path=SCRIPT_DIR / ".env")
+
+from app.db.compression import compress_existing, storage_report, train_dictionary
+from app.db.database import close_db, engine, init_db
+from app.db.fulltext import index_missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--report", action="store_true", help="only print the storage report")
+    parser.add_argument("--train-dict", action="store_true", help="train a zstd dictionary on recent sessions")
+    parser.add_argument("--samples", type=int, default=2000, help="sessions sampled for --train-dict")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per transaction")
+    parser.add_argument("--max-rows", type=int, default=None, help="stop after scanning this many rows")
+    parser.add_argument("--reindex", action="store_true", help="add sessions missing from the search index")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "sqlite":
+        print("Session fields are compressed by the database itself on", engine.dialect.name)
+        return
+
+    async def setup():
+        await init_db()  # schema, search index and dictionaries
+        await close_db()
+    asyncio.run(setup())
+
+    with engine.connect() as connection:
+        if args.reindex:
+            print(f"Indexed {index_missing(connection, batch_size=args.batch_size)} sessions for search")
+            return
+        if not args.report:
+            if args.train_dict:
+                dict_id = train_dictionary(connection, samples=args.samples)
+                connection.commit()
+                print(f"Trained dictionary {dict_id}" if dict_id else "Too few sessions to train a dictionary")
+            result = compress_existing(connection, batch_size=args.batch_size, max_rows=args.max_rows)
+            print(f"Scanned {result['scanned']} rows, compressed {result['updated']}")
+
+        print(json.dumps(storage_report(connection), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 """
-Setup script for Pinecone index and knowledge base ingestion.
-Run this to create the Pinecone index and ingest all documents.
+Setup script for the vector index and knowledge base ingestion.
+Run this to create the index and ingest all documents.
+
+VECTOR_BACKEND=pinecone (default when PINECONE_API_KEY is set) creates the
+Pinecone index; VECTOR_BACKEND=local writes the in-process NumPy index under
+LOCAL_INDEX_DIR instead.
 """
 
 import os
@@ -14,19 +18,28 @@ from dotenv import load_dotenv
 SCRIPT_DIR = Path(__file__).resolve().parent
 load_dotenv(dotenv_path=SCRIPT_DIR / ".env")
 
+from app.rag.ingest import sync_documents
+from app.utils.embeddings import embedding_info
+from app.rag.vector_store import LocalVectorStore, PineconeVectorStore, vector_backend
+
+backend = vector_backend()
+
 # Check if Pinecone API key is set
 pinecone_key = os.getenv("PINECONE_API_KEY")
-if not pinecone_key:
+if backend == "pinecone" and not pinecone_key:
     print("❌ Error: PINECONE_API_KEY not found in environment variables")
-    print("Please set it in your backend/.env file")
+    print("Please set it in your backend/.env file (or use VECTOR_BACKEND=local)")
     sys.exit(1)
 
-from pinecone import Pinecone, ServerlessSpec
-from app.utils.embeddings import embed_text
-from app.utils.chunker import chunk_text
-
 def create_index():
-    """Create Pinecone index if it doesn't exist"""
+    """Create the vector store for the configured backend (Pinecone index if it doesn't exist)"""
+    if backend == "local":
+        store = LocalVectorStore()
+        print(f"✅ Using local vector index at {store.path}")
+        return store
+
+    from pinecone import Pinecone, ServerlessSpec
+
     index_name = os.getenv("PINECONE_INDEX_NAME", "helpdesk-ai")
     pinecone_environment = os.getenv("PINECONE_ENV") or os.getenv("PINECONE_ENVIRONMENT")
 
@@ -54,25 +67,27 @@ def create_index():
 
     if index_name in existing:
         print(f"✅ Index '{index_name}' already exists")
-        return pc.Index(index_name)
+        return PineconeVectorStore(index=pc.Index(index_name), index_name=index_name)
 
-    print(f"📌 Creating new index '{index_name}'...")
+    # match the configured embeddings (EMBED_DIMENSIONS / local model size)
+    dimension = embedding_info()["dimension"] or 1536
+    print(f"📌 Creating new index '{index_name}' (dimension {dimension})...")
     try:
         # Use ServerlessSpec if available in this client
         try:
             spec = ServerlessSpec(cloud="aws", region="us-east-1")
-            pc.create_index(name=index_name, dimension=1536, metric="cosine", spec=spec)
+            pc.create_index(name=index_name, dimension=dimension, metric="cosine", spec=spec)
         except Exception:
-            pc.create_index(name=index_name, dimension=1536, metric="cosine")
+            pc.create_index(name=index_name, dimension=dimension, metric="cosine")
 
         print(f"✅ Index '{index_name}' created successfully")
-        return pc.Index(index_name)
+        return PineconeVectorStore(index=pc.Index(index_name), index_name=index_name)
     except Exception as e:
         print(f"❌ Error creating index: {e}")
         sys.exit(1)
 
-def ingest_documents(index):
-    """Ingest all knowledge base documents into Pinecone"""
+def ingest_documents(store):
+    """Ingest all knowledge base documents into the vector store"""
     
     # Path to knowledge base (relative to this script)
     kb_path = SCRIPT_DIR / "docs" / "manuals"
@@ -83,81 +98,35 @@ def ingest_documents(index):
     
     print(f"📚 Ingesting documents from {kb_path}...")
     
-    documents = []
-    doc_id = 0
-    
-    # Process all files
-    for file_path in kb_path.glob("*"):
-        if file_path.is_file():
-            try:
-                print(f"📄 Processing {file_path.name}...")
-                
-                # Read file content
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Chunk the document
-                chunks = chunk_text(content, max_chars=800)
-                print(f"   └─ Created {len(chunks)} chunks")
-                
-                # Process each chunk
-                for i, chunk in enumerate(chunks):
-                    # Create embedding
-                    embedding = embed_text(chunk)
-
-                    # Create metadata
-                    metadata = {
-                        "text": chunk,
-                        "source_file": file_path.name,
-                        "chunk_index": i,
-                        "total_chunks": len(chunks)
-                    }
-
-                    documents.append({
-                        "id": f"doc_{doc_id}_{i}",
-                        "values": embedding,
-                        "metadata": metadata
-                    })
-                
-                doc_id += 1
-                
-            except Exception as e:
-                print(f"❌ Error processing {file_path.name}: {e}")
-                continue
-    
-    print(f"📊 Total vectors to upsert: {len(documents)}")
-    
-    if not documents:
-        print("❌ No documents found to ingest")
-        return
-    
-    # Upsert in batches
-    batch_size = 100
-    for i in range(0, len(documents), batch_size):
-        batch = documents[i:i + batch_size]
-        # Convert to tuples (id, vector, metadata) which is widely accepted by pinecone
-        upsert_payload = [(d["id"], d["values"], d["metadata"]) for d in batch]
-        try:
-            index.upsert(vectors=upsert_payload)
-            print(f"✅ Upserted batch {i//batch_size + 1}/{(len(documents)-1)//batch_size + 1}")
-        except Exception as e:
-            print(f"❌ Error upserting batch: {e}")
-            sys.exit(1)
+    # Incremental sync: only new/changed chunks are embedded, removed ones deleted
+    try:
+        stats = sync_documents(
+            store,
+            str(kb_path),
+            full="--full" in sys.argv,
+        )
+    except Exception as e:
+        print(f"❌ Error ingesting documents: {e}")
+        sys.exit(1)
     
-    print(f"🎉 Successfully ingested {len(documents)} document chunks!")
+    print(
+        f"📄 Files: {stats['files_changed']} new/changed, "
+        f"{stats['files_unchanged']} unchanged, {stats['files_removed']} removed"
+    )
+    print(f"🎉 Upserted {stats['chunks_added']} chunks, deleted {stats['chunks_deleted']} stale chunks")
 
 def main():
     """Main setup function"""
-    print("🚀 Starting Pinecone setup for HelpDesk AI...")
+    print(f"🚀 Starting vector index setup for HelpDesk AI ({backend} backend)...")
     print("=" * 50)
     
     # Create index
-    index = create_index()
+    store = create_index()
     
     print()
     
     # Ingest documents
-    ingest_documents(index)
+    ingest_documents(store)
     
     print()
     print("=" * 50)
@@ -165,15 +134,7 @@ def main():
     print("📊 Index stats:")
     
     try:
-        stats = index.describe_index_stats()
-        # stats is a dict; try common keys
-        total = stats.get("total_vector_count") or stats.get("namespaces", {})
-        if isinstance(total, dict):
-            # fallback to sum of namespace counts
-            total_vectors = sum(ns.get("vector_count", 0) for ns in total.values())
-        else:
-            total_vectors = total
-        print(f"   Total vectors: {total_vectors}")
+        print(f"   Total vectors: {store.count()}")
     except Exception as e:
         print(f"   Could not fetch stats: {e}")
 
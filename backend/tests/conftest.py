@@ -0,0 +1,91 @@
+# backend/tests/conftest.py
+
+"""
+Each test run gets its own SQLite database and data directories, so the
+suite never writes to ./helpdesk.db or data/ in the working tree.
+
+Settings are read once, when app modules are imported, so the environment
+is set here at conftest import time, before any test module imports `app`.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="helpdesk-tests-")
+
+TEST_ENV = {
+    "DATABASE_URL": "sqlite:///" + os.path.join(TEST_DATA_DIR, "helpdesk.db"),
+    "LOCAL_INDEX_DIR": os.path.join(TEST_DATA_DIR, "vector_index"),
+    "LEXICAL_INDEX_DIR": os.path.join(TEST_DATA_DIR, "lexical"),
+    "INGEST_MANIFEST_DIR": os.path.join(TEST_DATA_DIR, "manifests"),
+    "ARCHIVE_DIR": os.path.join(TEST_DATA_DIR, "archive"),
+    "EMBED_CACHE_PATH": os.path.join(TEST_DATA_DIR, "embedding_cache.sqlite3"),
+    "LLM_CACHE_PATH": os.path.join(TEST_DATA_DIR, "llm_cache.sqlite3"),
+}
+
+os.environ.update(TEST_ENV)
+os.environ.pop("ASYNC_DATABASE_URL", None)  # derived from DATABASE_URL instead
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def test_data_dir():
+    """Scratch directory holding the test database and indexes."""
+    return TEST_DATA_DIR
+
+
+@pytest.fixture
+def client():
+    """TestClient with startup/shutdown hooks run (tables, writer, pools)."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def insert_sessions(client):
+    """
+    insert_sessions(rows) -> ids: insert helpdesk_sessions rows, given as
+    dicts of column values (e.g. a fixed created_at), and add them to the
+    search index. Every row inserted is removed again after the test.
+    """
+    from sqlalchemy import text
+    from app.db.database import SessionLocal
+    from app.db.fulltext import index_sessions, unindex_sessions
+
+    inserted = []
+
+    def insert(rows):
+        db = SessionLocal()
+        ids = []
+        try:
+            for row in rows:
+                columns = ", ".join(row)
+                values = ", ".join(f":{name}" for name in row)
+                result = db.execute(text(f"INSERT INTO helpdesk_sessions ({columns}) VALUES ({values})"), row)
+                ids.append(result.lastrowid)
+            index_sessions(db.connection(), ids)
+            db.commit()
+        finally:
+            db.close()
+        inserted.extend(ids)
+        return ids
+
+    yield insert
+
+    if inserted:
+        db = SessionLocal()
+        try:
+            unindex_sessions(db.connection(), inserted)  # rows a test archived are already gone
+            db.execute(text("DELETE FROM helpdesk_sessions WHERE id IN (%s)" % ",".join(map(str, inserted))))
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,57 @@
+# backend/tests/test_bm25.py
+
+import os
+
+from app.rag.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_error_codes_and_parts():
+    tokens = tokenize("Error 0x80070005 on the HP-LaserJet")
+    assert "0x80070005" in tokens
+    assert "hp-laserjet" in tokens
+    assert "laserjet" in tokens
+    assert "the" not in tokens
+
+
+def test_bm25_search_and_persistence(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.npz"))
+    index.add([
+        {"id": "a", "text": "Printer shows error E-22 when paper jams"},
+        {"id": "b", "text": "Restart the router to fix wifi drops"},
+        {"id": "c", "text": "Wifi adapter driver update on Windows"},
+    ])
+    assert [h["id"] for h in index.search("E-22 printer", top_k=2)] == ["a"]
+
+    index.save()
+    reloaded = BM25Index(str(tmp_path / "bm25.npz"))
+    assert reloaded.load()
+    hits = reloaded.search("wifi driver", top_k=3)
+    assert hits[0]["id"] == "c"
+    assert hits[0]["metadata"]["text"].startswith("Wifi adapter")
+
+    reloaded.remove(["c"])
+    assert [h["id"] for h in reloaded.search("wifi driver")] == ["b"]
+
+
+def test_reciprocal_rank_fusion_prefers_shared_hits():
+    vector = [{"id": "x", "metadata": {}}, {"id": "y", "metadata": {}}]
+    lexical = [{"id": "y", "metadata": {}}, {"id": "z", "metadata": {}}]
+    assert [h["id"] for h in reciprocal_rank_fusion([vector, lexical])][0] == "y"
+
+
+def test_reader_reloads_after_rewrite(tmp_path):
+    path = str(tmp_path / "bm25.npz")
+    writer = BM25Index(path)
+    writer.add([{"id": "a", "text": "Printer shows error E-22"}])
+    writer.save()
+
+    reader = BM25Index(path)
+    reader.load()
+    reader.refresh_if_changed()
+    assert [h["id"] for h in reader.search("printer")] == ["a"]
+
+    writer.add([{"id": "b", "text": "Router drops wifi"}])
+    writer.save()
+    os.utime(path, (os.path.getatime(path), os.path.getmtime(path) + 1))
+    reader.refresh_if_changed()
+    assert [h["id"] for h in reader.search("wifi")] == ["b"]
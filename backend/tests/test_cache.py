@@ -0,0 +1,91 @@
+# backend/tests/test_cache.py
+
+from types import SimpleNamespace
+
+from app.rag.answer_cache import SemanticCache
+from app.utils import llm
+from app.utils.cache import LRUCache, SQLiteCache
+from app.utils.embeddings import EmbeddingCache
+from app.utils.llm_cache import CompletionCache, llm_cache_bypass
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_sqlite_cache_is_size_bounded(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.sqlite3"), max_entries=3)
+    for i in range(5):
+        cache.put(f"k{i}", b"x")
+    assert len(cache) == 3
+    assert cache.get("k0") is None
+    assert cache.get("k4") == b"x"
+
+
+def test_embedding_cache_two_tiers(tmp_path):
+    path = str(tmp_path / "emb.sqlite3")
+    cache = EmbeddingCache(memory_entries=8, disk_path=path)
+    assert cache.get("WiFi  not working", "m") is None
+    cache.put("WiFi  not working", "m", [0.5, 0.25])
+
+    assert cache.get("wifi not working", "m") == [0.5, 0.25]
+    assert cache.get("wifi not working", "other-model") is None
+
+    # a new process only has the disk tier
+    fresh = EmbeddingCache(memory_entries=8, disk_path=path)
+    assert fresh.get("wifi not working", "m") == [0.5, 0.25]
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_semantic_cache_threshold_fingerprint_and_ttl():
+    cache = SemanticCache("test", threshold=0.9, ttl=60, max_entries=2)
+    cache.put([1.0, 0.0], "devices-a", {"answer": "restart router"})
+
+    assert cache.get([0.99, 0.05], "devices-a") == {"answer": "restart router"}
+    assert cache.get([0.99, 0.05], "devices-b") is None
+    assert cache.get([0.0, 1.0], "devices-a") is None
+
+    # capacity 2: the least recently used entry is replaced
+    cache.put([0.0, 1.0], "devices-a", {"answer": "b"})
+    cache.get([1.0, 0.0], "devices-a")
+    cache.put([0.7, 0.7], "devices-a", {"answer": "c"})
+    assert cache.get([0.0, 1.0], "devices-a") is None
+    assert cache.get([1.0, 0.0], "devices-a") == {"answer": "restart router"}
+
+    cache.ttl = -1
+    cache.put([0.0, 1.0], "devices-a", {"answer": "expired"})
+    assert cache.get([0.0, 1.0], "devices-a") is None
+    assert cache.stats()["hits"] == 3
+
+
+def test_completion_cache_serves_identical_prompts(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_chat(model, messages, temperature):
+        calls.append(messages)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f" answer {len(calls)} "))])
+
+    cache = CompletionCache(str(tmp_path / "llm.sqlite3"), ttl=60, max_entries=10)
+    monkeypatch.setattr(llm, "get_completion_cache", lambda: cache)
+    monkeypatch.setattr(llm.gateway, "chat", fake_chat)
+
+    assert llm.chat_completion("sys", "wifi down") == "answer 1"
+    assert llm.chat_completion("sys", "wifi down") == "answer 1"
+    assert llm.chat_completion("sys", "printer jam") == "answer 2"
+    assert len(calls) == 2
+
+    # bypass skips the lookup but refreshes the stored answer
+    token = llm_cache_bypass.set(True)
+    try:
+        assert llm.chat_completion("sys", "wifi down") == "answer 3"
+    finally:
+        llm_cache_bypass.reset(token)
+    assert llm.chat_completion("sys", "wifi down") == "answer 3"
+    assert cache.stats()["bypassed"] == 1
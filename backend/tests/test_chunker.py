@@ -0,0 +1,42 @@
+# backend/tests/test_chunker.py
+
+import io
+
+from app.utils.chunker import chunk_text, iter_chunks
+from app.utils.tokens import count_tokens
+
+MANUAL = """# Printer Guide
+
+## Blank Pages
+
+Check the toner level. Replace the cartridge if it is empty. Run the head cleaning utility.
+
+## Paper Jams
+
+- Open the rear tray
+- Remove the stuck sheet
+"""
+
+
+def test_chunks_follow_headings_with_paths():
+    chunks = list(iter_chunks(io.StringIO(MANUAL), max_tokens=200))
+    assert [c.heading for c in chunks] == [
+        "Printer Guide > Blank Pages",
+        "Printer Guide > Paper Jams",
+    ]
+    assert chunks[1].text == "- Open the rear tray\n- Remove the stuck sheet"
+
+
+def test_token_limit_and_overlap():
+    text = " ".join(f"Sentence number {i} explains one step." for i in range(200))
+    chunks = list(iter_chunks(io.StringIO(text), max_tokens=40, overlap_tokens=10))
+    assert len(chunks) > 10
+    assert all(count_tokens(c.text) <= 45 for c in chunks)
+    # consecutive chunks share their boundary sentence
+    last_sentence = chunks[0].text.rsplit(". ", 1)[-1]
+    assert chunks[1].text.startswith(last_sentence.rstrip("."))
+
+
+def test_overlong_sentence_is_split():
+    chunks = chunk_text("word " * 500, max_tokens=50, overlap_tokens=0)
+    assert len(chunks) == 10
@@ -0,0 +1,183 @@
+# backend/tests/test_compression.py
+
+import json
+import sqlite3
+
+import pytest
+import zstandard
+from sqlalchemy import create_engine, text
+
+from app.db import compression
+from app.db.database import Base, SessionLocal, engine
+from app.db.fulltext import FTS_TABLE, LEGACY_VIEW, index_missing, setup_fulltext, unindex_sessions
+from app.db.models import HelpdeskSession
+from app.services.session_writer import SessionWrite, apply_writes
+
+MANUAL = "# Fix the flurbozine adapter\n\n" + "\n".join(
+    f"{i}. Unplug the adapter, wait ten seconds and plug it back in." for i in range(1, 40)
+)
+STEPS = [{"id": i, "text": "Unplug the adapter and plug it back in", "status": "pending"} for i in range(20)]
+
+
+@pytest.fixture
+def cleanup():
+    ids = []
+    yield ids
+    if ids:
+        with engine.begin() as connection:
+            unindex_sessions(connection, ids)
+            connection.execute(text("DELETE FROM helpdesk_sessions WHERE id IN (%s)" % ",".join(map(str, ids))))
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    """Empty database of its own (no search index yet), for jobs that scan the whole table."""
+    scratch = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    Base.metadata.create_all(bind=scratch)
+    yield scratch
+    scratch.dispose()
+
+
+def _write(cleanup, **fields):
+    """Create a session the way the app does; returns its id."""
+    db = SessionLocal()
+    try:
+        apply_writes(db, [SessionWrite(create=fields)])
+        db.commit()
+        session_id = db.query(HelpdeskSession.id).filter_by(transcript=fields["transcript"]) \
+            .order_by(HelpdeskSession.id.desc()).scalar()
+    finally:
+        db.close()
+    cleanup.append(session_id)
+    return session_id
+
+
+def _stored_types(session_id):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(
+            "SELECT typeof(manual_markdown), typeof(steps) FROM helpdesk_sessions WHERE id = ?", (session_id,)
+        ).first()
+
+
+def test_large_fields_are_stored_compressed_and_read_back(client, cleanup):
+    session_id = _write(cleanup, transcript="compression test", entities={"device": "adapter"},
+                        steps=STEPS, manual_markdown=MANUAL)
+
+    assert _stored_types(session_id) == ("blob", "blob")
+
+    detail = client.get(f"/api/history/{session_id}").json()
+    assert detail["manual_markdown"] == MANUAL
+    assert detail["steps"] == STEPS and detail["entities"] == {"device": "adapter"}
+
+    # the search index and summaries see plain text
+    found = client.get("/api/history/search", params={"q": "flurbozine"}).json()["items"]
+    assert [int(i["id"]) for i in found] == [session_id]
+    assert "<mark>flurbozine</mark>" in found[0]["snippet"]
+    items = client.get("/api/history/", params={"limit": 5}).json()["items"]
+    assert next(i for i in items if int(i["id"]) == session_id)["summary"].startswith("# Fix the flurbozine")
+
+
+def test_small_values_stay_plain(client, cleanup):
+    session_id = _write(cleanup, transcript="compression small", manual_markdown="Reboot.", steps=[])
+    assert _stored_types(session_id) == ("text", "text")
+
+
+def _matches(connection, term):
+    return connection.exec_driver_sql(
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?", (term,)
+    ).scalars().all()
+
+
+def test_plain_sqlite_clients_can_write_and_get_indexed(scratch_engine):
+    with scratch_engine.begin() as connection:
+        assert setup_fulltext(connection) is True
+
+    # no application SQL functions on this connection: the schema must not need any
+    connection = sqlite3.connect(scratch_engine.url.database)
+    try:
+        connection.execute(
+            "INSERT INTO helpdesk_sessions (transcript, manual_markdown) VALUES ('plain client', ?)",
+            ("Replace the quuxotron fuse.",),
+        )
+        connection.execute("UPDATE helpdesk_sessions SET transcript = 'plain client edit'")
+        connection.commit()
+    finally:
+        connection.close()
+
+    with scratch_engine.connect() as connection:
+        assert _matches(connection, "quuxotron") == []
+        assert index_missing(connection, batch_size=1) == 1
+        assert index_missing(connection) == 0  # already indexed rows are left alone
+        assert _matches(connection, "quuxotron") == [1]
+
+
+def test_migration_compresses_plain_rows_in_batches(scratch_engine):
+    with scratch_engine.begin() as connection:
+        for _ in range(3):
+            connection.execute(
+                text("INSERT INTO helpdesk_sessions (transcript, manual_markdown, steps) "
+                     "VALUES ('migration test', :m, :s)"),
+                {"m": MANUAL, "s": json.dumps(STEPS)},
+            )
+
+    with scratch_engine.connect() as connection:
+        result = compression.compress_existing(connection, batch_size=2)
+        report = compression.storage_report(connection, batch_size=2)
+        stored = connection.exec_driver_sql(
+            "SELECT typeof(manual_markdown), typeof(steps) FROM helpdesk_sessions"
+        ).fetchall()
+
+    assert result == {"scanned": 3, "updated": 3}
+    assert stored == [("blob", "blob")] * 3
+    for column in ("manual_markdown", "steps"):
+        assert report[column]["rows"] == report[column]["compressed_rows"] == 3
+        assert report[column]["saved_bytes"] > 0
+
+
+def test_trigger_maintained_index_is_replaced(scratch_engine):
+    frame = compression.compress_bytes(MANUAL.encode("utf-8"))
+    with scratch_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO helpdesk_sessions (transcript, manual_markdown) VALUES ('legacy', ?)", (frame,)
+        )
+        # the earlier layout: content read through a helpdesk_text() view, kept in sync by triggers
+        connection.exec_driver_sql(
+            f"CREATE VIEW {LEGACY_VIEW} AS SELECT id, transcript, manual_markdown FROM helpdesk_sessions"
+        )
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(transcript, manual_markdown, "
+            f"content='{LEGACY_VIEW}', content_rowid='id', tokenize='porter unicode61')"
+        )
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER helpdesk_sessions_fts_ai AFTER INSERT ON helpdesk_sessions BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, transcript, manual_markdown) "
+            f"VALUES (new.id, new.transcript, helpdesk_text(new.manual_markdown)); END"
+        )
+
+    with scratch_engine.begin() as connection:
+        assert setup_fulltext(connection) is True
+        assert setup_fulltext(connection) is False
+
+    with scratch_engine.connect() as connection:
+        assert index_missing(connection) == 1
+        assert _matches(connection, "flurbozine") == [1]
+        leftovers = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type IN ('view', 'trigger')"
+        ).scalars().all()
+        # plain sqlite writes work again, and the manual stays compressed
+        connection.exec_driver_sql("INSERT INTO helpdesk_sessions (transcript) VALUES ('after')")
+        stored = connection.exec_driver_sql("SELECT typeof(manual_markdown) FROM helpdesk_sessions").scalar()
+    assert leftovers == [] and stored == "blob"
+
+
+def test_frames_record_their_dictionary(monkeypatch):
+    samples = [f"Step {i}: open Settings > Network and toggle WiFi for device {i}.".encode() for i in range(2000)]
+    trained = zstandard.train_dictionary(4096, samples)
+
+    registry = compression.DictionaryRegistry()
+    registry._dicts, registry.active_id, registry._loaded = {trained.dict_id(): trained}, trained.dict_id(), True
+    monkeypatch.setattr(compression, "dictionaries", registry)
+
+    frame = compression.from_text(MANUAL)
+    assert zstandard.get_frame_parameters(frame).dict_id == trained.dict_id()
+    assert compression.to_text(frame) == MANUAL
@@ -0,0 +1,22 @@
+# backend/tests/test_context_builder.py
+
+from app.rag.context_builder import build_context, dedupe
+from app.utils.tokens import count_tokens
+
+
+WIFI = "Open Settings, choose Network and Internet, then select WiFi and toggle it off and on again."
+
+
+def test_dedupe_drops_near_duplicates():
+    texts = [WIFI, WIFI + " Done.", "Check that the printer has paper and toner before printing."]
+    assert dedupe(texts) == [0, 2]
+
+
+def test_build_context_reranks_and_respects_budget():
+    printer = "Printer prints blank pages: clean the print heads and replace the empty toner cartridge."
+    filler = "General advice about keeping your computer updated and backed up regularly. " * 40
+
+    context, used = build_context("printer blank pages", [filler, WIFI, printer], token_budget=120)
+    assert used[0] == printer
+    assert count_tokens(context) <= 120
+    assert len(used) < 3
@@ -0,0 +1,38 @@
+# backend/tests/test_database.py
+
+import pytest
+
+from app.db.database import async_database_url
+from app.services.session_service import session_pk
+
+
+def test_async_database_url_picks_async_driver():
+    assert async_database_url("sqlite:///./helpdesk.db") == "sqlite+aiosqlite:///./helpdesk.db"
+    assert async_database_url("postgresql://u:p@db/helpdesk") == "postgresql+asyncpg://u:p@db/helpdesk"
+    assert async_database_url("postgresql+psycopg2://u:p@db/x") == "postgresql+asyncpg://u:p@db/x"
+
+
+def test_session_pk_ignores_uuid_ids():
+    assert session_pk("42") == 42
+    assert session_pk("0b6f5a5e-6f0e-4a8e-9a53-2f6f3c1d9e10") is None
+    assert session_pk(None) is None
+
+
+def test_device_round_trip_on_async_session(client):
+    created = client.post("/api/devices/", json={"name": "Async test laptop", "type": "laptop"}).json()
+    assert any(d["id"] == created["id"] for d in client.get("/api/devices/").json())
+
+    assert client.delete(f"/api/devices/{created['id']}").json() == {"message": "Device deleted"}
+    assert all(d["id"] != created["id"] for d in client.get("/api/devices/").json())
+
+
+def test_sqlite_connections_use_production_pragmas():
+    from app.db.database import DATABASE_URL, SQLITE_PROFILE, engine, effective_settings
+    if not DATABASE_URL.startswith("sqlite") or SQLITE_PROFILE != "production":
+        pytest.skip("SQLite production profile not active")
+
+    with engine.connect() as connection:
+        settings = effective_settings(connection)
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == 1  # NORMAL
+    assert settings["busy_timeout"] == 5000
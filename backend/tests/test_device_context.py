@@ -0,0 +1,54 @@
+# backend/tests/test_device_context.py
+
+import asyncio
+
+from app.db.database import AsyncSessionLocal, close_db
+from app.services.device_service import DeviceContextCache, bump_devices_version, device_context_cache
+
+
+def _names(context):
+    return {d["name"] for d in context.devices}
+
+
+def test_context_is_reused_until_devices_change(client):
+    async def get(cache):
+        async with AsyncSessionLocal() as db:
+            return await cache.get(db)
+
+    created = client.post("/api/devices/", json={"name": "Context test phone", "type": "phone"}).json()
+    try:
+        first = asyncio.run(get(device_context_cache))
+        again = asyncio.run(get(device_context_cache))
+        assert again is first
+        assert "Context test phone" in _names(first)
+        assert "Context test phone" in first.prompt_block
+    finally:
+        client.delete(f"/api/devices/{created['id']}")
+
+    # the delete handler invalidates this worker's copy
+    after = asyncio.run(get(device_context_cache))
+    assert "Context test phone" not in _names(after)
+    assert after.version > first.version
+    asyncio.run(close_db())
+
+
+def test_other_workers_notice_version_bump(client):
+    # a second cache stands in for another worker's copy
+    other = DeviceContextCache(version_ttl=0)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            before = await other.get(db)
+            assert await other.get(db) is before
+
+            await bump_devices_version(db)
+            await db.commit()
+            return before, await other.get(db)
+
+    try:
+        before, after = asyncio.run(scenario())
+    finally:
+        asyncio.run(close_db())
+    assert after is not before
+    assert after.version == before.version + 1
+    assert other.stats()["loads"] == 2
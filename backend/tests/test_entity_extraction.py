@@ -0,0 +1,58 @@
+# backend/tests/test_entity_extraction.py
+
+import pytest
+
+from app.rag import entity_extraction
+from app.rag.entity_extraction import extract_entities, extract_entities_local
+
+
+def test_local_extraction_finds_device_os_and_codes():
+    data, confidence = extract_entities_local("Windows 11 laptop update fails with 0x80070005")
+    assert data["device"] == "laptop"
+    assert data["os"] == "windows 11"
+    assert data["error_codes"] == ["0x80070005"]
+    assert "update" in data["keywords"]
+    assert confidence >= 0.9
+
+
+def test_local_extraction_finds_kb_numbers():
+    data, _ = extract_entities_local("Windows 10 update KB5001330 breaks printing")
+    assert data["error_codes"] == ["KB5001330"]
+
+
+def test_local_extraction_infers_os_from_device():
+    data, _ = extract_entities_local("My iPhone wifi keeps dropping")
+    assert data["device"] == "iphone"
+    assert data["os"] == "ios"
+
+
+def test_hybrid_skips_llm_when_confident(monkeypatch):
+    monkeypatch.setattr(entity_extraction, "ENTITY_EXTRACTION_MODE", "hybrid")
+    monkeypatch.setattr(entity_extraction, "chat_completion", lambda *a: pytest.fail("LLM should not be called"))
+    data = extract_entities("Printer shows Error 49 and prints blank pages")
+    assert data["device"] == "printer"
+    assert data["error_codes"] == ["49"]
+
+
+def test_llm_answer_is_merged_and_bad_json_falls_back(monkeypatch):
+    monkeypatch.setattr(entity_extraction, "ENTITY_EXTRACTION_MODE", "llm")
+
+    monkeypatch.setattr(entity_extraction, "chat_completion",
+                        lambda *a: '```json\n{"device": "router", "os": null, "error_codes": [], "keywords": []}\n```')
+    data = extract_entities("router on windows 10 keeps disconnecting")
+    assert data["device"] == "router"
+    assert data["os"] == "windows 10"
+    assert "disconnecting" in data["keywords"]
+
+    monkeypatch.setattr(entity_extraction, "chat_completion", lambda *a: "not json")
+    data = extract_entities("My iPhone wifi keeps dropping")
+    assert data["device"] == "iphone"
+
+
+def test_llm_string_fields_become_lists(monkeypatch):
+    monkeypatch.setattr(entity_extraction, "ENTITY_EXTRACTION_MODE", "llm")
+    monkeypatch.setattr(entity_extraction, "chat_completion",
+                        lambda *a: '{"device": "printer", "error_codes": "E-22", "keywords": "jam"}')
+    data = extract_entities("printer shows E-22")
+    assert data["error_codes"] == ["E-22"]
+    assert data["keywords"] == ["jam"]
@@ -0,0 +1,72 @@
+# backend/tests/test_history.py
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.api.history import _created_at_filter
+
+# rows live in a fixed past window so other tests' sessions never interfere
+WINDOW = {"since": "2001-01-01T00:00:00", "until": "2001-01-02T00:00:00"}
+
+
+@pytest.fixture
+def sessions(insert_sessions):
+    # five rows, three sharing a timestamp so the id tie-break is exercised
+    stamps = ["2001-01-01 10:00:00"] * 3 + ["2001-01-01 11:00:00", "2001-01-01 12:00:00"]
+    return insert_sessions([
+        {"transcript": f"history test {i}", "manual_markdown": "x" * 500, "created_at": stamp}
+        for i, stamp in enumerate(stamps)
+    ])
+
+
+def test_history_pages_cover_window_without_overlap(client, sessions):
+    seen, cursor = [], None
+    while True:
+        params = dict(WINDOW, limit=2)
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/history/", params=params).json()
+        assert len(body["items"]) <= 2
+        seen.extend(int(item["id"]) for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    # newest first, ties broken by descending id
+    expected = [sessions[4], sessions[3], sessions[2], sessions[1], sessions[0]]
+    assert seen == expected
+
+
+def test_history_summary_is_truncated(client, sessions):
+    body = client.get("/api/history/", params=dict(WINDOW, summary_chars=40, transcript_chars=7)).json()
+    item = body["items"][0]
+    assert item["summary"] == "x" * 40
+    assert item["truncated"] is True
+    assert item["transcript"] == "history"
+    assert item["transcript_truncated"] is True
+    assert "manual_markdown" not in item
+
+
+def test_history_date_filter(client, sessions):
+    params = {"since": "2001-01-01T10:30:00", "until": WINDOW["until"]}
+    body = client.get("/api/history/", params=params).json()
+    assert [int(i["id"]) for i in body["items"]] == [sessions[4], sessions[3]]
+
+
+def test_history_detail(client, sessions):
+    body = client.get(f"/api/history/{sessions[0]}").json()
+    assert body["manual_markdown"] == "x" * 500
+    assert client.get("/api/history/999999999").status_code == 404
+
+
+def test_history_rejects_bad_cursor(client):
+    assert client.get("/api/history/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_postgres_compares_created_at_as_a_timestamp():
+    created, value = _created_at_filter("postgresql")
+    clause = created >= value(datetime(2001, 1, 1))
+    sql = str(clause.compile(dialect=postgresql.asyncpg.dialect()))
+    assert "VARCHAR" not in sql and "TIMESTAMP" in sql
@@ -0,0 +1,147 @@
+# backend/tests/test_ingest.py
+
+from app.utils import embeddings
+from app.rag import bm25, ingest, manifest
+from app.rag.ingest import index_records, sync_documents
+from app.rag.vector_store import LocalVectorStore
+from app.utils.chunker import Chunk
+
+
+def fake_embed_batch(calls):
+    def _embed(texts, model):
+        calls.append(len(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+    return _embed
+
+
+def test_index_records_batches_embeddings_and_upserts(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(embeddings, "_embed_batch", fake_embed_batch(calls))
+    monkeypatch.setattr(embeddings, "embedding_cache", embeddings.EmbeddingCache(disk_path=None))
+    monkeypatch.setattr(embeddings, "EMBED_BATCH_SIZE", 4)
+
+    store = LocalVectorStore(path=str(tmp_path))
+    records = [{"id": f"c{i}", "text": "x" * (i + 1)} for i in range(10)]
+
+    assert index_records(store, records, upsert_batch_size=3) == 10
+    assert store.count() == 10
+    assert sorted(calls) == [2, 4, 4]
+
+    # second run is served entirely from the embedding cache
+    calls.clear()
+    index_records(store, records)
+    assert calls == []
+
+
+def test_index_records_streams_an_iterable(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "_embed_batch", fake_embed_batch([]))
+    monkeypatch.setattr(embeddings, "embedding_cache", embeddings.EmbeddingCache(disk_path=None))
+    monkeypatch.setattr(embeddings, "EMBED_BATCH_SIZE", 2)
+    monkeypatch.setattr(embeddings, "EMBED_MAX_CONCURRENCY", 1)
+
+    pulled, seen_at_upsert = [0], []
+
+    def records():
+        for i in range(20):
+            pulled[0] += 1
+            yield {"id": f"c{i}", "text": "x" * (i + 1)}
+
+    store = LocalVectorStore(path=str(tmp_path))
+    upsert = store.upsert
+    monkeypatch.setattr(store, "upsert", lambda batch: (seen_at_upsert.append(pulled[0]), upsert(batch)))
+
+    assert index_records(store, records(), upsert_batch_size=2) == 20
+    assert store.count() == 20
+    # the generator is read a window at a time, not drained up front
+    assert seen_at_upsert[0] <= 4
+
+
+def test_sync_documents_is_incremental(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(embeddings, "_embed_batch", fake_embed_batch(calls))
+    monkeypatch.setattr(embeddings, "embedding_cache", embeddings.EmbeddingCache(disk_path=None))
+    monkeypatch.setattr(manifest, "INGEST_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(bm25, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "wifi.md").write_text("restart router. forget network. update drivers.")
+    (docs / "printer.md").write_text("check toner. clean heads.")
+
+    def chunker(path):
+        with open(path) as f:
+            sentences = [s.strip() for s in f.read().split(".") if s.strip()]
+        return [Chunk(s, ("Guide",), i) for i, s in enumerate(sentences)]
+
+    store = LocalVectorStore(path=str(tmp_path / "index"))
+    stats = sync_documents(store, str(docs), chunker=chunker, chunker_id="test")
+    assert stats["chunks_added"] == 5
+    assert store.count() == 5
+
+    # re-run without changes does nothing
+    stats = sync_documents(store, str(docs), chunker=chunker, chunker_id="test")
+    assert stats["files_unchanged"] == 2
+    assert stats["chunks_added"] == 0
+
+    # edit one chunk, remove a file
+    (docs / "wifi.md").write_text("restart router. forget network. reinstall drivers.")
+    (docs / "printer.md").unlink()
+    calls.clear()
+    stats = sync_documents(store, str(docs), chunker=chunker, chunker_id="test")
+    assert stats["chunks_added"] == 1
+    assert stats["chunks_deleted"] == 3
+    assert stats["files_removed"] == 1
+    assert calls == [1]
+    assert store.count() == 3
+
+    # the lexical index tracks the same chunks
+    lexical = bm25.BM25Index.for_store(store)
+    assert len(lexical) == 3
+    assert lexical.search("reinstall")[0]["metadata"]["source_file"] == "wifi.md"
+    assert lexical.search("toner") == []
+
+
+def test_ingest_leaves_the_index_alone_when_no_documents_are_found(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "_embed_batch", fake_embed_batch([]))
+    monkeypatch.setattr(embeddings, "embedding_cache", embeddings.EmbeddingCache(disk_path=None))
+    monkeypatch.setattr(manifest, "INGEST_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(bm25, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    monkeypatch.setattr(ingest, "DOCS_DIR", str(docs))
+
+    (docs / "wifi.md").write_text("# WiFi\n\nRestart the router.")
+    store = LocalVectorStore(path=str(tmp_path / "index"))
+    ingest.ingest(store)
+    indexed = store.count()
+    assert indexed > 0
+
+    # an emptied (e.g. unmounted) docs dir must not prune the whole index
+    (docs / "wifi.md").unlink()
+    ingest.ingest(store)
+    assert store.count() == indexed
+
+
+def test_embedding_change_rebuilds_index(tmp_path, monkeypatch):
+    dims = [2]
+    monkeypatch.setattr(embeddings, "_embed_batch", lambda texts, model: [[1.0] * dims[0] for _ in texts])
+    monkeypatch.setattr(embeddings, "embedding_cache", embeddings.EmbeddingCache(disk_path=None))
+    monkeypatch.setattr(manifest, "INGEST_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(bm25, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "wifi.md").write_text("# WiFi\n\nRestart the router.")
+
+    store = LocalVectorStore(path=str(tmp_path / "index"))
+    monkeypatch.setattr(ingest, "embedding_info", lambda: {"provider": "openai", "model": "a", "dimension": 2})
+    sync_documents(store, str(docs))
+
+    # switching provider re-embeds everything even though no file changed
+    dims[0] = 3
+    monkeypatch.setattr(ingest, "embedding_info", lambda: {"provider": "local", "model": "b", "dimension": 3})
+    monkeypatch.setattr(embeddings, "embedding_cache", embeddings.EmbeddingCache(disk_path=None))
+    stats = sync_documents(store, str(docs))
+    assert stats["chunks_added"] == store.count() == 1
+    assert store.query([1.0, 1.0, 1.0], top_k=1)[0]["score"] > 0.99
+    assert manifest.IngestManifest.for_store(store).embedding["provider"] == "local"
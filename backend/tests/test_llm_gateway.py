@@ -0,0 +1,102 @@
+# backend/tests/test_llm_gateway.py
+
+import threading
+
+import httpx
+import openai
+import pytest
+
+from app.utils import llm_gateway
+from app.utils.llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailableError
+
+
+def status_error(status):
+    response = httpx.Response(status, request=httpx.Request("POST", "https://api.openai.com/v1/x"))
+    cls = openai.RateLimitError if status == 429 else openai.InternalServerError if status >= 500 else openai.BadRequestError
+    return cls("upstream error", response=response, body=None)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(llm_gateway.time, "sleep", lambda s: None)
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    gw = LLMGateway(max_retries=3)
+    gw._client = object()
+    errors = [status_error(429), status_error(503)]
+
+    def fn(client, timeout):
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert gw.call("chat", "m", fn) == "ok"
+    assert gw.stats()["retries"] == 2
+
+
+def test_client_errors_are_not_retried():
+    gw = LLMGateway(max_retries=3)
+    gw._client = object()
+    calls = []
+
+    def fn(client, timeout):
+        calls.append(1)
+        raise status_error(400)
+
+    with pytest.raises(openai.BadRequestError):
+        gw.call("chat", "m", fn)
+    assert len(calls) == 1
+
+
+def test_breaker_opens_and_half_opens(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(llm_gateway.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] = 11
+    assert breaker.allow()        # single trial call
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast():
+    gw = LLMGateway(max_retries=0)
+    gw._client = object()
+
+    def failing(client, timeout):
+        raise status_error(500)
+
+    for _ in range(llm_gateway.LLM_BREAKER_THRESHOLD):
+        with pytest.raises(openai.InternalServerError):
+            gw.call("chat", "m", failing)
+    with pytest.raises(LLMUnavailableError):
+        gw.call("chat", "m", lambda c, t: "never called")
+    assert gw.stats()["breakers"]["m"] == "open"
+
+
+def test_per_model_limit_rejects_when_saturated():
+    gw = LLMGateway(max_concurrency=4, model_concurrency=1, queue_timeout=0.05)
+    gw._client = object()
+    started, release = threading.Event(), threading.Event()
+
+    def slow(client, timeout):
+        started.set()
+        release.wait(2)
+        return "slow"
+
+    worker = threading.Thread(target=gw.call, args=("chat", "m", slow))
+    worker.start()
+    started.wait(2)
+    with pytest.raises(LLMUnavailableError):
+        gw.call("chat", "m", lambda c, t: "blocked")
+    assert gw.call("chat", "other", lambda c, t: "free") == "free"
+    release.set()
+    worker.join()
+    assert gw.stats()["in_flight"] == 0
@@ -0,0 +1,85 @@
+# backend/tests/test_local_embeddings.py
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.rag import manifest, vector_search
+from app.rag.vector_store import LocalVectorStore
+from app.utils import embeddings
+from app.utils.local_embeddings import LocalEmbedder
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(len(texts))
+        time.sleep(0.02)
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_requests_share_forward_passes():
+    embedder = LocalEmbedder(model_name="fake", max_batch=16, wait_ms=20)
+    embedder._model = FakeModel()
+
+    results = {}
+
+    def worker(i):
+        results[i] = embedder.embed("x" * i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 11)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(results[i][0] == i for i in range(1, 11))
+    assert sum(embedder._model.batches) == 10
+    assert len(embedder._model.batches) < 10
+    assert embedder.dimension == 3
+
+
+def test_local_provider_is_recorded(monkeypatch):
+    embedder = LocalEmbedder(model_name="fake-local")
+    embedder._model = FakeModel()
+    monkeypatch.setenv("EMBED_PROVIDER", "local")
+    monkeypatch.setattr(embeddings, "get_local_embedder", lambda: embedder)
+
+    assert embeddings.embedding_info() == {"provider": "local", "model": "fake-local", "dimension": 3}
+    assert embeddings._embed_batch(["ab", "abc"], "fake-local")[1][0] == 3.0
+
+
+def test_compatibility_check_reads_the_manifest_only_when_it_changes(tmp_path, monkeypatch):
+    store = LocalVectorStore(path=str(tmp_path / "index"))
+    monkeypatch.setattr(manifest, "INGEST_MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(vector_search, "get_vector_store", lambda: store)
+    monkeypatch.setattr(embeddings, "embedding_info", lambda: {"provider": "local", "model": "m", "dimension": 3})
+    monkeypatch.setattr(vector_search, "embedding_info", embeddings.embedding_info)
+
+    loads = []
+    real_load = manifest.IngestManifest.load
+
+    def counting_load(path):
+        loads.append(path)
+        return real_load(path)
+    monkeypatch.setattr(manifest.IngestManifest, "load", staticmethod(counting_load))
+
+    saved = manifest.IngestManifest(manifest.IngestManifest.path_for(store),
+                                    embedding={"provider": "openai", "model": "x", "dimension": 3})
+    saved.save()
+    assert not vector_search.vector_index_compatible()
+    assert not vector_search.vector_index_compatible()
+    assert len(loads) == 1
+
+    saved.embedding = embeddings.embedding_info()
+    saved.save()
+    os.utime(saved.path, (os.path.getatime(saved.path), os.path.getmtime(saved.path) + 1))
+    assert vector_search.vector_index_compatible()
+    assert len(loads) == 2
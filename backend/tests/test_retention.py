@@ -0,0 +1,114 @@
+# backend/tests/test_retention.py
+
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.api import history
+from app.db.database import SessionLocal
+from app.services import retention
+from app.services.retention import SessionArchive
+
+CUTOFF = datetime(2000, 1, 1)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = SessionArchive(str(tmp_path))
+    monkeypatch.setattr(history, "session_archive", archive)
+    return archive
+
+
+@pytest.fixture
+def old_sessions(insert_sessions):
+    rows = [
+        ("quuxscanner streaks pages", "Clean the quuxscanner glass.", "1999-03-01 10:00:00"),
+        ("vpn drops", "Renew the certificate.", "1999-06-01 10:00:00"),
+        ("badge reader dead", "Reseat the quuxscanner cable.", "1999-09-01 10:00:00"),
+        ("keyboard sticky", "Replace it.", "2001-01-01 10:00:00"),
+    ]
+    return insert_sessions([
+        {"transcript": t, "manual_markdown": m, "steps": '["step one"]', "created_at": c} for t, m, c in rows
+    ])
+
+
+def _remaining(ids):
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("SELECT id FROM helpdesk_sessions WHERE id IN (%s)" % ",".join(map(str, ids))))
+        return {r[0] for r in rows}
+    finally:
+        db.close()
+
+
+def test_archive_moves_old_sessions_in_batches(archive, old_sessions):
+    result = archive.archive_older_than(CUTOFF, batch_size=2)
+
+    assert result["archived"] == 3
+    assert _remaining(old_sessions) == {old_sessions[3]}
+
+    segments = archive.load_index()
+    assert len(segments) == 1 and segments[0]["rows"] == 3
+    assert segments[0]["min_created"].startswith("1999-03-01")
+    assert segments[0]["max_created"].startswith("1999-09-01")
+
+    records = list(archive.scan())
+    assert [r["id"] for r in records] == old_sessions[:3]
+    assert records[0]["steps"] == ["step one"]
+    assert records[0]["manual_markdown"] == "Clean the quuxscanner glass."
+
+
+@pytest.mark.parametrize("codec", ["zstd", "gzip"])
+def test_torn_final_frame_is_ignored_and_overwritten(codec, archive, old_sessions, monkeypatch):
+    if codec == "gzip":
+        monkeypatch.setattr(retention, "_zstd", lambda: None)
+    archive.archive_older_than(CUTOFF, batch_size=2)
+    segment = archive.load_index()[0]
+    with open(os.path.join(archive.path, segment["file"]), "ab") as f:
+        f.write(b"\x28\xb5\x2f\xfd\x00torn")  # a crash in the middle of the next append
+
+    assert [r["id"] for r in archive.scan()] == old_sessions[:3]
+
+    # the next run appends over the torn bytes
+    archive.archive_older_than(datetime(2002, 1, 1))
+    assert [r["id"] for r in archive.scan()] == old_sessions
+
+
+def test_repeated_batch_is_scanned_once(archive, old_sessions):
+    archive.archive_older_than(CUTOFF)
+    records = list(archive.scan())
+
+    # an interrupted run wrote the batch but never deleted the rows
+    segments = archive.load_index()
+    archive._append(archive._current_segment(segments), records)
+    archive._save_index(segments)
+
+    assert [r["id"] for r in archive.scan()] == old_sessions[:3]
+    assert [r["id"] for r in archive.scan(query="vpn")] == [old_sessions[1]]
+
+
+def test_dry_run_only_counts(archive, old_sessions):
+    assert archive.archive_older_than(CUTOFF, dry_run=True)["eligible"] == 3
+    assert _remaining(old_sessions) == set(old_sessions)
+
+
+def test_scan_filters_and_skips_segments(archive, old_sessions):
+    archive.archive_older_than(CUTOFF)
+
+    assert [r["id"] for r in archive.scan(query="QUUXSCANNER")] == [old_sessions[0], old_sessions[2]]
+    assert [r["id"] for r in archive.scan(since=datetime(1999, 5, 1), until=datetime(1999, 7, 1))] == \
+        [old_sessions[1]]
+    assert list(archive.scan(since=datetime(2005, 1, 1))) == []
+
+
+def test_archived_sessions_leave_the_search_index(client, archive, old_sessions):
+    archive.archive_older_than(CUTOFF)
+
+    body = client.get("/api/history/search", params={"q": "quuxscanner"}).json()
+    assert body["items"] == []
+
+    body = client.get("/api/history/archive", params={"q": "quuxscanner", "limit": 1}).json()
+    assert body["items"][0]["id"] == str(old_sessions[0])
+    assert body["next_offset"] == 1
@@ -0,0 +1,47 @@
+# backend/tests/test_search.py
+
+import pytest
+
+from app.db.database import SessionLocal
+from app.db.fulltext import _sqlite_match, query_terms
+from app.services.session_writer import SessionWrite, apply_writes
+
+
+@pytest.fixture
+def sessions(insert_sessions):
+    return insert_sessions([
+        {"transcript": "zebraprinter jams on tray two", "manual_markdown": "Open the zebraprinter rear door."},
+        {"transcript": "laptop is slow", "manual_markdown": "Check whether the zebraprinter driver hogs the CPU."},
+        {"transcript": "monitor flickers", "manual_markdown": "Swap the cable."},
+    ])
+
+
+def test_match_expression_quotes_user_input():
+    assert query_terms('wifi "OR" NEAR(') == ["wifi", "or", "near"]
+    assert _sqlite_match(["wifi", "drops"]) == '"wifi" "drops"*'
+
+
+def test_search_ranks_transcript_matches_first(client, sessions):
+    body = client.get("/api/history/search", params={"q": "zebraprinter"}).json()
+    ids = [int(item["id"]) for item in body["items"]]
+    assert ids[:2] == [sessions[0], sessions[1]]
+    assert "<mark>zebraprinter</mark>" in body["items"][0]["snippet"]
+
+
+def test_search_paginates(client, sessions):
+    first = client.get("/api/history/search", params={"q": "zebraprinter", "limit": 1}).json()
+    assert len(first["items"]) == 1 and first["next_offset"] == 1
+
+    second = client.get("/api/history/search", params={"q": "zebraprinter", "limit": 1, "offset": 1}).json()
+    assert second["items"][0]["id"] != first["items"][0]["id"]
+
+
+def test_search_index_follows_updates(client, sessions):
+    db = SessionLocal()
+    apply_writes(db, [SessionWrite(sessions[2], update={"manual_markdown": "Replace the quuxcable."})])
+    db.commit()
+    db.close()
+
+    found = client.get("/api/history/search", params={"q": "quuxcable"}).json()["items"]
+    assert [int(i["id"]) for i in found] == [sessions[2]]
+    assert client.get("/api/history/search", params={"q": "swap cable flickers"}).json()["items"] == []
@@ -0,0 +1,109 @@
+# backend/tests/test_session_writer.py
+
+from sqlalchemy.orm import undefer_group
+
+from app.db.database import SessionLocal
+from app.db.fulltext import unindex_sessions
+from app.db.models import HelpdeskSession
+from app.services.session_writer import SessionWrite, SessionWriter
+
+
+def _rows(marker):
+    db = SessionLocal()
+    try:
+        # payload columns are deferred; load them before the session closes
+        return (db.query(HelpdeskSession).options(undefer_group("payload"))
+                .filter(HelpdeskSession.transcript.like(f"{marker}%")).all())
+    finally:
+        db.close()
+
+
+def _cleanup(marker):
+    db = SessionLocal()
+    rows = db.query(HelpdeskSession.id).filter(HelpdeskSession.transcript.like(f"{marker}%"))
+    ids = [row.id for row in rows]
+    # the writer indexed these rows; a contentless index must be told before they go
+    unindex_sessions(db.connection(), ids)
+    db.query(HelpdeskSession).filter(HelpdeskSession.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def test_writes_are_batched_and_visible_after_sync(client):
+    marker = "writer batch test"
+    writer = SessionWriter(batch_size=50, flush_ms=10_000)
+    try:
+        for i in range(5):
+            assert writer.submit(SessionWrite(create={"transcript": f"{marker} {i}", "manual_markdown": "m"}))
+        assert writer.depth == 5
+
+        # sync flushes immediately instead of waiting for the 10s timer
+        assert writer.sync(timeout=5)
+        assert len(_rows(marker)) == 5
+        assert writer.stats()["batches"] == 1
+        assert writer.depth == 0
+    finally:
+        writer.close()
+        _cleanup(marker)
+
+
+def test_update_and_close_drains_queue(client):
+    marker = "writer update test"
+    writer = SessionWriter(flush_ms=10_000)
+    try:
+        writer.submit(SessionWrite(create={"transcript": marker, "manual_markdown": "old"}))
+        writer.sync(timeout=5)
+        row_id = _rows(marker)[0].id
+
+        writer.submit(SessionWrite(str(row_id), create={"transcript": f"{marker} new"},
+                                   update={"manual_markdown": "new"}))
+        writer.close()
+
+        rows = _rows(marker)
+        assert [(r.id, r.manual_markdown) for r in rows] == [(row_id, "new")]
+    finally:
+        _cleanup(marker)
+
+
+def test_wait_returns_the_new_row_id(client):
+    marker = "writer wait test"
+    writer = SessionWriter(flush_ms=10_000)
+    try:
+        create = SessionWrite(create={"transcript": marker})
+        writer.submit(create)
+        # waiting flushes the writer's batch now, not on the 10s timer
+        row_id = writer.wait(create, timeout=5)
+        assert row_id == _rows(marker)[0].id
+
+        update = SessionWrite(str(row_id), update={"manual_markdown": "m"})
+        writer.submit(update)
+        assert writer.wait(update, timeout=5) == row_id
+    finally:
+        writer.close()
+        _cleanup(marker)
+
+
+def test_disabled_writer_falls_back_to_inline(client):
+    marker = "writer inline test"
+    writer = SessionWriter(enabled=False)
+    try:
+        write = SessionWrite(create={"transcript": marker})
+        assert not writer.submit(write)
+        writer.write_now(write)
+        assert len(_rows(marker)) == 1 and writer.stats()["inline"] == 1
+    finally:
+        _cleanup(marker)
+
+
+def test_history_reads_its_own_writes(client, monkeypatch):
+    from app.api import rag
+    monkeypatch.setattr(rag, "query_cache_vector", lambda q: None)
+    monkeypatch.setattr(rag, "_answer_query", lambda q, devices: ("Reboot it.", []))
+
+    marker = "writer history test"
+    try:
+        client.post("/api/rag/query", json={"query": marker})
+        items = client.get("/api/history/", params={"limit": 20}).json()["items"]
+        assert any(item["transcript"] == marker for item in items)
+    finally:
+        _cleanup(marker)
@@ -0,0 +1,90 @@
+# backend/tests/test_singleflight.py
+
+import asyncio
+import time
+
+import httpx
+
+from app.main import app
+from app.api import rag
+from app.db.database import SessionLocal, close_db
+from app.db.models import HelpdeskSession
+from app.services.session_writer import session_writer
+from app.utils.concurrency import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        same = await asyncio.gather(*[flight.do("wifi", compute) for _ in range(5)])
+        other = await flight.do("printer", compute)
+        return same, other
+
+    same, other = asyncio.run(main())
+    assert same == ["answer"] * 5 and other == "answer"
+    assert len(calls) == 2
+    assert flight.stats() == {"leaders": 2, "followers": 4, "in_flight": 0}
+
+
+def test_computation_is_cancelled_with_its_last_caller():
+    flight = SingleFlight("test")
+    finished = []
+
+    async def compute():
+        await asyncio.sleep(0.1)
+        finished.append(1)
+        return "answer"
+
+    async def main():
+        keep = asyncio.ensure_future(flight.do("wifi", compute))
+        drop = asyncio.ensure_future(flight.do("wifi", compute))
+        await asyncio.sleep(0.01)
+        drop.cancel()
+        assert await keep == "answer"  # one caller leaving doesn't cancel it for the other
+
+        alone = asyncio.ensure_future(flight.do("printer", compute))
+        await asyncio.sleep(0.01)
+        alone.cancel()
+        await asyncio.sleep(0.15)
+
+    asyncio.run(main())
+    assert finished == [1]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_identical_rag_queries_coalesce_but_each_gets_a_session(client, monkeypatch):
+    calls = []
+
+    def slow_answer(query, devices):
+        calls.append(query)
+        time.sleep(0.2)
+        return "Restart the router.", []
+
+    monkeypatch.setattr(rag, "query_cache_vector", lambda q: None)
+    monkeypatch.setattr(rag, "_answer_query", slow_answer)
+
+    async def main():
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://test") as http:
+                queries = ["WiFi not working", "wifi   not working", "wifi not working"]
+                return await asyncio.gather(*[http.post("/api/rag/query", json={"query": q}) for q in queries])
+        finally:
+            await close_db()  # its aiosqlite connections belong to this loop
+
+    db = SessionLocal()
+    before = db.query(HelpdeskSession).count()
+    responses = asyncio.run(main())
+    session_writer.sync()  # sessions are written behind the response
+    after = db.query(HelpdeskSession).count()
+    db.close()
+
+    assert [r.json()["answer"] for r in responses] == ["Restart the router."] * 3
+    assert len(calls) == 1
+    assert after - before == 3
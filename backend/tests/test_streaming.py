@@ -0,0 +1,101 @@
+# backend/tests/test_streaming.py
+
+import json
+
+import pytest
+
+from app.api import rag, troubleshoot
+from app.rag.answer_cache import SemanticCache
+from app.rag.llm_reasoning import StepStreamParser
+
+ANSWER = json.dumps({
+    "steps": ["Restart the \"router\"", "Forget the network"],
+    "manual_markdown": "# Fix\n\n1. Restart\n2. Forget",
+})
+
+
+def parse_sse(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_step_parser_emits_steps_as_they_complete():
+    parser = StepStreamParser()
+    events = []
+    raw = "```json\n" + ANSWER + "\n```"
+    for i in range(0, len(raw), 5):
+        events.extend(parser.feed(raw[i:i + 5]))
+
+    assert [t for k, t in events if k == "step"] == ["Restart the \"router\"", "Forget the network"]
+    assert "".join(t for k, t in events if k == "manual") == "# Fix\n\n1. Restart\n2. Forget"
+
+    partial = StepStreamParser()
+    assert partial.feed('{"steps": ["one", "tw') == [("step", "one")]
+
+
+def test_troubleshoot_stream_event_order(client, monkeypatch):
+    monkeypatch.setattr(troubleshoot, "query_cache_vector", lambda q: None)
+    monkeypatch.setattr(troubleshoot, "extract_entities", lambda q: {"device": "router", "os": None,
+                                                                     "error_codes": [], "keywords": []})
+    monkeypatch.setattr(troubleshoot, "retrieve_docs", lambda q, top_k: ["Restart the router."])
+    monkeypatch.setattr(troubleshoot, "chat_completion_stream",
+                        lambda s, u: (ANSWER[i:i + 7] for i in range(0, len(ANSWER), 7)))
+
+    response = client.post("/api/troubleshoot/stream", json={"transcript": "router keeps dropping"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    kinds = [k for k, _ in events]
+    assert kinds[:2] == ["entities", "sources"]
+    assert kinds[-1] == "done"
+    assert [d["text"] for k, d in events if k == "step"] == ["Restart the \"router\"", "Forget the network"]
+    assert events[-1][1]["manual_markdown"] == "# Fix\n\n1. Restart\n2. Forget"
+
+    # the id in the response is the persisted row's: history can open it, and a follow-up updates it
+    session_id = events[-1][1]["session_id"]
+    detail = client.get(f"/api/history/{session_id}").json()
+    assert detail["transcript"] == "router keeps dropping"
+    assert [s["text"] for s in detail["steps"]] == ["Restart the \"router\"", "Forget the network"]
+
+    response = client.post("/api/troubleshoot/stream", json={"transcript": "still dropping", "session_id": session_id})
+    assert parse_sse(response.text)[-1][1]["session_id"] == session_id
+
+
+def test_rag_stream_emits_sources_then_tokens(client, monkeypatch):
+    monkeypatch.setattr(rag, "query_cache_vector", lambda q: None)
+    monkeypatch.setattr(rag, "retrieve_docs", lambda q, top_k: ["Check the toner."])
+    monkeypatch.setattr(rag, "chat_completion_stream", lambda s, u: iter(["Replace ", "the toner."]))
+
+    response = client.post("/api/rag/query/stream", json={"query": "printer blank pages"})
+    events = parse_sse(response.text)
+
+    assert events[0] == ("sources", {"sources": ["Check the toner."]})
+    assert [d["text"] for k, d in events if k == "token"] == ["Replace ", "the toner."]
+    assert events[-1][1]["answer"] == "Replace the toner."
+
+
+def test_troubleshoot_stream_cache_hit_still_sends_sources(client, monkeypatch):
+    monkeypatch.setattr(troubleshoot, "troubleshoot_answer_cache",
+                        SemanticCache("test", threshold=0.9, ttl=60, max_entries=8))
+    monkeypatch.setattr(troubleshoot, "query_cache_vector", lambda q: [1.0, 0.0])
+    monkeypatch.setattr(troubleshoot, "extract_entities", lambda q: {"device": "router", "os": None,
+                                                                     "error_codes": [], "keywords": []})
+    monkeypatch.setattr(troubleshoot, "retrieve_docs", lambda q, top_k: ["Restart the router."])
+    monkeypatch.setattr(troubleshoot, "chat_completion_stream", lambda s, u: iter([ANSWER]))
+
+    first = parse_sse(client.post("/api/troubleshoot/stream", json={"transcript": "router drops"}).text)
+    # a cache hit starts no extraction or retrieval (pool threads can't be cancelled)
+    analysed = []
+    monkeypatch.setattr(troubleshoot, "extract_entities", lambda q: analysed.append(q))
+    monkeypatch.setattr(troubleshoot, "retrieve_docs", lambda q, top_k: analysed.append(q))
+    monkeypatch.setattr(troubleshoot, "chat_completion_stream", lambda s, u: pytest.fail("cache miss"))
+    second = parse_sse(client.post("/api/troubleshoot/stream", json={"transcript": "router drops"}).text)
+
+    assert [k for k, _ in second][:2] == ["entities", "sources"]
+    assert dict(second)["sources"] == dict(first)["sources"] == {"sources": ["Restart the router."]}
+    assert [d["text"] for k, d in second if k == "step"] == ["Restart the \"router\"", "Forget the network"]
+    assert analysed == []
@@ -0,0 +1,162 @@
+# backend/tests/test_vector_store.py
+
+import os
+
+import numpy as np
+import pytest
+
+from app.rag import ivf, vector_store
+from app.rag.vector_store import LocalVectorStore
+
+
+def test_local_store_upsert_query_delete(tmp_path):
+    store = LocalVectorStore(path=str(tmp_path))
+    store.upsert([
+        {"id": "wifi", "values": [1.0, 0.0, 0.0], "metadata": {"text": "wifi"}},
+        {"id": "printer", "values": [0.0, 2.0, 0.0], "metadata": {"text": "printer"}},
+        {"id": "bluetooth", "values": [0.0, 0.0, 3.0], "metadata": {"text": "bluetooth"}},
+    ])
+    assert store.count() == 3
+
+    matches = store.query([0.9, 0.1, 0.0], top_k=2)
+    assert [m["id"] for m in matches] == ["wifi", "printer"]
+    assert matches[0]["metadata"]["text"] == "wifi"
+
+    # upsert replaces by id, delete removes
+    store.upsert([{"id": "wifi", "values": [0.0, 1.0, 0.0], "metadata": {"text": "wifi v2"}}])
+    store.delete(["printer"])
+    assert store.count() == 2
+
+    # a fresh instance reads the persisted, memory-mapped index
+    reopened = LocalVectorStore(path=str(tmp_path))
+    top = reopened.query([0.0, 1.0, 0.0], top_k=1)[0]
+    assert top["id"] == "wifi"
+    assert top["metadata"]["text"] == "wifi v2"
+
+
+def test_quantized_stores_match_exact_ranking(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 64)).astype(np.float32)
+    records = [{"id": str(i), "values": v.tolist(), "metadata": {}} for i, v in enumerate(vectors)]
+    queries = vectors[:20] + rng.normal(scale=0.3, size=(20, 64)).astype(np.float32)
+
+    exact = LocalVectorStore(path=str(tmp_path / "f32"))
+    exact.upsert(records)
+    for dtype in ("float16", "int8"):
+        store = LocalVectorStore(path=str(tmp_path / dtype), dtype=dtype)
+        store.scan_block_rows = 128  # exercise the blockwise scan
+        store.upsert(records)
+        assert os.path.exists(tmp_path / dtype / f"vectors.{dtype}.npy")
+
+        for q in queries:
+            expected = exact.query(q, top_k=5)
+            got = store.query(q, top_k=5)
+            assert [m["id"] for m in got] == [m["id"] for m in expected]
+            # rescoring uses the float32 rows, so scores are exact
+            assert got[0]["score"] == pytest.approx(expected[0]["score"], abs=1e-5)
+
+
+def test_quantized_copy_is_only_rebuilt_by_writers_when_dtype_changes(tmp_path):
+    store = LocalVectorStore(path=str(tmp_path))
+    store.upsert([{"id": "a", "values": [1.0, 0.0], "metadata": {}},
+                  {"id": "b", "values": [0.0, 1.0], "metadata": {}}])
+
+    # a reader never writes the copy: it scans float32 until the next write
+    int8 = LocalVectorStore(path=str(tmp_path), dtype="int8")
+    assert int8._quantized is None and not os.path.exists(tmp_path / "vectors.int8.npy")
+    assert int8.query([0.1, 1.0], top_k=1)[0]["id"] == "b"
+
+    int8.rebuild()
+    assert int8._quantized is not None and os.path.exists(tmp_path / "vectors.int8.npy")
+    assert int8.query([0.1, 1.0], top_k=1)[0]["id"] == "b"
+
+    int8.delete(["a", "b"])
+    int8.upsert([{"id": "c", "values": [0.0, 0.0, 1.0], "metadata": {}}])
+    assert int8.query([0.0, 0.0, 1.0], top_k=1)[0]["id"] == "c"
+
+
+def test_quantized_reader_follows_in_place_float32_rewrites(tmp_path):
+    rng = np.random.default_rng(2)
+    query = np.ones(16, dtype=np.float32)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+    vectors[0] = -query
+    records = [{"id": str(i), "values": v.tolist(), "metadata": {}} for i, v in enumerate(vectors)]
+
+    int8 = LocalVectorStore(path=str(tmp_path), dtype="int8")
+    int8.upsert(records)
+
+    # same ids and shape, only row 0 changes: it becomes the best match
+    writer = LocalVectorStore(path=str(tmp_path))
+    writer.upsert([{"id": "0", "values": query.tolist(), "metadata": {}}])
+    meta = tmp_path / "meta.json"
+    os.utime(meta, ns=(0, os.stat(meta).st_mtime_ns + 10**9))
+
+    assert int8.query(query, top_k=1)[0]["id"] == "0"
+
+
+def test_quantized_reader_on_a_read_only_index_scans_exactly(tmp_path):
+    store = LocalVectorStore(path=str(tmp_path))
+    store.upsert([{"id": "a", "values": [1.0, 0.0], "metadata": {}},
+                  {"id": "b", "values": [0.0, 1.0], "metadata": {}}])
+    os.chmod(tmp_path, 0o555)
+    try:
+        reader = LocalVectorStore(path=str(tmp_path), dtype="float16")
+        assert reader.query([1.0, 0.1], top_k=1)[0]["id"] == "a"
+    finally:
+        os.chmod(tmp_path, 0o755)
+    assert sorted(os.listdir(tmp_path)) == ["meta.json", "vectors.npy"]
+
+
+def test_ivf_index_recall_incremental_insert_and_reload(tmp_path):
+    rng = np.random.default_rng(1)
+    centres = rng.normal(size=(20, 32))
+    vectors = (centres[rng.integers(0, 20, size=3000)] + rng.normal(scale=0.5, size=(3000, 32))).astype(np.float32)
+    records = [{"id": str(i), "values": v.tolist(), "metadata": {}} for i, v in enumerate(vectors)]
+
+    exact = LocalVectorStore(path=str(tmp_path / "flat"))
+    exact.upsert(records)
+    store = LocalVectorStore(path=str(tmp_path / "ivf"), index_type="ivf", nlist=32, nprobe=8)
+    store.upsert(records[:2000])
+    assert store._ivf is not None and store._ivf.trained_on == 2000
+
+    # incremental insert reuses the trained centroids
+    store.upsert(records[2000:])
+    assert store._ivf.trained_on == 2000
+    assert len(store._ivf.assignments) == 3000
+
+    hits = 0
+    for q in vectors[:50]:
+        expected = {m["id"] for m in exact.query(q, top_k=10)}
+        hits += len(expected & {m["id"] for m in store.query(q, top_k=10)})
+    assert hits / 500 >= 0.9
+
+    # reload memory-maps the persisted lists; nprobe is tunable per query
+    reopened = LocalVectorStore(path=str(tmp_path / "ivf"), index_type="ivf")
+    assert reopened.query(vectors[7], top_k=1, nprobe=32)[0]["id"] == "7"
+
+    reopened.delete([str(i) for i in range(2500, 3000)])
+    assert len(reopened._ivf.assignments) == reopened.count() == 2500
+
+
+def test_ivf_reader_of_a_flat_index_does_not_cluster(tmp_path, monkeypatch):
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(300, 8)).astype(np.float32)
+    records = [{"id": str(i), "values": v.tolist(), "metadata": {}} for i, v in enumerate(vectors)]
+    LocalVectorStore(path=str(tmp_path)).upsert(records)
+    monkeypatch.setattr(vector_store, "LOCAL_IVF_MIN_TRAIN", 100)
+
+    trained = []
+    train = ivf.train_centroids
+    monkeypatch.setattr(ivf, "train_centroids", lambda *a, **k: (trained.append(1), train(*a, **k))[1])
+
+    for _ in range(3):
+        reader = LocalVectorStore(path=str(tmp_path), index_type="ivf", nlist=8)
+        assert reader._ivf is None
+        assert reader.query(vectors[5], top_k=1)[0]["id"] == "5"
+    assert trained == []
+    assert not os.path.exists(tmp_path / "ivf_centroids.npy")
+
+    # the next write clusters the index and records it in meta.json
+    reader.upsert(records[:1])
+    assert trained == [1] and reader._ivf is not None
+    assert LocalVectorStore(path=str(tmp_path), index_type="ivf")._ivf is not None
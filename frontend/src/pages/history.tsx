@@ -1,17 +1,32 @@
-import { useState, useEffect, useRef } from "react";
+import { useState, useEffect, useRef, FormEvent } from "react";
 import Navbar from "@/components/Navbar";
 
 interface HistoryItem {
+  id: string;
+  transcript: string;
+  transcript_truncated?: boolean;
+  summary: string;
+  truncated: boolean;
+  created_at: string;
+}
+
+interface HistoryDetail {
   id: string;
   transcript: string;
   manual_markdown: string;
   created_at: string;
 }
 
+const HISTORY_URL = "http://localhost:8000/api/history";
+
 export default function History() {
   const [history, setHistory] = useState<HistoryItem[]>([]);
   const [loading, setLoading] = useState(true);
-  const [selected, setSelected] = useState<HistoryItem | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [query, setQuery] = useState("");
+  const [activeQuery, setActiveQuery] = useState("");
+  const [nextOffset, setNextOffset] = useState<number | null>(null);
+  const [selected, setSelected] = useState<HistoryDetail | null>(null);
 
   const detailsRef = useRef<HTMLDivElement | null>(null);
 
@@ -42,11 +57,15 @@ export default function History() {
     fetchHistory();
   }, []);
 
-  const fetchHistory = async () => {
+  const fetchHistory = async (cursor?: string) => {
     try {
-      const response = await fetch("http://localhost:8000/api/history");
+      const url = cursor
+        ? `${HISTORY_URL}/?cursor=${encodeURIComponent(cursor)}`
+        : `${HISTORY_URL}/`;
+      const response = await fetch(url);
       const data = await response.json();
-      setHistory(data);
+      setHistory((prev) => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error("Error fetching history:", error);
     } finally {
@@ -54,6 +73,58 @@ export default function History() {
     }
   };
 
+  // full-text search; snippets come back with <mark> around matched terms
+  const searchHistory = async (q: string, offset = 0) => {
+    try {
+      const response = await fetch(
+        `${HISTORY_URL}/search?q=${encodeURIComponent(q)}&offset=${offset}`
+      );
+      const data = await response.json();
+      const items: HistoryItem[] = data.items.map((item: any) => ({
+        id: item.id,
+        transcript: item.transcript,
+        summary: item.snippet.replace(/<\/?mark>/g, ""),
+        truncated: true,
+        created_at: item.created_at,
+      }));
+      setHistory((prev) => (offset ? [...prev, ...items] : items));
+      setNextOffset(data.next_offset);
+    } catch (error) {
+      console.error("Error searching history:", error);
+    }
+  };
+
+  const submitSearch = (e: FormEvent) => {
+    e.preventDefault();
+    const q = query.trim();
+    setActiveQuery(q);
+    if (q) {
+      searchHistory(q);
+    } else {
+      fetchHistory();
+    }
+  };
+
+  const loadMore = () => {
+    if (activeQuery) {
+      if (nextOffset !== null) searchHistory(activeQuery, nextOffset);
+    } else if (nextCursor) {
+      fetchHistory(nextCursor);
+    }
+  };
+
+  const hasMore = activeQuery ? nextOffset !== null : nextCursor !== null;
+
+  // the list only carries a summary; load the full session on select
+  const selectItem = async (item: HistoryItem) => {
+    try {
+      const response = await fetch(`${HISTORY_URL}/${item.id}`);
+      setSelected(await response.json());
+    } catch (error) {
+      console.error("Error fetching session:", error);
+    }
+  };
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 to-indigo-100 p-8">
       <div className="app-shell">
@@ -62,6 +133,19 @@ export default function History() {
           <Navbar />
         </header>
 
+        <form onSubmit={submitSearch} className="card mb-4 flex gap-2">
+          <input
+            type="search"
+            className="flex-1 border rounded px-3 py-2"
+            placeholder="Search transcripts and manuals..."
+            value={query}
+            onChange={(e) => setQuery(e.target.value)}
+          />
+          <button type="submit" className="btn btn-sm">
+            Search
+          </button>
+        </form>
+
         {/* Loading */}
         {loading ? (
           <div className="card text-center py-16">
@@ -70,7 +154,9 @@ export default function History() {
         ) : history.length === 0 ? (
           <div className="card text-center py-16">
             <p className="muted text-lg">
-              No history yet. Record your first issue!
+              {activeQuery
+                ? "No sessions match your search."
+                : "No history yet. Record your first issue!"}
             </p>
           </div>
         ) : (
@@ -97,7 +183,7 @@ export default function History() {
                     {history.map((item) => (
                       <tr
                         key={item.id}
-                        onClick={() => setSelected(item)}
+                        onClick={() => selectItem(item)}
                         className={`cursor-pointer transition-colors hover:bg-gray-50 ${
                           selected?.id === item.id ? "bg-indigo-50" : ""
                         }`}
@@ -108,17 +194,28 @@ export default function History() {
 
                         <td className="px-6 py-4 text-sm text-gray-800 font-medium">
                           {item.transcript}
+                          {item.transcript_truncated ? "..." : ""}
                         </td>
 
                         <td className="px-6 py-4 text-sm text-gray-600">
-                          {item.manual_markdown
-                            ? item.manual_markdown.substring(0, 80) + "..."
+                          {item.summary
+                            ? item.summary.substring(0, 80) +
+                              (item.truncated || item.summary.length > 80
+                                ? "..."
+                                : "")
                             : "—"}
                         </td>
                       </tr>
                     ))}
                   </tbody>
                 </table>
+                {hasMore && (
+                  <div className="p-4 text-center">
+                    <button className="btn btn-ghost btn-sm" onClick={loadMore}>
+                      Load more
+                    </button>
+                  </div>
+                )}
               </div>
 
               {/* Right: selected detail panel */}